@@ -0,0 +1,216 @@
+"""Admission control in front of the Flask app.
+
+Every request is put in a route class (auth, catalog, dashboard, write,
+export) and each class gets its own budget of concurrently running requests
+plus a bounded wait queue. When the queue is full the request is turned away
+immediately with 429; a request that waited longer than the class allows gets
+503. Both carry a Retry-After header, so a flood of bcrypt logins or teacher
+exports cannot take the worker threads the cheap catalog reads need.
+"""
+import json
+import threading
+import time
+
+from werkzeug.exceptions import HTTPException
+from werkzeug.wsgi import ClosingIterator
+
+# Endpoints whose handlers hash passwords
+AUTH_ENDPOINTS = {
+    'login', 'teacher_login', 'register', 'teacher_register', 'update_password_endpoint',
+}
+# Teacher views that read every enrollment or submission of a unit or teacher
+EXPORT_ENDPOINTS = {
+    'get_unit_submissions', 'get_enrolled_students', 'get_unit_students', 'get_unit_analytics',
+    'get_unit_gradebook', 'get_similar_submissions',
+}
+DASHBOARD_ENDPOINTS = {
+    'get_student_dashboard', 'get_teacher_details', 'get_student_enrolled_units',
+    'get_units_with_progress', 'get_student_units', 'get_student_results',
+    'get_student_submissions', 'get_student_performance', 'get_teacher_units',
+    'get_specific_teacher_units', 'run_batch',
+}
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+# Never queued: operators must still see the limiter under load, and event
+# streams stay open for hours so they cannot hold a slot
+EXEMPT_ENDPOINTS = {'admission_metrics', 'stream_events'}
+
+# route class -> (max in flight, max queued, max queue wait in seconds)
+DEFAULT_LIMITS = {
+    'auth': (4, 16, 2.0),
+    'catalog': (32, 128, 1.0),
+    'dashboard': (16, 64, 2.0),
+    'write': (8, 32, 2.0),
+    'export': (2, 4, 5.0),
+}
+
+
+def classify(endpoint, method):
+    if endpoint in AUTH_ENDPOINTS:
+        return 'auth'
+    if endpoint in EXPORT_ENDPOINTS:
+        return 'export'
+    # Checked before the method: /api/batch is a POST but only runs reads
+    if endpoint in DASHBOARD_ENDPOINTS:
+        return 'dashboard'
+    if method in WRITE_METHODS:
+        return 'write'
+    return 'catalog'
+
+
+class RouteClassLimiter:
+    ADMITTED = 'admitted'
+    REJECTED = 'rejected'
+    TIMED_OUT = 'timed_out'
+
+    def __init__(self, name, max_in_flight, max_queue, queue_timeout):
+        self.name = name
+        self.max_in_flight = max_in_flight
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self._cond = threading.Condition()
+        self.in_flight = 0
+        self.queued = 0
+        self.peak_queued = 0
+        self.admitted = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.total_wait = 0.0
+
+    def acquire(self, wait=True):
+        """Take a slot, waiting in the queue for one. With ``wait`` false, returns None instead of queueing."""
+        with self._cond:
+            if self.in_flight < self.max_in_flight and not self.queued:
+                self.in_flight += 1
+                self.admitted += 1
+                return self.ADMITTED
+            if self.queued >= self.max_queue:
+                self.rejected += 1
+                return self.REJECTED
+            if not wait:
+                return None
+
+            self.queued += 1
+            self.peak_queued = max(self.peak_queued, self.queued)
+            started = time.monotonic()
+            deadline = started + self.queue_timeout
+            try:
+                while self.in_flight >= self.max_in_flight:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timed_out += 1
+                        return self.TIMED_OUT
+                    self._cond.wait(remaining)
+            finally:
+                self.queued -= 1
+                self.total_wait += time.monotonic() - started
+            self.in_flight += 1
+            self.admitted += 1
+            return self.ADMITTED
+
+    def release(self):
+        with self._cond:
+            self.in_flight -= 1
+            self._cond.notify()
+
+    def retry_after(self):
+        # Rough time for the current queue to drain, at least one second
+        return max(1, int(self.queue_timeout * (self.queued + 1) / self.max_in_flight + 0.5))
+
+    def metrics(self):
+        with self._cond:
+            waited = self.admitted + self.timed_out
+            return {
+                'max_in_flight': self.max_in_flight,
+                'max_queue': self.max_queue,
+                'in_flight': self.in_flight,
+                'queued': self.queued,
+                'peak_queued': self.peak_queued,
+                'admitted': self.admitted,
+                'rejected': self.rejected,
+                'timed_out': self.timed_out,
+                'avg_queue_wait_ms': round(self.total_wait * 1000 / waited, 3) if waited else 0.0,
+            }
+
+
+def shed_response(limiter, outcome):
+    """(status line, JSON body) of a request ``limiter`` turned away."""
+    if outcome == RouteClassLimiter.REJECTED:
+        status, message = '429 Too Many Requests', 'Too many requests, please retry later'
+    else:
+        status, message = '503 Service Unavailable', 'Server busy, please retry later'
+    return status, {'error': message, 'route_class': limiter.name}
+
+
+class AdmissionControl:
+    """WSGI middleware applying one RouteClassLimiter per route class."""
+
+    def __init__(self, app=None):
+        self.limiters = {}
+        self.enabled = False
+        self._app = None
+        self._wsgi_app = None
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        limits = dict(DEFAULT_LIMITS)
+        limits.update(app.config.get('ADMISSION_LIMITS') or {})
+        self.limiters = {
+            name: RouteClassLimiter(name, *limit) for name, limit in limits.items()
+        }
+        self._app = app
+        app.extensions['admission'] = self
+        self.enabled = app.config.get('ADMISSION_CONTROL_ENABLED', True)
+        if self.enabled:
+            self._wsgi_app = app.wsgi_app
+            app.wsgi_app = self
+
+    def route_class(self, environ):
+        method = environ.get('REQUEST_METHOD', 'GET')
+        if method == 'OPTIONS':
+            return None
+        try:
+            endpoint, _ = self._app.url_map.bind_to_environ(environ).match(method=method)
+            # Classes are keyed by view name, without the blueprint prefix
+            endpoint = endpoint.rsplit('.', 1)[-1]
+        except HTTPException:
+            endpoint = None
+        if endpoint in EXEMPT_ENDPOINTS:
+            return None
+        return classify(endpoint, method)
+
+    def __call__(self, environ, start_response):
+        route_class = self.route_class(environ)
+        limiter = self.limiters.get(route_class)
+        if limiter is None:
+            return self._wsgi_app(environ, start_response)
+
+        outcome = limiter.acquire()
+        if outcome != RouteClassLimiter.ADMITTED:
+            return self._shed(limiter, outcome, start_response)
+
+        try:
+            app_iter = self._wsgi_app(environ, start_response)
+        except BaseException:
+            limiter.release()
+            raise
+        # Hold the slot until the response body has been sent
+        return ClosingIterator(app_iter, [limiter.release])
+
+    def _shed(self, limiter, outcome, start_response):
+        status, data = shed_response(limiter, outcome)
+        body = json.dumps(data).encode('utf-8')
+        start_response(status, [
+            ('Content-Type', 'application/json'),
+            ('Content-Length', str(len(body))),
+            ('Retry-After', str(limiter.retry_after())),
+            # Shed before Flask-CORS runs, so browsers could not read the status otherwise
+            ('Access-Control-Allow-Origin', '*'),
+        ])
+        return [body]
+
+    def metrics(self):
+        return {name: limiter.metrics() for name, limiter in self.limiters.items()}
+
+
+admission = AdmissionControl()
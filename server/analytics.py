@@ -0,0 +1,107 @@
+"""Grade distribution statistics for a teacher's unit.
+
+Each score column comes back from SQLite as one comma-separated
+``group_concat`` string per group and is parsed straight into a NumPy array,
+so no Python object is built per enrollment or submission. All statistics are
+then vectorised. Scores are percentages: submission grades are scaled by their
+assignment's max_score.
+
+numpy is imported inside the functions so that worker start-up does not pay
+for it until a teacher first opens the analytics view.
+"""
+from sqlalchemy import and_, func, select
+
+from database import db
+from grading import COMPONENTS
+from models import User, Enrollment, Assignment, Submission
+
+PERCENTILES = (10, 25, 75, 90)
+HISTOGRAM_BINS = 10
+
+
+def to_array(concatenated):
+    """A ``group_concat`` of numbers as a float array (NULLs are already skipped)."""
+    import numpy as np
+
+    if not concatenated:
+        return np.empty(0)
+    return np.fromstring(concatenated, sep=',')
+
+
+def distribution(values):
+    """Summary statistics and a 0-100 histogram of the values."""
+    import numpy as np
+
+    if not values.size:
+        return {'count': 0}
+    percentiles = np.percentile(values, PERCENTILES)
+    counts, edges = np.histogram(np.clip(values, 0, 100), bins=HISTOGRAM_BINS, range=(0, 100))
+    return {
+        'count': int(values.size),
+        'mean': round(float(values.mean()), 2),
+        'median': round(float(np.median(values)), 2),
+        'stddev': round(float(values.std()), 2),
+        'min': round(float(values.min()), 2),
+        'max': round(float(values.max()), 2),
+        'percentiles': {f'p{p}': round(float(v), 2) for p, v in zip(PERCENTILES, percentiles)},
+        'histogram': {
+            'edges': [int(edge) for edge in edges],
+            'counts': counts.tolist()
+        }
+    }
+
+
+def unit_analytics(unit_id, at_risk_below=50.0):
+    component_columns = [getattr(Enrollment, f'{component}_score') for component in COMPONENTS]
+    component_columns.append(Enrollment.overall_score)
+    students, *components = db.session.execute(
+        select(func.count(Enrollment.id), *[func.group_concat(column) for column in component_columns])
+        .where(Enrollment.unit_id == unit_id)
+    ).one()
+
+    # One row per assignment, including those nobody has been graded on yet
+    assignments = db.session.execute(
+        select(Assignment.id, Assignment.title, Assignment.max_score, func.group_concat(Submission.grade))
+        .outerjoin(Submission, and_(Submission.assignment_id == Assignment.id, Submission.grade.isnot(None)))
+        .where(Assignment.unit_id == unit_id)
+        .group_by(Assignment.id)
+        .order_by(Assignment.id)
+    ).all()
+
+    at_risk = db.session.execute(
+        select(Enrollment.student_id, User.username, Enrollment.overall_score)
+        .join(User, User.id == Enrollment.student_id)
+        .where(Enrollment.unit_id == unit_id, Enrollment.overall_score < at_risk_below)
+        .order_by(Enrollment.overall_score, Enrollment.student_id)
+    ).all()
+
+    results = []
+    for assignment_id, title, max_score, grades in assignments:
+        grades = to_array(grades)
+        if max_score:
+            grades = grades * (100.0 / max_score)
+        results.append({
+            'assignment_id': assignment_id,
+            'title': title,
+            'max_score': max_score,
+            'graded': int(grades.size),
+            'stats': distribution(grades)
+        })
+
+    return {
+        'unit_id': unit_id,
+        'students': students,
+        'components': {
+            component: distribution(to_array(values))
+            for component, values in zip(COMPONENTS + ('overall',), components)
+        },
+        'assignments': results,
+        'at_risk': {
+            'threshold': at_risk_below,
+            'students': [{
+                'student_id': student_id,
+                'name': name,
+                'overall_score': round(score, 2)
+            } for student_id, name, score in at_risk]
+        }
+    }
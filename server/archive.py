@@ -0,0 +1,296 @@
+"""Hot/cold archival of finished units' enrollments, submissions and ratings.
+
+Every term adds rows to enrollment, submission and rating, yet most of them
+belong to units that ended long ago and are rarely read. archive_units()
+moves the rows of units that ended more than ARCHIVE_AFTER_MONTHS months ago
+into one SQLite file per year the unit ended, ARCHIVE_DIR/archive_<year>.db.
+Every pooled connection ATTACHes those files as ``archive_<year>``. Units,
+assignments and users stay in the main database, so it only holds the rows of
+running and recently ended units and stays small enough to sit in the page
+cache. SQLite attaches at most 10 databases by default, so at most 10 years
+of archives can be attached.
+
+Rows move in batches of ARCHIVE_BATCH_SIZE per transaction, with a pause of
+ARCHIVE_PAUSE_MS between batches. No writer waits long for the lock. Each
+batch copies rows with INSERT OR REPLACE before deleting them, so an
+interrupted run can simply be repeated. Submissions take their
+submission_content row with them, and their similarity signatures are
+dropped. Each batch records change events by unit and student, so workers
+drop their cached dashboards, counts and suggestions.
+
+Archived rows no longer count toward live figures, such as a unit's ratings
+and enrollment totals. The student results and submissions endpoints add
+them back with ``include_archived=true``, through archived_enrollments() and
+archived_submissions(). Archiving is off while ARCHIVE_AFTER_MONTHS is 0.
+When it is set, it runs as the daily 'archive.units' job, and always as
+``flask archive-units``.
+"""
+import calendar
+import os
+import re
+import threading
+import time
+from collections import Counter
+from datetime import datetime
+
+from sqlalchemy import Column, Index, MetaData, Table, delete, event, func, insert, select, union_all
+
+from changes import DELETE, change, changes
+from database import db
+from models import (
+    Assignment, Enrollment, Rating, Submission, SubmissionBucket, SubmissionContent, SubmissionSignature, Unit,
+)
+from text_codec import decode_text
+
+ARCHIVE_FILE = re.compile(r'^archive_(\d{4})\.db$')
+# Units whose rows are looked up in one IN list
+UNIT_CHUNK = 500
+
+
+def months_before(when, months):
+    month = when.month - 1 - months
+    year, month = when.year + month // 12, month % 12 + 1
+    return when.replace(year=year, month=month, day=min(when.day, calendar.monthrange(year, month)[1]))
+
+
+def schema_name(year):
+    return f'archive_{year}'
+
+
+class Archive:
+    def __init__(self):
+        self.directory = None
+        self.after_months = 0
+        self.batch_size = 500
+        self.pause = 0.05
+        self._years = set()
+        self._engines = set()
+        self._metadata = {}
+        self._tables = {}
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        self.after_months = app.config.get('ARCHIVE_AFTER_MONTHS', 0)
+        self.batch_size = app.config.get('ARCHIVE_BATCH_SIZE', 500)
+        self.pause = app.config.get('ARCHIVE_PAUSE_MS', 50) / 1000.0
+        with app.app_context():
+            engine = db.engine
+        database = engine.url.database
+        if engine.url.get_backend_name() == 'sqlite' and database and database != ':memory:':
+            self.directory = app.config.get('ARCHIVE_DIR') or os.path.join(
+                os.path.dirname(os.path.abspath(database)), 'archive'
+            )
+            if engine not in self._engines:
+                self._engines.add(engine)
+                event.listen(engine, 'checkout', self._checkout)
+            self._scan()
+        app.extensions['archive'] = self
+
+    # Attaching
+
+    def _path(self, year):
+        return os.path.join(self.directory, f'archive_{year}.db')
+
+    def _scan(self):
+        """Pick up archive files, including ones other processes created."""
+        if self.directory and os.path.isdir(self.directory):
+            found = {int(match.group(1)) for match in map(ARCHIVE_FILE.match, os.listdir(self.directory)) if match}
+            with self._lock:
+                self._years |= found
+
+    def _attach(self, dbapi_connection, info):
+        attached = info.setdefault('archive_years', set())
+        for year in sorted(self._years - attached):
+            dbapi_connection.execute(f'ATTACH DATABASE ? AS {schema_name(year)}', (self._path(year),))
+            attached.add(year)
+
+    def _checkout(self, dbapi_connection, connection_record, connection_proxy):
+        self._attach(dbapi_connection, connection_record.info)
+
+    def schemas(self, connection=None):
+        """Names of the archive schemas, attached to ``connection`` (the session's by default)."""
+        self._scan()
+        if not self._years:
+            return []
+        connection = connection if connection is not None else db.session.connection()
+        self._attach(connection.connection.dbapi_connection, connection.info)
+        return [schema_name(year) for year in sorted(self._years)]
+
+    def table(self, table, schema):
+        """The archive copy of ``table`` in ``schema``: same columns, no foreign keys."""
+        key = (table.name, schema)
+        if key not in self._tables:
+            metadata = self._metadata.setdefault(schema, MetaData())
+            copy = Table(table.name, metadata, *(
+                Column(column.name, column.type, primary_key=column.primary_key, nullable=column.nullable,
+                       autoincrement=False)
+                for column in table.columns
+            ), schema=schema)
+            for name in ('student_id', 'unit_id', 'assignment_id'):
+                if name in copy.c:
+                    Index(f'ix_{table.name}_{name}', copy.c[name])
+            self._tables[key] = copy
+        return self._tables[key]
+
+    def _create(self, year):
+        """Create (or open) the archive file for ``year`` and its tables."""
+        os.makedirs(self.directory, exist_ok=True)
+        with self._lock:
+            self._years.add(year)
+        schema = schema_name(year)
+        with db.engine.begin() as connection:
+            self.schemas(connection)
+            for table in (Enrollment.__table__, Rating.__table__, Submission.__table__, SubmissionContent.__table__):
+                self.table(table, schema)
+            self._metadata[schema].create_all(connection)
+        return schema
+
+    # Moving rows
+
+    def _move(self, schema, table, ids, connection):
+        """Copy rows ``ids`` of ``table`` into the archive, then delete them."""
+        archived = self.table(table, schema)
+        columns = [column.name for column in table.columns]
+        connection.execute(
+            insert(archived).prefix_with('OR REPLACE').from_select(columns, select(table).where(table.c.id.in_(ids)))
+        )
+        connection.execute(delete(table).where(table.c.id.in_(ids)))
+
+    def _move_submissions(self, schema, ids, connection):
+        content = SubmissionContent.__table__
+        connection.execute(
+            insert(self.table(content, schema)).prefix_with('OR REPLACE').from_select(
+                [column.name for column in content.columns],
+                select(content).where(content.c.submission_id.in_(ids))
+            )
+        )
+        connection.execute(delete(content).where(content.c.submission_id.in_(ids)))
+        connection.execute(delete(SubmissionBucket.__table__).where(SubmissionBucket.submission_id.in_(ids)))
+        connection.execute(delete(SubmissionSignature.__table__).where(SubmissionSignature.submission_id.in_(ids)))
+        self._move(schema, Submission.__table__, ids, connection)
+
+    def _archive_rows(self, schema, entity, rows_statement, move):
+        """Move the rows ``rows_statement`` selects as (id, unit_id, student_id), batch by batch."""
+        moved = 0
+        while True:
+            with db.engine.begin() as connection:
+                # Take the write lock before reading: upgrading a read lock
+                # while another writer waits for it fails with "database is
+                # locked" instead of waiting
+                connection.exec_driver_sql('BEGIN IMMEDIATE')
+                rows = connection.execute(rows_statement.limit(self.batch_size)).all()
+                if not rows:
+                    break
+                move([row[0] for row in rows], connection)
+                changes.record(*(
+                    change(entity, DELETE, unit_id=unit_id, user_id=student_id)
+                    for unit_id, student_id in {(row[1], row[2]) for row in rows}
+                ), connection=connection)
+            changes.notify()
+            moved += len(rows)
+            # Let waiting writers in before the next batch
+            time.sleep(self.pause)
+        return moved
+
+    def archive_units(self, months=None, now=None):
+        """Archive the rows of units that ended more than ``months`` months ago.
+
+        Returns the number of rows moved per table.
+        """
+        months = self.after_months if months is None else months
+        if not months or not self.directory:
+            return {}
+        cutoff = months_before(now or datetime.utcnow(), months)
+        years = {}
+        for unit_id, end_date in db.session.execute(
+            select(Unit.id, Unit.end_date).where(Unit.end_date < cutoff).order_by(Unit.id)
+        ):
+            years.setdefault(end_date.year, []).append(unit_id)
+        db.session.rollback()
+
+        moved = Counter()
+        for year, unit_ids in sorted(years.items()):
+            schema = self._create(year)
+            for start in range(0, len(unit_ids), UNIT_CHUNK):
+                chunk = unit_ids[start:start + UNIT_CHUNK]
+                moved['enrollment'] += self._archive_rows(
+                    schema, 'enrollment',
+                    select(Enrollment.id, Enrollment.unit_id, Enrollment.student_id)
+                    .where(Enrollment.unit_id.in_(chunk)),
+                    lambda ids, connection: self._move(schema, Enrollment.__table__, ids, connection)
+                )
+                moved['rating'] += self._archive_rows(
+                    schema, 'rating',
+                    select(Rating.id, Rating.unit_id, Rating.student_id).where(Rating.unit_id.in_(chunk)),
+                    lambda ids, connection: self._move(schema, Rating.__table__, ids, connection)
+                )
+                moved['submission'] += self._archive_rows(
+                    schema, 'submission',
+                    select(Submission.id, Assignment.unit_id, Submission.student_id)
+                    .join(Assignment, Assignment.id == Submission.assignment_id)
+                    .where(Assignment.unit_id.in_(chunk)),
+                    lambda ids, connection: self._move_submissions(schema, ids, connection)
+                )
+        return dict(moved)
+
+    def counts(self):
+        """Archived rows per year and table."""
+        counts = {}
+        for schema in self.schemas():
+            counts[schema] = {
+                name: db.session.execute(
+                    select(func.count()).select_from(self.table(table, schema))
+                ).scalar()
+                for name, table in (('enrollment', Enrollment.__table__), ('rating', Rating.__table__),
+                                    ('submission', Submission.__table__))
+            }
+        return counts
+
+    # Reading archived rows
+
+    def archived_enrollments(self, student_id):
+        """A student's archived enrollments, oldest first, each with a ``unit_title``."""
+        statements = []
+        for schema in self.schemas():
+            enrollment = self.table(Enrollment.__table__, schema)
+            statements.append(
+                select(enrollment, Unit.title.label('unit_title'))
+                .join(Unit, Unit.id == enrollment.c.unit_id)
+                .where(enrollment.c.student_id == student_id)
+            )
+        if not statements:
+            return []
+        rows = db.session.execute(union_all(*statements)).all()
+        return sorted(rows, key=lambda row: row.enrollment_date or datetime.min)
+
+    def archived_submissions(self, student_id, with_text=True):
+        """A student's archived submissions as dicts, with ``assignment_title`` and ``unit_title``.
+
+        With ``with_text`` they also have ``submission_text``, read from the
+        archived side table.
+        """
+        statements = []
+        for schema in self.schemas():
+            submission = self.table(Submission.__table__, schema)
+            statement = select(submission, Assignment.title.label('assignment_title'), Unit.title.label('unit_title'))\
+                .outerjoin(Assignment, Assignment.id == submission.c.assignment_id)\
+                .outerjoin(Unit, Unit.id == Assignment.unit_id)\
+                .where(submission.c.student_id == student_id)
+            if with_text:
+                content = self.table(SubmissionContent.__table__, schema)
+                statement = statement.add_columns(content.c.encoding, content.c.data)\
+                    .outerjoin(content, content.c.submission_id == submission.c.id)
+            statements.append(statement)
+        if not statements:
+            return []
+        submissions = []
+        for row in db.session.execute(union_all(*statements)).mappings():
+            submission = dict(row)
+            if with_text:
+                encoding, data = submission.pop('encoding'), submission.pop('data')
+                submission['submission_text'] = decode_text(encoding, data) if encoding else None
+            submissions.append(submission)
+        return sorted(submissions, key=lambda submission: submission['id'])
+
+
+archive = Archive()
@@ -0,0 +1,380 @@
+"""Optional async serving mode.
+
+    uvicorn asgi:app --workers 4
+
+The read-heavy catalog and student dashboard routes are answered by async
+handlers running on an async SQLAlchemy engine (aiosqlite), so a request
+waiting on the database does not hold a thread. Every other request is passed
+to the regular Flask app through asgiref's WSGI adapter, so all sync routes
+keep working unchanged.
+
+/api/events is also served natively: each open event stream is a coroutine
+waiting on its subscription queue instead of a blocked worker thread.
+
+Native routes take a slot from the same admission limiters as the Flask app
+and accept the same tokens, revoked ones excepted. The profiler samples a
+thread, so a request picked for profiling is served by the Flask app instead.
+"""
+import asyncio
+import json
+import re
+from urllib.parse import parse_qsl, unquote
+
+from asgiref.wsgi import WsgiToAsgi
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from werkzeug.datastructures import MultiDict
+
+from admission import admission, classify, RouteClassLimiter, shed_response
+from app import create_app
+from auth import BLACKLIST, decode_token
+from cache import dashboard_cache, facets_cache
+from catalog_filters import (
+    FilterError, category_facet_statement, facets_from_rows, filter_clauses, parse_filters, rating_facet_statement,
+    snapshot_facets, snapshot_mask,
+)
+from catalog_snapshot import catalog_snapshots
+from changes import changes
+from events import events, format_sse, HEARTBEAT
+from fieldsets import FieldSelectionError, parse_fields
+from models import User, Unit
+from profiling import profiler, TOKEN_HEADER
+from progress_buffer import progress_buffer
+from queries import (
+    enrolled_statement, pagination_meta, stored_progress_statement, student_dashboard, student_dashboard_statements,
+    unit_assignments_statement, unit_detail, unit_detail_select, unit_page_statements, unit_summary,
+    unit_summary_select, UNIT_DETAIL_FIELDS, UNIT_SUMMARY_FIELDS,
+)
+from related_units import related_unit_statements
+from slow_queries import slow_query_log
+
+CORS_HEADERS = [
+    (b'access-control-allow-origin', b'*'),
+    (b'access-control-allow-headers', b'Authorization, Content-Type'),
+]
+
+
+class JSONResponse:
+    def __init__(self, data, status=200, headers=()):
+        self.body = json.dumps(data).encode('utf-8')
+        self.status = status
+        self.headers = list(headers)
+
+    async def __call__(self, send):
+        await send({
+            'type': 'http.response.start',
+            'status': self.status,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(self.body)).encode()),
+            ] + self.headers + CORS_HEADERS,
+        })
+        await send({'type': 'http.response.body', 'body': self.body})
+
+
+class Request:
+    def __init__(self, scope, params):
+        self.scope = scope
+        self.params = params
+        self.args = MultiDict(parse_qsl(scope.get('query_string', b'').decode('latin-1')))
+        self.headers = {
+            key.decode('latin-1').lower(): value.decode('latin-1')
+            for key, value in scope.get('headers', [])
+        }
+
+    def fields(self, available=UNIT_SUMMARY_FIELDS):
+        return parse_fields(self.args.get('fields'), available)
+
+    def arg_int(self, name, default):
+        try:
+            return int(self.args.get(name, default))
+        except ValueError:
+            return default
+
+
+def async_database_url(url):
+    if url.startswith('sqlite:'):
+        return 'sqlite+aiosqlite:' + url[len('sqlite:'):]
+    return url
+
+
+class AsyncApp:
+    """ASGI app serving selected GET routes natively and the rest through Flask."""
+
+    def __init__(self, flask_app):
+        self.flask_app = flask_app
+        self.wsgi = WsgiToAsgi(flask_app)
+        self.sampled_wsgi = WsgiToAsgi(profiler.sampling_app(flask_app))
+        self.engine = create_async_engine(async_database_url(flask_app.config['SQLALCHEMY_DATABASE_URI']))
+        slow_query_log.attach(self.engine.sync_engine)
+        self.session = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.routes = [
+            (re.compile(r'^/api/units$'), self.get_units),
+            (re.compile(r'^/api/units/latest$'), self.get_latest_units),
+            (re.compile(r'^/api/units/categories$'), self.get_categories),
+            (re.compile(r'^/api/units/category/(?P<category>[^/]+)$'), self.get_units_by_category),
+            (re.compile(r'^/api/units/(?P<unit_id>\d+)$'), self.get_unit_detail),
+            (re.compile(r'^/api/student/dashboard/(?P<student_id>\d+)$'), self.get_student_dashboard),
+        ]
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self.lifespan(receive, send)
+        if scope['type'] == 'http' and scope['method'] == 'GET':
+            if scope['path'] == '/api/events':
+                return await self.stream_events(Request(scope, {}), receive, send)
+            for pattern, handler in self.routes:
+                match = pattern.match(scope['path'])
+                if match:
+                    request = Request(scope, match.groupdict())
+                    if profiler.enabled:
+                        if profiler.token_matches(request.headers.get(TOKEN_HEADER.lower())):
+                            break
+                        if profiler.sampled():
+                            return await self.sampled_wsgi(scope, receive, send)
+                    return await self.admit(handler, request, send)
+        return await self.wsgi(scope, receive, send)
+
+    async def admit(self, handler, request, send):
+        """Run a native handler in a slot of its route class, as AdmissionControl does for Flask."""
+        limiter = admission.limiters.get(classify(handler.__name__, 'GET')) if admission.enabled else None
+        if limiter is not None:
+            outcome = limiter.acquire(wait=False)
+            if outcome is None:
+                # Queue on a thread, so the event loop keeps serving admitted requests
+                outcome = await asyncio.to_thread(limiter.acquire)
+            if outcome != RouteClassLimiter.ADMITTED:
+                status, data = shed_response(limiter, outcome)
+                return await JSONResponse(data, int(status.split()[0]), [
+                    (b'retry-after', str(limiter.retry_after()).encode())
+                ])(send)
+        try:
+            try:
+                response = await handler(request)
+            except (FieldSelectionError, FilterError) as e:
+                response = JSONResponse({'error': str(e)}, 400)
+            except Exception as e:
+                response = JSONResponse({'error': str(e)}, 500)
+            await response(send)
+        finally:
+            if limiter is not None:
+                limiter.release()
+
+    async def lifespan(self, receive, send):
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await self.engine.dispose()
+                progress_buffer.stop()
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def current_user_id(self, request, allow_query_token=False):
+        """Id from a valid, unrevoked bearer token, or None."""
+        import jwt
+
+        auth_header = request.headers.get('authorization', '')
+        parts = auth_header.split(' ')
+        if len(parts) >= 2:
+            token = parts[1]
+        elif allow_query_token and request.args.get('token'):
+            # EventSource cannot set headers
+            token = request.args['token']
+        else:
+            return None
+        if token in BLACKLIST:
+            return None
+        try:
+            with self.flask_app.app_context():
+                payload = decode_token(token)
+            return int(payload['sub'])
+        except (jwt.InvalidTokenError, KeyError, ValueError):
+            return None
+
+    async def stream_events(self, request, receive, send):
+        user_id = self.current_user_id(request, allow_query_token=True)
+        if user_id is None:
+            return await JSONResponse({'message': 'Token is required'}, 401)(send)
+        async with self.session() as session:
+            if await session.scalar(select(User.id).where(User.id == user_id)) is None:
+                return await JSONResponse({'message': 'User not found'}, 404)(send)
+
+        subscription = events.subscribe(user_id, loop=asyncio.get_running_loop())
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ] + CORS_HEADERS,
+        })
+
+        async def pump():
+            await send({'type': 'http.response.body', 'body': HEARTBEAT, 'more_body': True})
+            while True:
+                try:
+                    event = await asyncio.wait_for(subscription.queue.get(), events.heartbeat_seconds)
+                    chunk = format_sse(event)
+                except asyncio.TimeoutError:
+                    chunk = HEARTBEAT
+                await send({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+
+        task = asyncio.ensure_future(pump())
+        try:
+            while not task.done():
+                receiving = asyncio.ensure_future(receive())
+                await asyncio.wait({task, receiving}, return_when=asyncio.FIRST_COMPLETED)
+                if receiving.done() and receiving.result()['type'] == 'http.disconnect':
+                    break
+                receiving.cancel()
+        finally:
+            task.cancel()
+            events.unsubscribe(subscription)
+
+    async def catch_up(self, session):
+        """Apply changes other workers committed, as the Flask app does before each request."""
+        stamp = changes.read_stamp()
+        if not changes.is_current(stamp):
+            since = changes.version
+            changes.apply(since, (await session.execute(changes.pending_statement(since))).all(), stamp)
+
+    async def catalog_snapshot(self):
+        if not catalog_snapshots.enabled:
+            return None
+        async with self.session() as session:
+            await self.catch_up(session)
+        return catalog_snapshots.current()
+
+    async def _unit_page(self, request, statement, fields, category=None, filters=None):
+        page = request.arg_int('page', 1)
+        per_page = request.arg_int('per_page', 12)
+        sort_by = request.args.get('sort_by', 'title')
+        snapshot = await self.catalog_snapshot()
+        if snapshot is not None:
+            mask = snapshot_mask(snapshot, filters) if filters is not None else None
+            units_data = snapshot.unit_page(fields, page, per_page, sort_by, category, mask)
+            if filters is not None:
+                units_data['facets'] = await self.unit_facets(filters, snapshot)
+            return JSONResponse(units_data)
+        if filters is not None:
+            statement = statement.where(*filter_clauses(filters))
+        count, statement = unit_page_statements(statement, sort_by, page, per_page)
+
+        async with self.session() as session:
+            total = await session.scalar(count)
+            rows = (await session.execute(statement)).all()
+
+        units_data = dict(
+            units=[unit_summary(row, fields) for row in rows],
+            **pagination_meta(total, page, per_page)
+        )
+        if filters is not None:
+            units_data['facets'] = await self.unit_facets(filters)
+        return JSONResponse(units_data)
+
+    async def unit_facets(self, filters, snapshot=None):
+        """routes.catalog.unit_facets on the async engine."""
+        facets = facets_cache.get(filters)
+        if facets is None:
+            generation = facets_cache.generation(filters)
+            if snapshot is not None:
+                facets = snapshot_facets(snapshot, filters)
+            else:
+                async with self.session() as session:
+                    facets = facets_from_rows(
+                        (await session.execute(category_facet_statement(filters))).all(),
+                        (await session.execute(rating_facet_statement(filters))).all()
+                    )
+            facets_cache.set(filters, facets, generation)
+        return facets
+
+    async def get_units(self, request):
+        fields = request.fields()
+        filters = parse_filters(request.args)
+        return await self._unit_page(request, unit_summary_select(fields), fields, filters=filters)
+
+    async def get_units_by_category(self, request):
+        category = unquote(request.params['category'])
+        fields = request.fields()
+        return await self._unit_page(
+            request, unit_summary_select(fields).where(Unit.category == category), fields, category
+        )
+
+    async def get_latest_units(self, request):
+        fields = request.fields()
+        snapshot = await self.catalog_snapshot()
+        if snapshot is not None:
+            return JSONResponse(snapshot.latest(fields, 6))
+        async with self.session() as session:
+            rows = (await session.execute(
+                unit_summary_select(fields).order_by(Unit.created_at.desc().nulls_last(), Unit.id).limit(6)
+            )).all()
+        return JSONResponse([unit_summary(row, fields) for row in rows])
+
+    async def get_categories(self, request):
+        snapshot = await self.catalog_snapshot()
+        if snapshot is not None:
+            return JSONResponse({'categories': [category for category in snapshot.categories if category]})
+        async with self.session() as session:
+            categories = (await session.execute(select(Unit.category).distinct())).scalars().all()
+        return JSONResponse({'categories': [category for category in categories if category]})
+
+    async def get_unit_detail(self, request):
+        unit_id = int(request.params['unit_id'])
+        fields = request.fields(UNIT_DETAIL_FIELDS)
+        current_user_id = self.current_user_id(request) if 'is_enrolled' in fields else None
+
+        async with self.session() as session:
+            row = (await session.execute(unit_detail_select(unit_id, fields))).first()
+            if row is None:
+                return JSONResponse({'error': 'Resource not found'}, 404)
+
+            is_enrolled = current_user_id is not None and await session.scalar(
+                enrolled_statement(current_user_id, unit_id)
+            ) is not None
+            assignments = (await session.execute(unit_assignments_statement(unit_id))).all() \
+                if 'assignments' in fields else ()
+            related = ()
+            if 'related_units' in fields:
+                indexed, fallback = related_unit_statements(unit_id, row.category)
+                related = (await session.execute(indexed)).all() or (await session.execute(fallback)).all()
+
+        return JSONResponse(unit_detail(row, fields, is_enrolled, assignments, related))
+
+    async def get_student_dashboard(self, request):
+        student_id = int(request.params['student_id'])
+        current_user_id = self.current_user_id(request)
+        if current_user_id is None:
+            return JSONResponse({'message': 'Token is required'}, 401)
+
+        async with self.session() as session:
+            role = await session.scalar(select(User.role).where(User.id == current_user_id))
+            if role is None:
+                return JSONResponse({'message': 'User not found'}, 404)
+            if current_user_id != student_id or role != 'student':
+                return JSONResponse({'error': 'Unauthorized access'}, 403)
+            await self.catch_up(session)
+
+        cached = dashboard_cache.get(student_id)
+        if cached is not None:
+            return JSONResponse(cached)
+
+        generation = dashboard_cache.generation(student_id)
+        totals_statement, recent_statement = student_dashboard_statements(student_id)
+        buffered = progress_buffer.pending_for_student(student_id)
+        async with self.session() as session:
+            totals = (await session.execute(totals_statement)).one()
+            recent = (await session.execute(recent_statement)).all()
+            stored_progress = dict((await session.execute(
+                stored_progress_statement(student_id, buffered)
+            )).all()) if buffered else {}
+
+        dashboard = student_dashboard(totals, recent, buffered, stored_progress)
+        dashboard_cache.set(student_id, dashboard, generation)
+        return JSONResponse(dashboard)
+
+
+app = AsyncApp(create_app())
@@ -0,0 +1,87 @@
+"""Token helpers and route decorators shared by the blueprints.
+
+jwt is imported inside the functions that need it so that importing the app,
+and every worker boot, does not pay for it up front.
+"""
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, g, jsonify, request
+
+from models import User
+from request_memo import memoized
+
+BLACKLIST = set()
+
+
+def requires_teacher_role(f):
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        if current_user.role != 'teacher':
+            return jsonify({'message': 'Teacher access required'}), 403
+        return f(current_user, *args, **kwargs)
+    return decorated
+
+
+def generate_token(user_id):
+    """Generate a new JWT token for a user"""
+    import jwt
+
+    try:
+        payload = {
+            'exp': datetime.utcnow() + timedelta(hours=24),
+            'iat': datetime.utcnow(),
+            'sub': str(user_id)
+        }
+        return jwt.encode(
+            payload,
+            current_app.config['SECRET_KEY'],
+            algorithm='HS256'
+        )
+    except Exception as e:
+        return str(e)
+
+
+def decode_token(token):
+    """Decode a token, raising jwt.InvalidTokenError subclasses on failure."""
+    import jwt
+
+    return jwt.decode(token, current_app.config['SECRET_KEY'], algorithms=['HS256'])
+
+
+def token_required(f):
+    @wraps(f)
+    def decorated(*args, **kwargs):
+        import jwt
+
+        token = None
+        auth_header = request.headers.get('Authorization')
+
+        if auth_header:
+            try:
+                token = auth_header.split(" ")[1]
+            except IndexError:
+                return jsonify({'message': 'Token is missing'}), 401
+
+        if not token:
+            return jsonify({'message': 'Token is required'}), 401
+
+        if token in BLACKLIST:
+            return jsonify({'message': 'Token has been revoked'}), 401
+
+        try:
+            # Sub-requests of one /api/batch share the outer request's token
+            payload = memoized(('token', token), lambda: decode_token(token))
+            # Convert 'sub' back to int when retrieving the user
+            user_id = int(payload['sub'])
+            current_user = memoized(('user', user_id), lambda: User.query.get(user_id))
+            if not current_user:
+                return jsonify({'message': 'User not found'}), 404
+            # For request-level hooks such as the profiler
+            g.current_user = current_user
+            return f(current_user, *args, **kwargs)
+        except jwt.ExpiredSignatureError:
+            return jsonify({'message': 'Token has expired'}), 401
+        except jwt.InvalidTokenError:
+            return jsonify({'message': 'Invalid token'}), 401
+    return decorated
@@ -0,0 +1,108 @@
+"""Catalog read latency under an auth flood, with and without admission control.
+
+Starts the app on a threaded local server, hammers /api/login with bcrypt
+work from many threads and measures /api/units latency at the same time.
+
+    python benchmarks/admission_load.py [--flood 64] [--seconds 10]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+import urllib.error
+import urllib.request
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def request(url, data=None):
+    body = json.dumps(data).encode('utf-8') if data is not None else None
+    req = urllib.request.Request(url, data=body, headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=30) as response:
+            response.read()
+            return response.status
+    except urllib.error.HTTPError as e:
+        return e.code
+
+
+def run(flood, seconds):
+    sys.path.insert(0, SERVER_DIR)
+    from werkzeug.serving import make_server
+    from app import create_app
+    from models import User
+
+    app = create_app()
+
+    with app.app_context():
+        email = User.query.first().email
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base = f'http://127.0.0.1:{server.server_port}'
+
+    stop = time.monotonic() + seconds
+    auth_statuses = []
+    catalog_latencies = []
+
+    def flood_auth():
+        while time.monotonic() < stop:
+            auth_statuses.append(request(base + '/api/login', {'email': email, 'password': 'wrong-password'}))
+
+    def read_catalog():
+        while time.monotonic() < stop:
+            started = time.perf_counter()
+            request(base + '/api/units')
+            catalog_latencies.append((time.perf_counter() - started) * 1000)
+
+    threads = [threading.Thread(target=flood_auth) for _ in range(flood)]
+    threads += [threading.Thread(target=read_catalog) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    server.shutdown()
+
+    return {
+        'admission_control': app.config['ADMISSION_CONTROL_ENABLED'],
+        'catalog_requests': len(catalog_latencies),
+        'catalog_p50_ms': round(percentile(catalog_latencies, 50), 2),
+        'catalog_p99_ms': round(percentile(catalog_latencies, 99), 2),
+        'auth_requests': len(auth_statuses),
+        'auth_shed': sum(1 for status in auth_statuses if status in (429, 503)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--flood', type=int, default=64, help='concurrent login threads')
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run(args.flood, args.seconds)))
+        return
+
+    for enabled in ('0', '1'):
+        env = dict(os.environ, ADMISSION_CONTROL_ENABLED=enabled)
+        output = subprocess.run(
+            [sys.executable, __file__, '--child', '--flood', str(args.flood), '--seconds', str(args.seconds)],
+            env=env, cwd=SERVER_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output.strip().splitlines()[-1])
+        print(', '.join(f'{key}={value}' for key, value in result.items()))
+
+
+if __name__ == '__main__':
+    main()
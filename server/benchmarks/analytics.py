@@ -0,0 +1,102 @@
+"""Unit grade analytics latency for a large unit, uncached and cached.
+
+Builds a throwaway SQLite database with one unit of --students students,
+--assignments assignments and a graded submission for most student and
+assignment pairs, then times /api/teacher/units/<id>/analytics.
+
+    python benchmarks/analytics.py [--students 10000] [--assignments 10]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def populate(db, students, assignments):
+    from sqlalchemy import insert
+    from models import User, Unit, Enrollment, Assignment, Submission
+
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    db.session.execute(insert(User), [{
+        'id': 1, 'username': 'teacher', 'email': 'teacher@example.com', 'password_hash': 'x', 'role': 'teacher'
+    }])
+    db.session.execute(insert(User), [{
+        'id': i + 2, 'username': f'student{i}', 'email': f'student{i}@example.com',
+        'password_hash': 'x', 'role': 'student'
+    } for i in range(students)])
+    db.session.execute(insert(Unit), [{'id': 1, 'title': 'Large unit', 'teacher_id': 1}])
+    db.session.execute(insert(Enrollment), [{
+        'student_id': i + 2, 'unit_id': 1, 'enrollment_date': now,
+        'assignment_score': rng.gauss(70, 15), 'cat_score': rng.gauss(65, 15),
+        'exam_score': rng.gauss(60, 20) if rng.random() < 0.9 else None,
+    } for i in range(students)])
+    db.session.execute(insert(Assignment), [{
+        'id': a + 1, 'unit_id': 1, 'title': f'Assignment {a + 1}', 'max_score': 50.0
+    } for a in range(assignments)])
+    db.session.execute(insert(Submission), [{
+        'assignment_id': a + 1, 'student_id': i + 2, 'submitted_at': now,
+        'grade': max(0.0, min(50.0, rng.gauss(35, 8)))
+    } for a in range(assignments) for i in range(students) if rng.random() < 0.8])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--students', type=int, default=10000)
+    parser.add_argument('--assignments', type=int, default=10)
+    parser.add_argument('--runs', type=int, default=20)
+    args = parser.parse_args()
+
+    sys.path.insert(0, SERVER_DIR)
+    from app import create_app
+    from auth import generate_token
+    from cache import analytics_cache
+    from database import db
+    from grading import recompute_all_grades
+
+    workdir = tempfile.mkdtemp()
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'ADMISSION_CONTROL_ENABLED': False,
+    })
+    with app.app_context():
+        db.create_all()
+        populate(db, args.students, args.assignments)
+        recompute_all_grades()
+        token = generate_token(1)
+
+    client = app.test_client()
+    headers = {'Authorization': 'Bearer ' + token}
+
+    def timed():
+        started = time.perf_counter()
+        response = client.get('/api/teacher/units/1/analytics', headers=headers)
+        assert response.status_code == 200, response.data
+        return (time.perf_counter() - started) * 1000
+
+    timed()  # first request also imports numpy
+    uncached = []
+    for _ in range(args.runs):
+        analytics_cache.clear()
+        uncached.append(timed())
+    cached = [timed() for _ in range(args.runs)]
+
+    for label, latencies in (('uncached', uncached), ('cached', cached)):
+        print(f'{label}: p50={percentile(latencies, 50):.2f}ms max={max(latencies):.2f}ms')
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""Archival of finished units and the size of the hot database.
+
+Builds a throwaway SQLite database with --units units, most of them ended in
+past years, and --enrollments enrollments plus a rating and a submission for
+every tenth enrollment. It then archives units that ended more than --months
+months ago while a second thread keeps inserting ratings, and reports the
+rows moved, the writer's insert latency during the run (how long batches hold
+the write lock), the hot database and its tables before and after, the
+archive files, and how long a student's results take with and without
+archived rows.
+
+    python benchmarks/archive.py [--units 2000] [--enrollments 200000] [--months 6]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def megabytes(path):
+    return os.path.getsize(path) / 2 ** 20
+
+
+def sizes(db, text):
+    for name, size in db.session.execute(text(
+        "SELECT name, sum(pgsize) FROM dbstat('main') WHERE name IN "
+        "('enrollment', 'rating', 'submission', 'submission_content', 'change_event') GROUP BY name ORDER BY name"
+    )):
+        print(f'  {name}: {size / 2 ** 20:.1f} MiB')
+
+
+def populate(db, rng, args):
+    from sqlalchemy import insert
+    from models import User, Unit, Enrollment, Assignment, Submission, SubmissionContent, Rating
+    from text_codec import encode_text
+
+    students = args.enrollments // 10 + 1
+    now = datetime.utcnow()
+    db.session.execute(insert(User), [{
+        'id': i + 1, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+        'role': 'student' if i else 'teacher'
+    } for i in range(students + 1)])
+    # Units ended over the last four years; unit 1, which the writer rates, is still running
+    db.session.execute(insert(Unit), [{
+        'id': u + 1, 'title': f'Unit {u}', 'teacher_id': 1,
+        'start_date': end - timedelta(days=120), 'end_date': end,
+    } for u, end in (
+        (u, now - timedelta(days=rng.randint(-60, 4 * 365) if u else -60)) for u in range(args.units)
+    )])
+    db.session.execute(insert(Assignment), [{
+        'id': u + 1, 'unit_id': u + 1, 'title': f'Assignment {u}',
+    } for u in range(args.units)])
+    for start in range(0, args.enrollments, 20000):
+        enrollments, ratings, submissions, contents = [], [], [], []
+        for e in range(start, min(start + 20000, args.enrollments)):
+            student_id, unit_id = e % students + 2, rng.randrange(args.units) + 1
+            enrollments.append({'id': e + 1, 'student_id': student_id, 'unit_id': unit_id,
+                                'progress': rng.randint(0, 100), 'grade': rng.uniform(0, 100)})
+            if e % 10 == 0:
+                ratings.append({'student_id': student_id, 'unit_id': unit_id, 'score': rng.randint(1, 5)})
+                submissions.append({'id': e + 1, 'assignment_id': unit_id, 'student_id': student_id,
+                                    'grade': rng.uniform(0, 100)})
+                contents.append(dict(zip(('encoding', 'size', 'data'), encode_text('answer ' * 100)),
+                                     submission_id=e + 1))
+        db.session.execute(insert(Enrollment), enrollments)
+        db.session.execute(insert(Rating), ratings)
+        db.session.execute(insert(Submission), submissions)
+        db.session.execute(insert(SubmissionContent), contents)
+    db.session.commit()
+    return students
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--units', type=int, default=2000)
+    parser.add_argument('--enrollments', type=int, default=200000)
+    parser.add_argument('--months', type=int, default=6)
+    parser.add_argument('--batch', type=int, default=500)
+    parser.add_argument('--pause-ms', type=int, default=50)
+    parser.add_argument('--lookups', type=int, default=200)
+    args = parser.parse_args()
+
+    sys.path.insert(0, SERVER_DIR)
+    from sqlalchemy import insert, select, text
+    from app import create_app
+    from archive import archive
+    from changes import changes
+    from database import db
+    from models import Enrollment, Rating, Unit
+
+    workdir = tempfile.mkdtemp()
+    path = os.path.join(workdir, 'bench.db')
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f'sqlite:///{path}',
+        'CATALOG_SNAPSHOT_ENABLED': False,
+        'CHANGES_STAMP_FILE': os.path.join(workdir, 'changes.stamp'),
+        'ADMISSION_CONTROL_ENABLED': False,
+        'ARCHIVE_DIR': os.path.join(workdir, 'archive'),
+        'ARCHIVE_BATCH_SIZE': args.batch,
+        'ARCHIVE_PAUSE_MS': args.pause_ms,
+    })
+    rng = random.Random(1)
+    with app.app_context():
+        db.create_all()
+        students = populate(db, rng, args)
+        db.session.execute(text('VACUUM'))
+        print(f'hot database: {megabytes(path):.1f} MiB')
+        sizes(db, text)
+
+    # A writer inserting a rating every 10ms while archiving runs
+    latencies, done = [], threading.Event()
+
+    def writer():
+        with app.app_context():
+            while not done.is_set():
+                started = time.perf_counter()
+                db.session.execute(insert(Rating), {
+                    'student_id': rng.randrange(students) + 2, 'unit_id': 1, 'score': 3
+                })
+                db.session.commit()
+                latencies.append((time.perf_counter() - started) * 1000)
+                time.sleep(0.01)
+            db.session.remove()
+
+    with app.app_context():
+        thread = threading.Thread(target=writer)
+        thread.start()
+        started = time.perf_counter()
+        moved = archive.archive_units(args.months)
+        elapsed = time.perf_counter() - started
+        done.set()
+        thread.join()
+        print(f'archived {moved} in {elapsed:.1f}s')
+        print(f'writer during archiving: {len(latencies)} inserts, p50={percentile(latencies, 50):.1f}ms '
+              f'p99={percentile(latencies, 99):.1f}ms max={max(latencies):.1f}ms')
+
+        # Archiving records a change event per unit and student; prune them as
+        # the prune job does once CHANGES_RETENTION_MINUTES have passed
+        changes.retention = timedelta(0)
+        print(f'pruned {changes.prune()} change events')
+        db.session.execute(text('VACUUM main'))
+        print(f'hot database after VACUUM: {megabytes(path):.1f} MiB')
+        sizes(db, text)
+        for name in sorted(os.listdir(archive.directory)):
+            print(f'  {name}: {megabytes(os.path.join(archive.directory, name)):.1f} MiB')
+
+        live, combined = [], []
+        for _ in range(args.lookups):
+            student_id = rng.randrange(students) + 2
+            db.session.expunge_all()
+            started = time.perf_counter()
+            db.session.execute(
+                select(Enrollment, Unit.title).join(Unit, Unit.id == Enrollment.unit_id)
+                .where(Enrollment.student_id == student_id)
+            ).all()
+            live.append((time.perf_counter() - started) * 1000)
+            archive.archived_enrollments(student_id)
+            combined.append((time.perf_counter() - started) * 1000)
+        print(f'student results: live p50={percentile(live, 50):.2f}ms, '
+              f'with archived p50={percentile(combined, 50):.2f}ms p99={percentile(combined, 99):.2f}ms')
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
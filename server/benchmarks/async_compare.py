@@ -0,0 +1,112 @@
+"""Requests/sec and memory of the sync and async serving modes.
+
+Starts the threaded WSGI server and the ASGI app under uvicorn in turn, opens
+``--connections`` concurrent client connections against ``--path`` for
+``--seconds`` and reports throughput, latency and the server's peak RSS.
+
+    python benchmarks/async_compare.py [--connections 1000] [--path /api/units]
+"""
+import argparse
+import asyncio
+import os
+import socket
+import subprocess
+import sys
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SYNC_SERVER = """
+import sys
+from werkzeug.serving import make_server
+from app import create_app
+make_server('127.0.0.1', int(sys.argv[1]), create_app(), threaded=True).serve_forever()
+"""
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def peak_rss_kb(pid):
+    with open(f'/proc/{pid}/status') as status:
+        for line in status:
+            if line.startswith('VmHWM:'):
+                return int(line.split()[1])
+    return 0
+
+
+def wait_for_port(port, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'server on port {port} did not start')
+
+
+async def client(port, path, stop, latencies, errors):
+    request = f'GET {path} HTTP/1.1\r\nHost: 127.0.0.1\r\nConnection: close\r\n\r\n'.encode()
+    while time.monotonic() < stop:
+        started = time.perf_counter()
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(request)
+            await writer.drain()
+            status_line = await reader.readline()
+            await reader.read()
+            writer.close()
+            if b' 200 ' not in status_line:
+                errors.append(status_line)
+                continue
+            latencies.append(time.perf_counter() - started)
+        except OSError as e:
+            errors.append(e)
+            await asyncio.sleep(0.01)
+
+
+async def load(port, path, connections, seconds):
+    stop = time.monotonic() + seconds
+    latencies, errors = [], []
+    await asyncio.gather(*(client(port, path, stop, latencies, errors) for _ in range(connections)))
+    return latencies, errors
+
+
+def run_mode(name, command, port, args):
+    server = subprocess.Popen(command, cwd=SERVER_DIR, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        wait_for_port(port)
+        latencies, errors = asyncio.run(load(port, args.path, args.connections, args.seconds))
+        rss = peak_rss_kb(server.pid)
+    finally:
+        server.terminate()
+        server.wait()
+
+    latencies.sort()
+    p99 = latencies[int(len(latencies) * 0.99)] * 1000 if latencies else 0.0
+    print(f'{name}: {len(latencies) / args.seconds:.0f} req/s, p99={p99:.0f} ms, '
+          f'errors={len(errors)}, peak_rss={rss / 1024:.1f} MB')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--connections', type=int, default=1000)
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--path', default='/api/units')
+    args = parser.parse_args()
+
+    port = free_port()
+    run_mode('sync (werkzeug, threaded)', [sys.executable, '-c', SYNC_SERVER, str(port)], port, args)
+    port = free_port()
+    run_mode('async (uvicorn, aiosqlite)', [
+        sys.executable, '-m', 'uvicorn', 'asgi:app', '--port', str(port),
+        '--backlog', str(args.connections * 2), '--log-level', 'warning'
+    ], port, args)
+
+
+if __name__ == '__main__':
+    main()
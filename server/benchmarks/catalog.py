@@ -0,0 +1,122 @@
+"""Catalog listing latency from SQL and from the memory-mapped snapshot.
+
+Builds a throwaway SQLite database with --units units spread over --teachers
+teachers and 20 categories, with ratings and enrollments, then times the
+listing endpoints with CATALOG_SNAPSHOT_ENABLED off and on, and how long an
+incremental refresh takes after one new rating.
+
+    python benchmarks/catalog.py [--units 2000] [--students 20000]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+URLS = (
+    '/api/units?page=3',
+    '/api/units?sort_by=rating',
+    '/api/units?sort_by=date&per_page=24',
+    '/api/units/category/Category%207',
+    '/api/units/latest',
+    '/api/units?categories=Category%203&categories=Category%207&min_rating=3',
+    '/api/units?teacher_id=5&has_open_enrollment=true&sort_by=date',
+)
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def populate(db, units, teachers, students):
+    from sqlalchemy import insert
+    from models import User, Unit, Enrollment, Rating
+
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    db.session.execute(insert(User), [{
+        'id': i + 1, 'username': f'teacher{i}', 'email': f'teacher{i}@example.com',
+        'password_hash': 'x', 'role': 'teacher'
+    } for i in range(teachers)])
+    db.session.execute(insert(User), [{
+        'id': teachers + i + 1, 'username': f'student{i}', 'email': f'student{i}@example.com',
+        'password_hash': 'x', 'role': 'student'
+    } for i in range(students)])
+    starts = [now + timedelta(days=rng.randrange(-365, 365)) for _ in range(units)]
+    db.session.execute(insert(Unit), [{
+        'id': u + 1, 'title': f'Unit {rng.randrange(10 ** 6):06d}', 'description': 'About this unit. ' * 10,
+        'category': f'Category {u % 20}', 'teacher_id': u % teachers + 1,
+        'start_date': starts[u], 'end_date': starts[u] + timedelta(days=90), 'created_at': now - timedelta(minutes=u)
+    } for u in range(units)])
+    db.session.execute(insert(Enrollment), [{
+        'student_id': teachers + i + 1, 'unit_id': rng.randrange(units) + 1, 'enrollment_date': now
+    } for i in range(students) for _ in range(5)])
+    db.session.execute(insert(Rating), [{
+        'student_id': teachers + i + 1, 'unit_id': rng.randrange(units) + 1, 'score': rng.randint(1, 5)
+    } for i in range(students)])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--units', type=int, default=2000)
+    parser.add_argument('--teachers', type=int, default=100)
+    parser.add_argument('--students', type=int, default=20000)
+    parser.add_argument('--runs', type=int, default=50)
+    args = parser.parse_args()
+
+    sys.path.insert(0, SERVER_DIR)
+    from app import create_app
+    from catalog_snapshot import catalog_snapshots
+    from database import db
+    from models import Rating
+
+    workdir = tempfile.mkdtemp()
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'CATALOG_SNAPSHOT_PATH': os.path.join(workdir, 'catalog.snapshot'),
+        'CHANGES_STAMP_FILE': os.path.join(workdir, 'changes.stamp'),
+        'ADMISSION_CONTROL_ENABLED': False,
+    })
+    with app.app_context():
+        db.create_all()
+        populate(db, args.units, args.teachers, args.students)
+
+    client = app.test_client()
+
+    def timed(url):
+        started = time.perf_counter()
+        response = client.get(url)
+        assert response.status_code == 200, response.data
+        response.close()
+        return (time.perf_counter() - started) * 1000
+
+    def wait_for_snapshot():
+        started = time.perf_counter()
+        while catalog_snapshots.current() is None:
+            time.sleep(0.001)
+        return (time.perf_counter() - started) * 1000
+
+    catalog_snapshots.enabled = False
+    sql = {url: [timed(url) for _ in range(args.runs)] for url in URLS}
+    catalog_snapshots.enabled = True
+    print(f'initial build: {wait_for_snapshot():.1f}ms')
+    snapshot = {url: [timed(url) for _ in range(args.runs)] for url in URLS}
+
+    for url in URLS:
+        print(f'{url}: sql p50={percentile(sql[url], 50):.2f}ms, snapshot p50={percentile(snapshot[url], 50):.2f}ms')
+
+    with app.app_context():
+        db.session.add(Rating(student_id=args.teachers + 1, unit_id=1, score=5))
+        db.session.commit()
+    print(f'incremental refresh after a rating: {wait_for_snapshot():.1f}ms')
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,130 @@
+"""Student dashboard latency at scale, cache misses vs hits.
+
+Builds a throwaway SQLite database with --students students (five
+enrollments each), then requests dashboards through the Flask test client:
+first each sampled student once (all misses), then a mixed run where a share
+of requests are progress updates that invalidate the student's entry.
+
+    python benchmarks/dashboard.py [--students 50000] [--requests 20000]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def summary(label, latencies):
+    return (f'{label}: n={len(latencies)} p50={percentile(latencies, 50):.3f}ms '
+            f'p99={percentile(latencies, 99):.3f}ms max={max(latencies):.3f}ms')
+
+
+def populate(db, students, units_count=500, per_student=5):
+    from sqlalchemy import insert
+    from models import User, Unit, Enrollment
+
+    rng = random.Random(1)
+    now = datetime.utcnow()
+    teachers = 50
+    db.session.execute(insert(User), [{
+        'id': i + 1, 'username': f'teacher{i}', 'email': f'teacher{i}@example.com',
+        'password_hash': 'x', 'role': 'teacher'
+    } for i in range(teachers)])
+    db.session.execute(insert(User), [{
+        'id': teachers + i + 1, 'username': f'student{i}', 'email': f'student{i}@example.com',
+        'password_hash': 'x', 'role': 'student'
+    } for i in range(students)])
+    db.session.execute(insert(Unit), [{
+        'id': i + 1, 'title': f'Unit {i}', 'description': 'Benchmark unit', 'category': 'Bench',
+        'teacher_id': rng.randint(1, teachers)
+    } for i in range(units_count)])
+    db.session.execute(insert(Enrollment), [{
+        'student_id': teachers + i + 1,
+        'unit_id': unit_id,
+        'enrollment_date': now - timedelta(minutes=rng.randint(0, 500000)),
+        'progress': rng.choice((0, 40, 100)),
+        'grade': rng.random() if rng.random() < 0.5 else None,
+    } for i in range(students) for unit_id in rng.sample(range(1, units_count + 1), per_student)])
+    db.session.commit()
+    return list(range(teachers + 1, teachers + students + 1))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--students', type=int, default=50000)
+    parser.add_argument('--sample', type=int, default=2000, help='students taking part in the run')
+    parser.add_argument('--requests', type=int, default=20000)
+    parser.add_argument('--write-share', type=float, default=0.05, help='share of progress updates')
+    args = parser.parse_args()
+
+    sys.path.insert(0, SERVER_DIR)
+    from sqlalchemy import func
+    from app import create_app
+    from auth import generate_token
+    from cache import dashboard_cache
+    from database import db
+    from models import Enrollment
+    from progress_buffer import progress_buffer
+
+    workdir = tempfile.mkdtemp()
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'ADMISSION_CONTROL_ENABLED': False,
+    })
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        student_ids = populate(db, args.students)
+        print(f'populated {args.students} students in {time.perf_counter() - started:.1f}s')
+        sample = random.Random(2).sample(student_ids, min(args.sample, len(student_ids)))
+        tokens = {student_id: generate_token(student_id) for student_id in sample}
+        enrolled_unit = dict(
+            db.session.query(Enrollment.student_id, func.min(Enrollment.unit_id))
+            .filter(Enrollment.student_id.in_(sample))
+            .group_by(Enrollment.student_id)
+            .all()
+        )
+
+    client = app.test_client()
+
+    def dashboard(student_id):
+        started = time.perf_counter()
+        response = client.get(f'/api/student/dashboard/{student_id}',
+                              headers={'Authorization': 'Bearer ' + tokens[student_id]})
+        assert response.status_code == 200, response.data
+        return (time.perf_counter() - started) * 1000
+
+    misses = [dashboard(student_id) for student_id in sample]
+    print(summary('miss', misses))
+
+    rng = random.Random(3)
+    mixed = []
+    for _ in range(args.requests):
+        student_id = rng.choice(sample)
+        if rng.random() < args.write_share:
+            client.put(f'/api/student/units/{student_id}/{enrolled_unit[student_id]}/progress',
+                       headers={'Authorization': 'Bearer ' + tokens[student_id]},
+                       json={'progress': rng.randint(0, 100)})
+            continue
+        mixed.append(dashboard(student_id))
+    print(summary(f'mixed ({args.write_share:.0%} writes)', mixed))
+
+    print(dashboard_cache.metrics())
+    progress_buffer.stop()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,135 @@
+"""Submission similarity index at scale.
+
+Builds a throwaway SQLite database with --assignments assignments of
+--per-assignment submissions each (50,000 in total by default). Texts are
+random 120-word essays; --copy-share of them are copies of another student's
+text with a tenth of the words replaced. Reports the time to index
+everything, the cost of indexing one new submission, and per-assignment
+cluster query latency with the recall of the planted copies.
+
+    python benchmarks/similarity.py [--assignments 50] [--per-assignment 1000]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+WORDS = 120
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def essay(rng, vocabulary):
+    return ' '.join(rng.choice(vocabulary) for _ in range(WORDS))
+
+
+def rewrite(rng, text, vocabulary, share=0.1):
+    words = text.split()
+    for index in rng.sample(range(len(words)), int(len(words) * share)):
+        words[index] = rng.choice(vocabulary)
+    return ' '.join(words)
+
+
+def populate(db, assignments, per_assignment, copy_share):
+    """Insert the submissions; returns the planted (original, copy) id pairs per assignment."""
+    from sqlalchemy import insert
+    from models import User, Unit, Assignment, Submission, SubmissionContent
+    from text_codec import encode_text
+
+    rng = random.Random(1)
+    vocabulary = [f'word{i}' for i in range(5000)]
+    now = datetime.utcnow()
+    db.session.execute(insert(User), [{
+        'id': 1, 'username': 'teacher', 'email': 'teacher@example.com', 'password_hash': 'x', 'role': 'teacher'
+    }])
+    db.session.execute(insert(User), [{
+        'id': i + 2, 'username': f'student{i}', 'email': f'student{i}@example.com',
+        'password_hash': 'x', 'role': 'student'
+    } for i in range(per_assignment)])
+    db.session.execute(insert(Unit), [{'id': 1, 'title': 'Large unit', 'teacher_id': 1}])
+    db.session.execute(insert(Assignment), [{
+        'id': a + 1, 'unit_id': 1, 'title': f'Assignment {a + 1}', 'max_score': 100.0
+    } for a in range(assignments)])
+
+    planted = {}
+    submission_id = 0
+    for a in range(assignments):
+        rows, contents, texts = [], [], {}
+        planted[a + 1] = set()
+        for i in range(per_assignment):
+            submission_id += 1
+            if texts and rng.random() < copy_share:
+                original = rng.choice(list(texts))
+                text = rewrite(rng, texts[original], vocabulary)
+                planted[a + 1].add((original, submission_id))
+            else:
+                text = essay(rng, vocabulary)
+            texts[submission_id] = text
+            rows.append({'id': submission_id, 'assignment_id': a + 1, 'student_id': i + 2, 'submitted_at': now})
+            contents.append(dict(zip(('encoding', 'size', 'data'), encode_text(text)), submission_id=submission_id))
+        db.session.execute(insert(Submission), rows)
+        db.session.execute(insert(SubmissionContent), contents)
+    db.session.commit()
+    return planted
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--assignments', type=int, default=50)
+    parser.add_argument('--per-assignment', type=int, default=1000)
+    parser.add_argument('--copy-share', type=float, default=0.02)
+    args = parser.parse_args()
+
+    sys.path.insert(0, SERVER_DIR)
+    from app import create_app
+    from database import db
+    from models import Submission
+    from similarity import candidate_pairs, index_submission, rebuild_similarity_index, similar_clusters
+
+    workdir = tempfile.mkdtemp()
+    app = create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}"})
+    with app.app_context():
+        db.create_all()
+        planted = populate(db, args.assignments, args.per_assignment, args.copy_share)
+        total = args.assignments * args.per_assignment
+
+        started = time.perf_counter()
+        rebuild_similarity_index()
+        elapsed = time.perf_counter() - started
+        print(f'indexed {total} submissions in {elapsed:.1f}s ({total / elapsed:.0f}/s)')
+
+        incremental = []
+        for submission in Submission.query.filter_by(assignment_id=1).limit(200).all():
+            started = time.perf_counter()
+            index_submission(submission)
+            incremental.append((time.perf_counter() - started) * 1000)
+        print(f'index one submission: p50={percentile(incremental, 50):.2f}ms '
+              f'max={max(incremental):.2f}ms')
+
+        latencies, candidates, found, expected = [], 0, 0, 0
+        for assignment_id, pairs in planted.items():
+            started = time.perf_counter()
+            clusters = similar_clusters(assignment_id)
+            latencies.append((time.perf_counter() - started) * 1000)
+            candidates += len(candidate_pairs(assignment_id))
+            reported = {tuple(pair['submission_ids']) for cluster in clusters for pair in cluster['pairs']}
+            found += len(pairs & reported)
+            expected += len(pairs)
+
+        all_pairs = args.assignments * args.per_assignment * (args.per_assignment - 1) // 2
+        print(f'clusters per assignment: p50={percentile(latencies, 50):.1f}ms max={max(latencies):.1f}ms')
+        print(f'candidate pairs checked: {candidates} of {all_pairs} possible')
+        print(f'planted copies found: {found}/{expected}')
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
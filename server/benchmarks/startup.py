@@ -0,0 +1,54 @@
+"""Cold start time and memory of a freshly booted worker.
+
+Each run spawns a new interpreter that imports the app module and calls
+create_app(), which is what a gunicorn worker does on boot.
+
+    python benchmarks/startup.py [--runs 10]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+CHILD = """
+import json, resource, sys, time
+started = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+app = create_app()
+created = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'create_app_ms': (created - imported) * 1000,
+    'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss,
+    'heavy_modules': sorted(m for m in ('alembic', 'bcrypt', 'jwt', 'flask_restful') if m in sys.modules),
+}))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    results = []
+    for _ in range(args.runs):
+        output = subprocess.run(
+            [sys.executable, '-c', CHILD], cwd=SERVER_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    print(f"runs={args.runs}")
+    for key in ('import_ms', 'create_app_ms'):
+        values = [result[key] for result in results]
+        print(f"{key}: median={statistics.median(values):.1f} min={min(values):.1f} max={max(values):.1f}")
+    print(f"max_rss_kb: median={statistics.median(result['max_rss_kb'] for result in results):.0f}")
+    print(f"heavy modules loaded at startup: {', '.join(results[0]['heavy_modules']) or 'none'}")
+
+
+if __name__ == '__main__':
+    main()
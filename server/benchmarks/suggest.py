@@ -0,0 +1,120 @@
+"""Typeahead lookups over a large catalog.
+
+Builds a throwaway SQLite database with --units units titled with three to
+six words from a random vocabulary, --teachers teachers and enrollments,
+then reports how long the first lookup takes to load the index, how much
+memory its arrays use, and lookup latency for random prefixes of one to six
+letters, before and after --new-units units are added one by one.
+
+    python benchmarks/suggest.py [--units 1000000] [--new-units 2000]
+"""
+import argparse
+import os
+import random
+import shutil
+import string
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def word(rng):
+    return ''.join(rng.choice(string.ascii_lowercase) for _ in range(rng.randint(3, 10)))
+
+
+def populate(db, rng, units, teachers, vocabulary):
+    from sqlalchemy import insert
+    from models import User, Unit, Enrollment
+
+    db.session.execute(insert(User), [{
+        'id': i + 1, 'username': f'{word(rng)}{i}', 'email': f'teacher{i}@example.com',
+        'password_hash': 'x', 'role': 'teacher'
+    } for i in range(teachers)])
+    for start in range(0, units, 100000):
+        db.session.execute(insert(Unit), [{
+            'id': u + 1, 'title': ' '.join(rng.choice(vocabulary) for _ in range(rng.randint(3, 6))).title(),
+            'description': '', 'category': f'Category {u % 50}', 'teacher_id': u % teachers + 1
+        } for u in range(start, min(start + 100000, units))])
+    db.session.execute(insert(Enrollment), [{
+        'student_id': teachers + 1, 'unit_id': int(rng.paretovariate(1.2)) % units + 1
+    } for _ in range(units)])
+    db.session.commit()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--units', type=int, default=1000000)
+    parser.add_argument('--teachers', type=int, default=5000)
+    parser.add_argument('--vocabulary', type=int, default=20000)
+    parser.add_argument('--new-units', type=int, default=2000)
+    parser.add_argument('--lookups', type=int, default=2000)
+    args = parser.parse_args()
+
+    sys.path.insert(0, SERVER_DIR)
+    from app import create_app
+    from database import db
+    from models import Unit
+    from suggest import suggestions
+
+    rng = random.Random(1)
+    vocabulary = [word(rng) for _ in range(args.vocabulary)]
+    workdir = tempfile.mkdtemp()
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'CATALOG_SNAPSHOT_ENABLED': False,
+        'CHANGES_STAMP_FILE': os.path.join(workdir, 'changes.stamp'),
+        'ADMISSION_CONTROL_ENABLED': False,
+    })
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        populate(db, rng, args.units, args.teachers, vocabulary)
+        print(f'populated {args.units} units in {time.perf_counter() - started:.1f}s')
+
+        started = time.perf_counter()
+        suggestions.suggest('a', 5)
+        print(f'first lookup (loads the index): {time.perf_counter() - started:.2f}s')
+        units = suggestions.units.base
+        size = len(units.text) + sum(array.nbytes for array in (units.ids, units.offsets, units.starts, units.items))
+        size += suggestions.units.popularity.nbytes
+        print(f'unit index: {len(units)} titles, {len(units.starts)} words, {size / 2 ** 20:.1f} MiB')
+
+        def lookups():
+            timings = {}
+            for length in range(1, 7):
+                prefixes = [rng.choice(vocabulary)[:length] for _ in range(args.lookups // 6)]
+                samples = []
+                for prefix in prefixes:
+                    started = time.perf_counter()
+                    suggestions.suggest(prefix, 5)
+                    samples.append((time.perf_counter() - started) * 1000)
+                timings[length] = samples
+            for length, samples in timings.items():
+                print(f'  {length} letters: p50={percentile(samples, 50):.3f}ms p99={percentile(samples, 99):.3f}ms')
+
+        print('lookups:')
+        lookups()
+
+        for i in range(args.new_units):
+            db.session.add(Unit(title=f'{rng.choice(vocabulary)} {rng.choice(vocabulary)}'.title(),
+                                category='Category 0', teacher_id=1))
+            db.session.commit()
+            suggestions.suggest(vocabulary[i % len(vocabulary)][:3], 5)
+        time.sleep(0.1)
+        while suggestions.metrics()['units']['recent'] > suggestions.max_recent:
+            time.sleep(0.1)
+        print(f'after {args.new_units} new units: {suggestions.metrics()}')
+        print('lookups:')
+        lookups()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
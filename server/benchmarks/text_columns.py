@@ -0,0 +1,135 @@
+"""Deferred long-text columns and compressed submission text.
+
+Builds a throwaway SQLite database with --units units with long
+descriptions, teachers with bios, enrollments with feedback and --submissions
+essay-like submissions, then reports the bytes each table takes on disk
+(from dbstat), how much the stored submission text shrank, and ORM load
+times for units, enrollments and submissions with the long columns deferred
+and with them undeferred, as every fetch loaded them before.
+
+    python benchmarks/text_columns.py [--units 20000] [--submissions 50000]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def prose(rng, vocabulary, words):
+    sentences, left = [], words
+    while left > 0:
+        length = min(left, rng.randint(6, 18))
+        sentences.append(' '.join(rng.choice(vocabulary) for _ in range(length)).capitalize() + '.')
+        left -= length
+    return ' '.join(sentences)
+
+
+def populate(db, rng, args):
+    from sqlalchemy import insert
+    from models import User, Unit, Enrollment, Assignment, Submission, SubmissionContent
+    from text_codec import encode_text
+
+    vocabulary = [''.join(rng.choice('abcdefghijklmnopqrstuvwxyz') for _ in range(rng.randint(2, 9)))
+                  for _ in range(3000)]
+    teachers, students = args.units // 20 + 1, args.submissions // 10 + 1
+    db.session.execute(insert(User), [{
+        'id': i + 1, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+        'role': 'teacher' if i < teachers else 'student', 'bio': prose(rng, vocabulary, 80),
+        'qualifications': prose(rng, vocabulary, 30),
+    } for i in range(teachers + students)])
+    db.session.execute(insert(Unit), [{
+        'id': u + 1, 'title': f'Unit {u}', 'description': prose(rng, vocabulary, 300),
+        'category': f'Category {u % 20}', 'teacher_id': u % teachers + 1,
+    } for u in range(args.units)])
+    db.session.execute(insert(Enrollment), [{
+        'student_id': teachers + i % students + 1, 'unit_id': rng.randrange(args.units) + 1,
+        'feedback': prose(rng, vocabulary, 40),
+    } for i in range(args.submissions)])
+    db.session.execute(insert(Assignment), [{
+        'id': a + 1, 'unit_id': a + 1, 'title': f'Assignment {a}',
+    } for a in range(args.units)])
+    raw = 0
+    for start in range(0, args.submissions, 10000):
+        rows, contents = [], []
+        for s in range(start, min(start + 10000, args.submissions)):
+            text = prose(rng, vocabulary, rng.randint(100, 800))
+            raw += len(text.encode('utf-8'))
+            rows.append({'id': s + 1, 'assignment_id': s % args.units + 1, 'student_id': teachers + s % students + 1,
+                         'grade': rng.uniform(0, 100), 'feedback': prose(rng, vocabulary, 20)})
+            contents.append(dict(zip(('encoding', 'size', 'data'), encode_text(text)), submission_id=s + 1))
+        db.session.execute(insert(Submission), rows)
+        db.session.execute(insert(SubmissionContent), contents)
+    db.session.commit()
+    return raw
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--units', type=int, default=20000)
+    parser.add_argument('--submissions', type=int, default=50000)
+    parser.add_argument('--runs', type=int, default=10)
+    args = parser.parse_args()
+
+    sys.path.insert(0, SERVER_DIR)
+    from sqlalchemy import text
+    from sqlalchemy.orm import selectinload, undefer
+    from app import create_app
+    from database import db
+    from models import Unit, Enrollment, Submission
+
+    workdir = tempfile.mkdtemp()
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'CATALOG_SNAPSHOT_ENABLED': False,
+        'CHANGES_STAMP_FILE': os.path.join(workdir, 'changes.stamp'),
+        'ADMISSION_CONTROL_ENABLED': False,
+    })
+    with app.app_context():
+        db.create_all()
+        raw = populate(db, random.Random(1), args)
+        db.session.execute(text('VACUUM'))
+
+        sizes = dict(db.session.execute(text(
+            "SELECT name, sum(pgsize) FROM dbstat WHERE name IN "
+            "('unit', 'user', 'enrollment', 'submission', 'submission_content') GROUP BY name"
+        )).all())
+        for name, size in sorted(sizes.items()):
+            print(f'{name}: {size / 2 ** 20:.1f} MiB')
+        stored = db.session.execute(text('SELECT sum(length(data)) FROM submission_content')).scalar()
+        print(f'submission text: {raw / 2 ** 20:.1f} MiB raw, {stored / 2 ** 20:.1f} MiB stored '
+              f'({stored / raw:.0%})')
+        print(f'database file: {os.path.getsize(os.path.join(workdir, "bench.db")) / 2 ** 20:.1f} MiB')
+
+        def timed(query):
+            samples = []
+            for _ in range(args.runs):
+                db.session.expunge_all()
+                started = time.perf_counter()
+                query.all()
+                samples.append((time.perf_counter() - started) * 1000)
+            return percentile(samples, 50)
+
+        cases = (
+            ('units', Unit.query, Unit.query.options(undefer(Unit.description))),
+            ('enrollments', Enrollment.query, Enrollment.query.options(undefer(Enrollment.feedback))),
+            ('submissions', Submission.query,
+             Submission.query.options(undefer(Submission.feedback), selectinload(Submission.content))),
+        )
+        for name, deferred, undeferred in cases:
+            print(f'load all {name}: deferred p50={timed(deferred):.1f}ms, '
+                  f'undeferred p50={timed(undeferred):.1f}ms')
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
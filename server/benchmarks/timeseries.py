@@ -0,0 +1,121 @@
+"""Metric time series appends, range queries and compaction.
+
+Builds a throwaway SQLite database and appends --days days of progress points
+for --students students in --units units each, in batches shaped like
+progress buffer flushes. It then reports append throughput, bytes per raw
+point and per rollup on disk (from dbstat), series() latency at each
+resolution, and how long compaction takes and how much it deletes.
+
+    python benchmarks/timeseries.py [--students 1000] [--units 5] [--days 120]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--students', type=int, default=1000)
+    parser.add_argument('--units', type=int, default=5)
+    parser.add_argument('--days', type=int, default=120)
+    parser.add_argument('--points-per-day', type=int, default=4)
+    parser.add_argument('--batch', type=int, default=1000)
+    parser.add_argument('--lookups', type=int, default=500)
+    args = parser.parse_args()
+
+    sys.path.insert(0, SERVER_DIR)
+    from sqlalchemy import insert, text
+    from app import create_app
+    from database import db
+    from models import User, Unit
+    from timeseries import DAY, METRICS, RESOLUTIONS, timeseries
+
+    workdir = tempfile.mkdtemp()
+    app = create_app({
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(workdir, 'bench.db')}",
+        'CATALOG_SNAPSHOT_ENABLED': False,
+        'CHANGES_STAMP_FILE': os.path.join(workdir, 'changes.stamp'),
+        'ADMISSION_CONTROL_ENABLED': False,
+    })
+    rng = random.Random(1)
+    progress = METRICS['progress']
+    with app.app_context():
+        db.create_all()
+        db.session.execute(insert(User), [{
+            'id': i + 1, 'username': f'user{i}', 'email': f'user{i}@example.com', 'password_hash': 'x',
+            'role': 'student' if i else 'teacher'
+        } for i in range(args.students + 1)])
+        db.session.execute(insert(Unit), [{
+            'id': u + 1, 'title': f'Unit {u}', 'teacher_id': 1
+        } for u in range(args.units)])
+        db.session.commit()
+
+        # Points arrive in time order, as they do from the progress buffer
+        start = int(time.time()) - args.days * DAY
+        step = DAY // args.points_per_day
+        points = (
+            (student_id, unit_id, progress, start + tick * step + rng.randrange(step), rng.randint(0, 100))
+            for tick in range(args.days * args.points_per_day)
+            for student_id in range(2, args.students + 2)
+            for unit_id in range(1, args.units + 1)
+        )
+        total = args.days * args.points_per_day * args.students * args.units
+        started = time.perf_counter()
+        batch = []
+        for point in points:
+            batch.append(point)
+            if len(batch) == args.batch:
+                timeseries.append(batch)
+                db.session.commit()
+                batch = []
+        timeseries.append(batch)
+        db.session.commit()
+        elapsed = time.perf_counter() - started
+        print(f'appended {total} points in {elapsed:.1f}s ({total / elapsed:.0f}/s, with rollups)')
+
+        def sizes():
+            rows = db.session.execute(text(
+                "SELECT name, sum(pgsize) FROM dbstat WHERE name IN ('metric_point', 'metric_rollup') GROUP BY name"
+            )).all()
+            counts = {
+                'metric_point': db.session.execute(text('SELECT count(*) FROM metric_point')).scalar(),
+                'metric_rollup': db.session.execute(text('SELECT count(*) FROM metric_rollup')).scalar(),
+            }
+            for name, size in rows:
+                print(f'  {name}: {counts[name]} rows, {size / 2 ** 20:.1f} MiB, '
+                      f'{size / max(counts[name], 1):.1f} bytes/row')
+
+        print('on disk:')
+        sizes()
+
+        for name, resolution in RESOLUTIONS.items():
+            samples = []
+            for _ in range(args.lookups):
+                student_id = rng.randrange(args.students) + 2
+                started = time.perf_counter()
+                series = timeseries.series(student_id, progress, resolution)
+                series.by_unit()
+                samples.append((time.perf_counter() - started) * 1000)
+            print(f'series {name} ({len(series.values)} values): p50={percentile(samples, 50):.2f}ms '
+                  f'p99={percentile(samples, 99):.2f}ms')
+
+        started = time.perf_counter()
+        deleted = timeseries.compact()
+        print(f'compact: {deleted} in {time.perf_counter() - started:.1f}s')
+        sizes()
+    shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,138 @@
+"""Small in-process result caches for per-user read models.
+
+Each ResultCache is an LRU dict with a TTL. Entries are invalidated by
+``invalidate_changes``, which changes.py calls with every committed change
+to the data behind them, in this worker or any other. The TTL only bounds
+how long unused entries are kept.
+
+A value computed while an invalidation for its key happened is not stored:
+``generation(key)`` is read before computing and handed back to ``set``.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+caches = {}
+
+
+class ResultCache:
+    def __init__(self, name, ttl=30, max_entries=50000):
+        self.name = name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        # key -> value of _counter at its last invalidation; keys never invalidated
+        # since the map was last cleared report _floor
+        self._generations = {}
+        self._counter = 0
+        self._floor = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        caches[name] = self
+
+    def init_app(self, app):
+        prefix = self.name.upper()
+        self.ttl = app.config.get(f'{prefix}_CACHE_TTL_SECONDS', self.ttl)
+        self.max_entries = app.config.get(f'{prefix}_CACHE_MAX_ENTRIES', self.max_entries)
+        self.clear()
+        app.extensions[f'{self.name}_cache'] = self
+
+    def get(self, key):
+        """The cached value, or None."""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] <= now:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def generation(self, key):
+        with self._lock:
+            return self._generations.get(key, self._floor)
+
+    def set(self, key, value, generation=None):
+        if not self.ttl:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generations.get(key, self._floor):
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._counter += 1
+            if len(self._generations) >= self.max_entries:
+                self._generations.clear()
+                self._floor = self._counter
+            self._generations[key] = self._counter
+            self.invalidations += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generations.clear()
+            self._counter += 1
+            self._floor = self._counter
+
+    def metrics(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'invalidations': self.invalidations,
+            }
+
+
+dashboard_cache = ResultCache('dashboard')
+analytics_cache = ResultCache('analytics', ttl=300, max_entries=1000)
+# Catalog facet counts per filter set, see catalog_filters.py; the TTL also
+# bounds how long has_open_enrollment counts lag units reaching their end date
+facets_cache = ResultCache('facets', ttl=60, max_entries=5000)
+
+
+def _invalidate(cache, key):
+    # A change without a key may have touched any entry
+    if key is None:
+        cache.clear()
+    else:
+        cache.invalidate(key)
+
+
+def invalidate_changes(changes):
+    """Drop the entries affected by committed changes, see changes.py."""
+    for change in changes:
+        if change.entity is None:
+            for cache in caches.values():
+                cache.clear()
+        elif change.entity == 'enrollment':
+            # Dashboards are keyed by student, analytics by unit
+            _invalidate(dashboard_cache, change.user_id)
+            _invalidate(analytics_cache, change.unit_id)
+        elif change.entity == 'progress':
+            _invalidate(dashboard_cache, change.user_id)
+        elif change.entity == 'submission':
+            _invalidate(analytics_cache, change.unit_id)
+        elif change.entity == 'rating':
+            facets_cache.clear()
+        elif change.entity == 'unit':
+            facets_cache.clear()
+            if change.op != 'insert':
+                # Unit titles show on the dashboard of every enrolled student
+                dashboard_cache.clear()
+                _invalidate(analytics_cache, change.unit_id)
+        elif change.entity == 'user' and change.op != 'insert':
+            # Student names are listed in analytics
+            analytics_cache.clear()
@@ -0,0 +1,184 @@
+"""Combined filters and facet counts for the /api/units listing.
+
+/api/units accepts any mix of these query parameters:
+
+- ``categories`` (or ``categories[]``), repeated: units in any of them
+- ``teacher_id``: units taught by that teacher
+- ``start_date`` and ``end_date`` (YYYY-MM-DD): units starting on or after
+  ``start_date`` and ending on or before ``end_date``
+- ``min_rating``: units with an average rating of at least this (unrated
+  units count as 0)
+- ``has_open_enrollment`` (true/false): units that have not ended yet, that
+  is without an end date or ending today or later, or only those that have
+
+When one of them, or ``facets=true``, is given the response also has
+``facets``: unit counts per category, under every filter except the
+categories, and per rating bucket (units rated at least 4, 3, 2 and 1), under
+every filter except min_rating, so a client can show how many units each
+choice would leave. Facets are cached per filter set in ``facets_cache``,
+which changes.py clears on every unit and rating change.
+
+While the catalog snapshot is current the filters are boolean masks over its
+arrays and the facets are counts over them; otherwise the same filters are
+WHERE clauses, backed by the composite indexes on Unit and Rating, and the
+facets are two grouped queries. Statements are plain select() so asgi.py runs
+them on its async engine.
+"""
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import Integer, cast, func, or_, select
+
+from catalog_snapshot import NULL_TIME, _micros
+from models import Unit
+
+FILTER_PARAMS = (
+    'categories', 'categories[]', 'teacher_id', 'start_date', 'end_date', 'min_rating', 'has_open_enrollment',
+)
+RATING_BUCKETS = (4, 3, 2, 1)
+
+UnitFilters = namedtuple('UnitFilters', 'categories teacher_id start_date end_date min_rating open_enrollment')
+
+
+class FilterError(ValueError):
+    """A filter parameter that cannot be parsed."""
+
+
+def _date(args, name):
+    value = args.get(name)
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, '%Y-%m-%d')
+    except ValueError:
+        raise FilterError(f'Invalid {name}. Use YYYY-MM-DD')
+
+
+def parse_filters(args):
+    """The UnitFilters in request ``args`` (a MultiDict), or None when the listing is unfiltered."""
+    if not any(name in args for name in FILTER_PARAMS) and args.get('facets', '').lower() != 'true':
+        return None
+
+    categories = tuple(sorted({
+        category for name in ('categories', 'categories[]') for category in args.getlist(name) if category
+    }))
+    try:
+        teacher_id = int(args['teacher_id']) if args.get('teacher_id') else None
+    except ValueError:
+        raise FilterError('teacher_id must be an integer')
+    try:
+        min_rating = float(args['min_rating']) if args.get('min_rating') else None
+    except ValueError:
+        raise FilterError('min_rating must be a number')
+    if min_rating is not None and not 0 <= min_rating <= 5:
+        raise FilterError('min_rating must be between 0 and 5')
+
+    open_enrollment = args.get('has_open_enrollment', '').lower()
+    if open_enrollment not in ('', 'true', 'false', '1', '0'):
+        raise FilterError('has_open_enrollment must be true or false')
+
+    start_date, end_date = _date(args, 'start_date'), _date(args, 'end_date')
+    if start_date and end_date and end_date < start_date:
+        raise FilterError('end_date must be after start_date')
+    return UnitFilters(
+        categories=categories,
+        teacher_id=teacher_id,
+        start_date=start_date,
+        # Inclusive: anything ending before the next day
+        end_date=end_date + timedelta(days=1) if end_date else None,
+        min_rating=min_rating,
+        open_enrollment=open_enrollment in ('true', '1') if open_enrollment else None,
+    )
+
+
+def _today():
+    now = datetime.utcnow()
+    return datetime(now.year, now.month, now.day)
+
+
+def filter_clauses(filters, skip=None):
+    """WHERE clauses for ``filters``, leaving out the 'categories' or 'rating' one when ``skip`` names it."""
+    clauses = []
+    if filters.categories and skip != 'categories':
+        clauses.append(Unit.category.in_(filters.categories))
+    if filters.teacher_id is not None:
+        clauses.append(Unit.teacher_id == filters.teacher_id)
+    if filters.start_date is not None:
+        clauses.append(Unit.start_date >= filters.start_date)
+    if filters.end_date is not None:
+        clauses.append(Unit.end_date < filters.end_date)
+    if filters.open_enrollment is not None:
+        today = _today()
+        clauses.append(
+            or_(Unit.end_date.is_(None), Unit.end_date >= today) if filters.open_enrollment
+            else Unit.end_date < today
+        )
+    if filters.min_rating and skip != 'rating':
+        clauses.append(func.coalesce(Unit.average_rating, 0.0) >= filters.min_rating)
+    return clauses
+
+
+def category_facet_statement(filters):
+    return select(Unit.category, func.count(Unit.id))\
+        .where(*filter_clauses(filters, skip='categories'))\
+        .group_by(Unit.category)
+
+
+def rating_facet_statement(filters):
+    """(whole stars, units) pairs; the average is cast to an integer, which floors it."""
+    ratings = select(func.coalesce(Unit.average_rating, 0.0).label('rating'))\
+        .select_from(Unit)\
+        .where(*filter_clauses(filters, skip='rating'))\
+        .subquery()
+    stars = cast(ratings.c.rating, Integer)
+    return select(stars, func.count()).group_by(stars)
+
+
+def facets_from_rows(category_rows, rating_rows):
+    """The ``facets`` dict from the rows of the two facet statements."""
+    return {
+        'categories': {category: count for category, count in sorted(category_rows) if category},
+        'rating': {
+            str(bucket): sum(count for stars, count in rating_rows if stars >= bucket) for bucket in RATING_BUCKETS
+        },
+    }
+
+
+def snapshot_mask(snapshot, filters, skip=None):
+    """filter_clauses() as a boolean array over the units of a CatalogSnapshot."""
+    import numpy as np
+
+    arrays = snapshot.arrays
+    mask = np.ones(len(snapshot), dtype=bool)
+    if filters.categories and skip != 'categories':
+        codes = [snapshot.category_code(category) for category in filters.categories]
+        mask &= np.isin(arrays['category'], [code for code in codes if code is not None])
+    if filters.teacher_id is not None:
+        mask &= arrays['teacher_id'] == filters.teacher_id
+    if filters.start_date is not None:
+        # NULL_TIME sorts below every date, so units without one never match
+        mask &= arrays['start_date'] >= _micros(filters.start_date)
+    if filters.end_date is not None:
+        mask &= (arrays['end_date'] != NULL_TIME) & (arrays['end_date'] < _micros(filters.end_date))
+    if filters.open_enrollment is not None:
+        ended = (arrays['end_date'] != NULL_TIME) & (arrays['end_date'] < _micros(_today()))
+        mask &= ~ended if filters.open_enrollment else ended
+    if filters.min_rating and skip != 'rating':
+        mask &= arrays['average_rating'] >= filters.min_rating
+    return mask
+
+
+def snapshot_facets(snapshot, filters):
+    """facets_from_rows() computed from a CatalogSnapshot."""
+    import numpy as np
+
+    arrays = snapshot.arrays
+    codes = arrays['category'][snapshot_mask(snapshot, filters, skip='categories')]
+    counts = np.bincount(codes[codes >= 0], minlength=len(snapshot.categories))
+    ratings = arrays['average_rating'][snapshot_mask(snapshot, filters, skip='rating')]
+    return {
+        'categories': {
+            category: int(count) for category, count in zip(snapshot.categories, counts.tolist()) if count and category
+        },
+        'rating': {str(bucket): int(np.count_nonzero(ratings >= bucket)) for bucket in RATING_BUCKETS},
+    }
@@ -0,0 +1,417 @@
+"""Memory-mapped snapshot of the public unit catalog.
+
+The unit listings (/api/units, /api/units/category/<category> and
+/api/units/latest) show every unit with its teacher's name, rating aggregate
+and enrollment count, which SQL computes with correlated subqueries per unit.
+A snapshot holds all of that as NumPy arrays in one file: numeric columns,
+UTF-8 blobs with offsets for the text columns, and index arrays pre-sorted by
+title, start date, rating and creation date, each also grouped by category
+with per-category offsets. A page is a slice of one index array, and only
+the units on it are decoded.
+
+One process at a time, holding an flock on ``<path>.lock``, brings the
+snapshot up to date and publishes it by atomically replacing the file at
+CATALOG_SNAPSHOT_PATH. Every worker maps that file read-only, so the page
+cache holds a single copy. A snapshot records the change_event id it is
+current to. When changes.py hands this process a change to a unit, a rating,
+an enrollment count or a teacher's name, listings fall back to SQL until a
+background thread has refreshed the snapshot: it reads the catalog events
+since the published version and re-queries only the units they touch, or
+rebuilds everything when events were pruned or there are more than
+CATALOG_SNAPSHOT_MAX_CHANGES of them. numpy is imported on first use.
+"""
+import fcntl
+import hashlib
+import json
+import logging
+import mmap
+import os
+import struct
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import and_, func, or_, select
+
+from changes import DELETE, INSERT
+from database import db
+from models import ChangeEvent, Unit
+from queries import pagination_meta, unit_summary, unit_summary_select
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b'LMSCAT01'
+HEADER_START = len(MAGIC) + 8
+EPOCH = datetime(1970, 1, 1)
+NULL_TIME = -2 ** 63
+SORTS = ('title', 'date', 'rating')
+NUMBER_COLUMNS = {
+    'id': '<i8', 'teacher_id': '<i8', 'average_rating': '<f8', 'rating_count': '<i8', 'total_enrolled': '<i8',
+}
+TEXT_COLUMNS = ('title', 'description', 'teacher_name')
+TIME_COLUMNS = ('start_date', 'end_date', 'created_at')
+
+# Events that change what the listings show
+CATALOG_CHANGES = or_(
+    ChangeEvent.entity.in_(('unit', 'rating')),
+    and_(ChangeEvent.entity == 'enrollment', ChangeEvent.op.in_((INSERT, DELETE))),
+    and_(ChangeEvent.entity == 'user', ChangeEvent.op != INSERT),
+)
+
+
+def affects_catalog(change):
+    if change.entity in (None, 'unit', 'rating'):
+        return True
+    if change.entity == 'enrollment':
+        return change.op in (INSERT, DELETE)
+    return change.entity == 'user' and change.op != INSERT
+
+
+class UnitRecord:
+    """One unit of a snapshot, with the attributes unit_summary() reads from a row."""
+    __slots__ = (
+        'id', 'title', 'description', 'category', 'start_date', 'end_date', 'teacher_id', 'teacher_name',
+        'average_rating', 'rating_count', 'total_enrolled', 'created_at',
+    )
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            setattr(self, name, value)
+
+
+def catalog_statement():
+    return unit_summary_select().add_columns(Unit.created_at)
+
+
+def _micros(value):
+    return NULL_TIME if value is None else (value - EPOCH) // timedelta(microseconds=1)
+
+
+def _datetime(micros):
+    return None if micros == NULL_TIME else EPOCH + timedelta(microseconds=int(micros))
+
+
+def columns_from_rows(rows):
+    """Column name -> list of values, from rows of catalog_statement()."""
+    return {name: [getattr(row, name) for row in rows] for name in UnitRecord.__slots__}
+
+
+def encode(columns):
+    """The arrays of a snapshot of ``columns``, and the category names."""
+    import numpy as np
+
+    arrays = {name: np.array(columns[name], dtype=dtype) for name, dtype in NUMBER_COLUMNS.items()}
+    for name in TIME_COLUMNS:
+        arrays[name] = np.array([_micros(value) for value in columns[name]], dtype='<i8')
+    for name in TEXT_COLUMNS:
+        encoded = [value.encode('utf-8') if value is not None else b'' for value in columns[name]]
+        arrays[f'{name}_offsets'] = np.concatenate(([0], np.cumsum([len(value) for value in encoded]))).astype('<i8')
+        arrays[f'{name}_null'] = np.array([value is None for value in columns[name]], dtype=bool)
+        arrays[f'{name}_text'] = np.frombuffer(b''.join(encoded), dtype=np.uint8)
+    categories = sorted({category for category in columns['category'] if category is not None})
+    codes = {category: code for code, category in enumerate(categories)}
+    arrays['category'] = np.array([codes.get(category, -1) for category in columns['category']], dtype='<i4')
+
+    # Same orders as queries.order_units and the latest listing: NULLs last, ties by id
+    ids = arrays['id']
+    titles = columns['title']
+    orders = {
+        'title': np.array(sorted(range(len(ids)), key=lambda i: (titles[i], ids[i])), dtype='<i8'),
+        'date': np.lexsort((ids, -np.where(arrays['start_date'] == NULL_TIME, 0, arrays['start_date']),
+                            arrays['start_date'] == NULL_TIME)),
+        'rating': np.lexsort((ids, -arrays['average_rating'], arrays['rating_count'] == 0)),
+        'created': np.lexsort((ids, -np.where(arrays['created_at'] == NULL_TIME, 0, arrays['created_at']),
+                               arrays['created_at'] == NULL_TIME)),
+    }
+    for sort in SORTS:
+        order = orders[sort].astype('<i8')
+        arrays[f'order_{sort}'] = order
+        # Stable, so each category keeps the sort order; category i is at offsets[i]:offsets[i + 1]
+        grouped = order[np.argsort(arrays['category'][order], kind='stable')]
+        arrays[f'category_order_{sort}'] = grouped
+    arrays['order_created'] = orders['created'].astype('<i8')
+    grouped_codes = arrays['category'][arrays['category_order_title']]
+    arrays['category_offsets'] = np.searchsorted(grouped_codes, np.arange(len(categories) + 1)).astype('<i8')
+    return arrays, categories
+
+
+def write_snapshot(path, columns, version):
+    """Write a snapshot file next to ``path`` and move it into place."""
+    import numpy as np
+
+    arrays, categories = encode(columns)
+    layout, chunks, offset = {}, [], 0
+    for name, array in arrays.items():
+        data = np.ascontiguousarray(array).tobytes()
+        layout[name] = [array.dtype.str, len(array), offset]
+        padding = b'\0' * (-len(data) % 8)
+        chunks += [data, padding]
+        offset += len(data) + len(padding)
+    header = json.dumps({
+        'version': version,
+        'built_at': datetime.utcnow().isoformat(),
+        'categories': categories,
+        'arrays': layout,
+    }).encode('utf-8')
+    header += b' ' * (-(HEADER_START + len(header)) % 8)
+
+    temporary = f'{path}.{os.getpid()}.tmp'
+    with open(temporary, 'wb') as f:
+        f.write(MAGIC + struct.pack('<Q', len(header)) + header)
+        f.writelines(chunks)
+    os.replace(temporary, path)
+
+
+class CatalogSnapshot:
+    """A published snapshot file, mapped read-only."""
+
+    def __init__(self, path):
+        import numpy as np
+
+        with open(path, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self.file_id = (stat.st_ino, stat.st_mtime_ns)
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self._map[:len(MAGIC)] != MAGIC:
+            raise ValueError(f'{path} is not a catalog snapshot')
+        (header_length,) = struct.unpack_from('<Q', self._map, len(MAGIC))
+        meta = json.loads(self._map[HEADER_START:HEADER_START + header_length])
+        base = HEADER_START + header_length
+        self.version = meta['version']
+        self.built_at = meta['built_at']
+        self.categories = meta['categories']
+        self._category_codes = {category: code for code, category in enumerate(self.categories)}
+        self.arrays = {
+            name: np.frombuffer(self._map, dtype=dtype, count=length, offset=base + offset)
+            if length else np.empty(0, dtype=dtype)
+            for name, (dtype, length, offset) in meta['arrays'].items()
+        }
+
+    def __len__(self):
+        return len(self.arrays['id'])
+
+    def _text(self, name, index):
+        if self.arrays[f'{name}_null'][index]:
+            return None
+        offsets = self.arrays[f'{name}_offsets']
+        return self.arrays[f'{name}_text'][offsets[index]:offsets[index + 1]].tobytes().decode('utf-8')
+
+    def record(self, index):
+        arrays = self.arrays
+        code = int(arrays['category'][index])
+        return UnitRecord(
+            id=int(arrays['id'][index]),
+            title=self._text('title', index),
+            description=self._text('description', index),
+            category=self.categories[code] if code >= 0 else None,
+            start_date=_datetime(arrays['start_date'][index]),
+            end_date=_datetime(arrays['end_date'][index]),
+            teacher_id=int(arrays['teacher_id'][index]),
+            teacher_name=self._text('teacher_name', index),
+            average_rating=float(arrays['average_rating'][index]),
+            rating_count=int(arrays['rating_count'][index]),
+            total_enrolled=int(arrays['total_enrolled'][index]),
+            created_at=_datetime(arrays['created_at'][index]),
+        )
+
+    def columns(self):
+        """Column name -> list of values, as columns_from_rows() returns them."""
+        arrays = self.arrays
+        columns = {name: arrays[name].tolist() for name in NUMBER_COLUMNS}
+        columns.update({name: [_datetime(value) for value in arrays[name].tolist()] for name in TIME_COLUMNS})
+        for name in TEXT_COLUMNS:
+            text, offsets = arrays[f'{name}_text'].tobytes(), arrays[f'{name}_offsets'].tolist()
+            columns[name] = [
+                None if null else text[offsets[index]:offsets[index + 1]].decode('utf-8')
+                for index, null in enumerate(arrays[f'{name}_null'].tolist())
+            ]
+        columns['category'] = [self.categories[code] if code >= 0 else None for code in arrays['category'].tolist()]
+        return columns
+
+    def category_code(self, category):
+        """The value of the category array for ``category``, or None if no unit has it."""
+        return self._category_codes.get(category)
+
+    def ordered(self, sort_by, category=None):
+        """Indexes of the units in listing order, optionally of one category only."""
+        if sort_by not in SORTS:
+            sort_by = 'title'
+        if category is None:
+            return self.arrays[f'order_{sort_by}']
+        code = self.category_code(category)
+        if code is None:
+            return self.arrays[f'order_{sort_by}'][:0]
+        offsets = self.arrays['category_offsets']
+        return self.arrays[f'category_order_{sort_by}'][offsets[code]:offsets[code + 1]]
+
+    def unit_page(self, fields, page, per_page, sort_by, category=None, mask=None):
+        """The same dict as routes.catalog.unit_page, of the units selected by ``mask`` if given."""
+        order = self.ordered(sort_by, category)
+        if mask is not None:
+            order = order[mask[order]]
+        # OFFSET and LIMIT semantics: a negative offset is 0, a negative limit is none
+        start = max((page - 1) * per_page, 0)
+        stop = start + per_page if per_page >= 0 else len(order)
+        return dict(
+            units=[unit_summary(self.record(index), fields) for index in order[start:stop]],
+            **pagination_meta(len(order), page, per_page)
+        )
+
+    def latest(self, fields, limit):
+        return [unit_summary(self.record(index), fields) for index in self.arrays['order_created'][:limit]]
+
+
+class CatalogSnapshots:
+    def __init__(self):
+        self.enabled = False
+        self.path = None
+        self.max_changes = 500
+        self.refreshes = 0
+        self.rebuilds = 0
+        self._app = None
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread_pid = None
+        # Bumped for every catalog change this process applies
+        self._generation = 0
+        # (mapped snapshot, generation it is current for), replaced as one value
+        self._current = (None, -1)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('CATALOG_SNAPSHOT_ENABLED', True)
+        self.max_changes = app.config.get('CATALOG_SNAPSHOT_MAX_CHANGES', 500)
+        self.path = app.config.get('CATALOG_SNAPSHOT_PATH')
+        if not self.path:
+            # One snapshot per database, shared by every worker using it
+            uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+            self.path = os.path.join(
+                tempfile.gettempdir(), f'lms-catalog-{hashlib.sha1(uri.encode()).hexdigest()[:12]}.snapshot'
+            )
+        self._app = app
+        self._current = (None, -1)
+        app.extensions['catalog_snapshots'] = self
+
+    def on_changes(self, changes):
+        """changes.py handler: stop serving the snapshot until it includes these changes."""
+        if any(affects_catalog(change) for change in changes):
+            with self._lock:
+                self._generation += 1
+            self._wakeup.set()
+
+    def current(self):
+        """The snapshot, or None while it may miss a change this process has seen (use SQL then)."""
+        if not self.enabled:
+            return None
+        snapshot, generation = self._current
+        if snapshot is not None and generation == self._generation:
+            return snapshot
+        self._start()
+        self._wakeup.set()
+        return None
+
+    def _start(self):
+        # Per process and lazily, so workers forked after create_app() each get one
+        with self._lock:
+            if self._thread_pid == os.getpid():
+                return
+            self._thread_pid = os.getpid()
+        threading.Thread(target=self._run, name='catalog-snapshot', daemon=True).start()
+
+    def _run(self):
+        while True:
+            self._wakeup.wait()
+            self._wakeup.clear()
+            generation = self._generation
+            try:
+                with self._app.app_context():
+                    snapshot = self.refresh()
+            except Exception:
+                logger.exception('Could not refresh the catalog snapshot')
+                # Listings keep using SQL; the next one wakes this thread again
+                time.sleep(1)
+                continue
+            self._current = (snapshot, generation)
+
+    def _published(self):
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        snapshot = self._current[0]
+        if snapshot is not None and snapshot.file_id == (stat.st_ino, stat.st_mtime_ns):
+            return snapshot
+        try:
+            return CatalogSnapshot(self.path)
+        except (ValueError, KeyError, OSError):
+            logger.warning('Ignoring unreadable catalog snapshot %s', self.path)
+            return None
+
+    def refresh(self):
+        """Bring the published snapshot up to date and return it mapped."""
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        with open(self.path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            published = self._published()
+            with db.engine.connect() as connection:
+                # Read before the units, so the snapshot has at least every change up to it
+                version = connection.scalar(select(func.max(ChangeEvent.id))) or 0
+                columns = self._updated_columns(connection, published, version)
+            self.refreshes += 1
+            if columns is None:
+                return published
+            write_snapshot(self.path, columns, version)
+            return self._published()
+
+    def _updated_columns(self, connection, published, version):
+        """Columns for a new snapshot at ``version``, or None if ``published`` is current."""
+        if published is None or published.version > version:
+            return self._rebuild(connection)
+        if published.version == version:
+            return None
+        oldest = connection.scalar(select(func.min(ChangeEvent.id)))
+        if oldest is None or oldest > published.version + 1:
+            # Events after the published version were pruned
+            return self._rebuild(connection)
+        events = connection.execute(
+            select(ChangeEvent.entity, ChangeEvent.unit_id, ChangeEvent.user_id)
+            .where(ChangeEvent.id > published.version, ChangeEvent.id <= version, CATALOG_CHANGES)
+            .limit(self.max_changes + 1)
+        ).all()
+        if not events:
+            return None
+        if len(events) > self.max_changes:
+            return self._rebuild(connection)
+
+        unit_ids, teacher_ids = set(), set()
+        for entity, unit_id, user_id in events:
+            key, keys = (user_id, teacher_ids) if entity == 'user' else (unit_id, unit_ids)
+            if key is None:
+                return self._rebuild(connection)
+            keys.add(key)
+        columns = published.columns()
+        unit_ids.update(
+            unit_id for unit_id, teacher_id in zip(columns['id'], columns['teacher_id']) if teacher_id in teacher_ids
+        )
+        kept = [index for index, unit_id in enumerate(columns['id']) if unit_id not in unit_ids]
+        fresh = columns_from_rows(connection.execute(catalog_statement().where(Unit.id.in_(unit_ids))).all())
+        return {name: [values[index] for index in kept] + fresh[name] for name, values in columns.items()}
+
+    def _rebuild(self, connection):
+        self.rebuilds += 1
+        return columns_from_rows(connection.execute(catalog_statement()).all())
+
+    def metrics(self):
+        snapshot, generation = self._current
+        return {
+            'enabled': self.enabled,
+            'units': len(snapshot) if snapshot is not None else None,
+            'version': snapshot.version if snapshot is not None else None,
+            'built_at': snapshot.built_at if snapshot is not None else None,
+            'current': snapshot is not None and generation == self._generation,
+            'refreshes': self.refreshes,
+            'rebuilds': self.rebuilds,
+        }
+
+
+catalog_snapshots = CatalogSnapshots()
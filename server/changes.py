@@ -0,0 +1,247 @@
+"""Change feed that keeps in-process caches fresh across worker processes.
+
+Every insert, update and delete of a Unit, Enrollment, Rating, Submission or
+User that goes through the session is written as a compact row to the
+change_event table by an ``after_flush`` hook, inside the transaction that
+makes the change (a transactional outbox): an event exists exactly when its
+change was committed. Bulk UPDATE statements, which the hooks do not see,
+add their own rows with ``changes.record``.
+
+Event ids double as a version counter for the database. Each process keeps
+the id of the last event it applied and hands newer events to the subscribed
+handlers, which invalidate cache entries by unit and user id. So that idle
+requests do not query the table, every commit that wrote events also writes
+random bytes to a small memory-mapped stamp file (CHANGES_STAMP_FILE) shared
+by all processes on the host. At the start of a request a worker compares
+the stamp with the one it saw at its last catch-up, and only reads the events
+committed since then if it changed. A request therefore never reads a cache
+entry older than a write that finished before it started, whichever worker
+made the write. The worker that made a write also applies its events right
+after the commit.
+
+SQLite serialises writers, so ids are committed in order and without gaps. A
+gap means older events were pruned before this process read them; it then
+clears its caches instead of replaying, as it does when it is more than
+CHANGES_MAX_CATCH_UP events behind.
+"""
+import hashlib
+import logging
+import mmap
+import os
+import tempfile
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, event, func, insert, select
+from sqlalchemy.orm import Session
+
+from database import db
+from models import Assignment, ChangeEvent, Enrollment, Rating, Submission, Unit, User
+
+logger = logging.getLogger(__name__)
+
+Change = namedtuple('Change', 'id entity op entity_id unit_id user_id')
+# Handed to handlers when this process cannot tell what changed
+EVERYTHING = Change(None, None, None, None, None, None)
+
+INSERT = 'insert'
+UPDATE = 'update'
+DELETE = 'delete'
+SESSION_KEY = 'change_events'
+STAMP_SIZE = 8
+
+# Model -> (entity name, function returning the row's (unit_id, user_id))
+TRACKED = {
+    Unit: ('unit', lambda unit: (unit.id, unit.teacher_id)),
+    Enrollment: ('enrollment', lambda enrollment: (enrollment.unit_id, enrollment.student_id)),
+    Rating: ('rating', lambda rating: (rating.unit_id, rating.student_id)),
+    # The unit is looked up from the assignment in _after_flush
+    Submission: ('submission', lambda submission: (None, submission.student_id)),
+    User: ('user', lambda user: (None, user.id)),
+}
+
+
+def change(entity, op=UPDATE, entity_id=None, unit_id=None, user_id=None):
+    """An outbox row; a unit_id or user_id of None means every unit or user."""
+    return {
+        'entity': entity, 'op': op, 'entity_id': entity_id,
+        'unit_id': unit_id, 'user_id': user_id, 'created_at': datetime.utcnow()
+    }
+
+
+class ChangeBus:
+    def __init__(self):
+        self.handlers = []
+        self.max_catch_up = 1000
+        self.retention = timedelta(hours=1)
+        # Id of the newest event this process has applied
+        self.version = 0
+        self.applied = 0
+        self.resets = 0
+        self.catch_ups = 0
+        self._lock = threading.Lock()
+        self._listening = False
+        self._stamp = None
+        self._seen_stamp = None
+
+    def init_app(self, app):
+        self.max_catch_up = app.config.get('CHANGES_MAX_CATCH_UP', 1000)
+        self.retention = timedelta(minutes=app.config.get('CHANGES_RETENTION_MINUTES', 60))
+        self.version = 0
+        self._seen_stamp = None
+        path = app.config.get('CHANGES_STAMP_FILE')
+        if path is None:
+            # One stamp per database, so apps on other databases do not wake each other
+            uri = app.config.get('SQLALCHEMY_DATABASE_URI', '')
+            path = os.path.join(tempfile.gettempdir(), f'lms-changes-{hashlib.sha1(uri.encode()).hexdigest()[:12]}')
+        self._stamp = self._open_stamp(path) if path else None
+        app.before_request(self.catch_up)
+        if not self._listening:
+            event.listen(Session, 'after_flush', self._after_flush)
+            event.listen(Session, 'after_commit', self._after_commit)
+            event.listen(Session, 'after_rollback', self._after_rollback)
+            self._listening = True
+        app.extensions['changes'] = self
+
+    @staticmethod
+    def _open_stamp(path):
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        try:
+            if os.fstat(fd).st_size < STAMP_SIZE:
+                os.ftruncate(fd, STAMP_SIZE)
+            return mmap.mmap(fd, STAMP_SIZE)
+        finally:
+            os.close(fd)
+
+    def read_stamp(self):
+        return self._stamp[:] if self._stamp is not None else None
+
+    def is_current(self, stamp):
+        """Whether no events were committed since the catch-up that saw ``stamp``."""
+        return stamp is not None and stamp == self._seen_stamp
+
+    def notify(self):
+        """Tell every process that events were committed.
+
+        A fresh random value rather than a counter: any write makes the stamp
+        differ from what readers saw, without a lock between processes.
+        """
+        if self._stamp is not None:
+            self._stamp[:] = os.urandom(STAMP_SIZE)
+
+    def subscribe(self, handler):
+        """Call ``handler(changes)`` with every batch of changes applied in this process.
+
+        A change whose entity is None (``EVERYTHING``) means any cached data may be stale.
+        """
+        if handler not in self.handlers:
+            self.handlers.append(handler)
+
+    def record(self, *rows, connection=None):
+        """Write outbox rows for changes made by bulk statements.
+
+        The rows join the session's transaction, or ``connection``'s when one
+        is given; call ``notify()`` once that connection has committed.
+        """
+        if connection is not None:
+            connection.execute(insert(ChangeEvent.__table__), list(rows))
+        else:
+            self._write(db.session(), list(rows))
+
+    def _write(self, session, rows):
+        session.connection().execute(insert(ChangeEvent.__table__), rows)
+        session.info.setdefault(SESSION_KEY, []).extend(rows)
+
+    def _after_flush(self, session, flush_context):
+        rows, assignment_ids = [], {}
+        for objects, op in ((session.new, INSERT), (session.dirty, UPDATE), (session.deleted, DELETE)):
+            for obj in objects:
+                tracked = TRACKED.get(type(obj))
+                if tracked is None or (op == UPDATE and not session.is_modified(obj, include_collections=False)):
+                    continue
+                entity, keys = tracked
+                row = change(entity, op, obj.id, *keys(obj))
+                if entity == 'submission':
+                    assignment_ids[id(row)] = obj.assignment_id
+                rows.append(row)
+        if not rows:
+            return
+        if assignment_ids:
+            units = dict(session.connection().execute(
+                select(Assignment.id, Assignment.unit_id).where(Assignment.id.in_(set(assignment_ids.values())))
+            ).all())
+            for row in rows:
+                if id(row) in assignment_ids:
+                    row['unit_id'] = units.get(assignment_ids[id(row)])
+        self._write(session, rows)
+
+    def _after_commit(self, session):
+        rows = session.info.pop(SESSION_KEY, None)
+        if rows:
+            self.notify()
+            self._dispatch([Change(None, row['entity'], row['op'], row['entity_id'], row['unit_id'], row['user_id'])
+                            for row in rows])
+
+    def _after_rollback(self, session):
+        session.info.pop(SESSION_KEY, None)
+
+    def pending_statement(self, since):
+        """Events committed after ``since``; asgi.py runs it on its async engine."""
+        return select(
+            ChangeEvent.id, ChangeEvent.entity, ChangeEvent.op,
+            ChangeEvent.entity_id, ChangeEvent.unit_id, ChangeEvent.user_id
+        ).where(ChangeEvent.id > since).order_by(ChangeEvent.id).limit(self.max_catch_up + 1)
+
+    def catch_up(self):
+        """Apply the events other processes committed since the last call."""
+        stamp = self.read_stamp()
+        if self.is_current(stamp):
+            return
+        since = self.version
+        # A connection of its own, so long-lived responses do not hold one
+        with db.engine.connect() as connection:
+            rows = connection.execute(self.pending_statement(since)).all()
+        self.apply(since, rows, stamp)
+
+    def apply(self, since, rows, stamp=None):
+        """Apply the rows of ``pending_statement(since)``; ``stamp`` is the one read before running it."""
+        self.catch_ups += 1
+        if rows:
+            if len(rows) > self.max_catch_up or rows[0].id != since + 1:
+                # Too far behind to replay, or events were pruned before this process read them
+                self._reset()
+            else:
+                self._dispatch([Change(*row) for row in rows])
+            with self._lock:
+                self.version = max(self.version, rows[-1].id)
+        if stamp is not None and len(rows) <= self.max_catch_up:
+            self._seen_stamp = stamp
+
+    def _dispatch(self, changes):
+        for handler in self.handlers:
+            try:
+                handler(changes)
+            except Exception:
+                logger.exception('Change handler %r failed', handler)
+        self.applied += len(changes)
+
+    def _reset(self):
+        self.resets += 1
+        self._dispatch([EVERYTHING])
+
+    def prune(self):
+        """Delete events past the retention period, always keeping the newest so ids are not reused."""
+        cutoff = datetime.utcnow() - self.retention
+        newest = select(func.max(ChangeEvent.id)).scalar_subquery()
+        deleted = db.session.execute(
+            delete(ChangeEvent).where(ChangeEvent.created_at < cutoff, ChangeEvent.id < newest)
+        ).rowcount
+        db.session.commit()
+        return deleted
+
+    def metrics(self):
+        return {'version': self.version, 'catch_ups': self.catch_ups, 'applied': self.applied, 'resets': self.resets}
+
+
+changes = ChangeBus()
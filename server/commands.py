@@ -0,0 +1,144 @@
+import json
+import os
+
+import click
+from flask import current_app
+from flask.cli import AppGroup, with_appcontext
+
+from archive import archive
+from database import db
+from grading import recompute_all_grades
+from jobs import jobs, run_workers
+from related_units import rebuild_related_index
+from similarity import rebuild_similarity_index
+from slow_queries import report
+
+
+@click.command('init-db')
+@with_appcontext
+def init_db_command():
+    """Create any missing tables."""
+    db.create_all()
+    print('Database tables created')
+
+
+@click.command('rebuild-related')
+@with_appcontext
+def rebuild_related_command():
+    """Recompute the related-units similarity index."""
+    count = rebuild_related_index()
+    print(f'Indexed related units for {count} units')
+
+
+@click.command('recompute-grades')
+@with_appcontext
+def recompute_grades_command():
+    """Recompute stored overall scores and grades for every unit."""
+    count = recompute_all_grades()
+    print(f'Recomputed grades for {count} enrollments')
+
+
+@click.command('rebuild-similarity')
+@with_appcontext
+def rebuild_similarity_command():
+    """Recompute the MinHash signatures and LSH buckets of every submission."""
+    count = rebuild_similarity_index()
+    print(f'Indexed {count} submissions for similarity')
+
+
+@click.command('archive-units')
+@click.option('--months', type=int, default=None,
+              help='Archive units that ended more than this many months ago. Defaults to ARCHIVE_AFTER_MONTHS.')
+@click.option('--vacuum', is_flag=True, help='VACUUM the main database afterwards to return the freed pages.')
+@with_appcontext
+def archive_units_command(months, vacuum):
+    """Move finished units' enrollments, submissions and ratings into the archive databases."""
+    months = archive.after_months if months is None else months
+    if not months:
+        print('Nothing to do: pass --months or set ARCHIVE_AFTER_MONTHS')
+        return
+    moved = archive.archive_units(months)
+    print(f"Archived {', '.join(f'{count} {table} rows' for table, count in moved.items()) or 'nothing'}")
+    for schema, counts in archive.counts().items():
+        print(f"  {schema}: {', '.join(f'{count} {table}' for table, count in counts.items())}")
+    if vacuum:
+        # Rewrites the whole file and holds the write lock while it does
+        db.session.commit()
+        with db.engine.connect() as connection:
+            connection.exec_driver_sql('VACUUM main')
+        print('Vacuumed the main database')
+
+
+@click.command('slow-queries')
+@click.option('--top', default=20, show_default=True, help='Number of query fingerprints to show.')
+@click.option('--sort', type=click.Choice(['total', 'max', 'count']), default='total', show_default=True)
+@click.option('--log', 'path', default=None, help='Log file to read instead of SLOW_QUERY_LOG.')
+@with_appcontext
+def slow_queries_command(top, sort, path):
+    """Report the slowest query fingerprints from the slow query log."""
+    path = path or current_app.config['SLOW_QUERY_LOG']
+    lines = []
+    # Oldest first: the rotated backup, then the current file
+    for candidate in (path + '.1', path):
+        if os.path.exists(candidate):
+            with open(candidate) as f:
+                lines.extend(f)
+    if not lines:
+        print(f'No slow queries logged in {path}')
+        return
+
+    for rank, row in enumerate(report(lines, top, sort), 1):
+        flags = ''
+        if row['full_scans']:
+            flags += f"  FULL SCAN: {', '.join(row['full_scans'])}"
+        if row['correlated_subquery']:
+            flags += '  CORRELATED SUBQUERY'
+        print(f"#{rank} {row['fingerprint']}  count={row['count']} total={row['total_ms']:.1f}ms "
+              f"mean={row['mean_ms']:.1f}ms max={row['max_ms']:.1f}ms{flags}")
+        print(f"   {row['statement'][:400]}")
+        for step in row['plan'] or []:
+            print(f'     plan: {step}')
+        if row['endpoints']:
+            print(f"   endpoints: {', '.join(row['endpoints'])}")
+        print(f"   slowest parameters: {row['slowest_parameters']}")
+        print()
+
+
+jobs_cli = AppGroup('jobs', help='Run and inspect background jobs.')
+
+
+@jobs_cli.command('worker')
+@click.option('--concurrency', default=4, show_default=True, help='Jobs run at once per process.')
+@click.option('--processes', default=1, show_default=True, help='Worker processes to fork.')
+def jobs_worker_command(concurrency, processes):
+    """Run queued jobs until interrupted."""
+    print(f'Running jobs with {processes} process(es) x {concurrency} thread(s): {", ".join(sorted(jobs.tasks))}')
+    run_workers(current_app._get_current_object(), processes, concurrency)
+
+
+@jobs_cli.command('enqueue')
+@click.argument('name')
+@click.option('--payload', default='{}', help='JSON object passed to the handler as keyword arguments.')
+@click.option('--delay', default=0, help='Seconds to wait before the job is due.')
+def jobs_enqueue_command(name, payload, delay):
+    """Queue a job by name."""
+    job = jobs.enqueue(name, json.loads(payload), delay=delay)
+    db.session.commit()
+    print(f'Queued job {job.id} ({name})')
+
+
+@jobs_cli.command('status')
+def jobs_status_command():
+    """Show how many jobs are in each state."""
+    for status, count in jobs.counts().items():
+        print(f'{status}: {count}')
+
+
+def register_commands(app):
+    app.cli.add_command(init_db_command)
+    app.cli.add_command(rebuild_related_command)
+    app.cli.add_command(recompute_grades_command)
+    app.cli.add_command(rebuild_similarity_command)
+    app.cli.add_command(slow_queries_command)
+    app.cli.add_command(archive_units_command)
+    app.cli.add_command(jobs_cli)
@@ -0,0 +1,89 @@
+import os
+import tempfile
+from datetime import timedelta
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+
+
+class Config:
+    SQLALCHEMY_DATABASE_URI = os.environ.get('DATABASE_URL', 'sqlite:///' + os.path.join(BASE_DIR, 'lms.db'))
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    SECRET_KEY = os.environ.get('JWT_SECRET', 'super-secret-key')
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(hours=24)
+    JWT_BLACKLIST_ENABLED = True
+    JWT_BLACKLIST_TOKEN_CHECKS = ['access']
+
+    # Alembic is only needed by `flask db ...`; Flask sets this for every CLI command
+    MIGRATIONS_ENABLED = os.environ.get('FLASK_RUN_FROM_CLI') == 'true'
+
+    TRENDING_HALF_LIFE_HOURS = float(os.environ.get('TRENDING_HALF_LIFE_HOURS', 72))
+    PROGRESS_FLUSH_INTERVAL_MS = int(os.environ.get('PROGRESS_FLUSH_INTERVAL_MS', 500))
+    PROGRESS_FLUSH_MAX_ENTRIES = int(os.environ.get('PROGRESS_FLUSH_MAX_ENTRIES', 1000))
+
+    # Metric time series retention, see timeseries.py; weekly rollups are kept
+    TIMESERIES_RAW_RETENTION_DAYS = int(os.environ.get('TIMESERIES_RAW_RETENTION_DAYS', 90))
+    TIMESERIES_DAILY_RETENTION_DAYS = int(os.environ.get('TIMESERIES_DAILY_RETENTION_DAYS', 365))
+    ADMISSION_CONTROL_ENABLED = os.environ.get('ADMISSION_CONTROL_ENABLED', '1') == '1'
+
+    EVENTS_HEARTBEAT_SECONDS = int(os.environ.get('EVENTS_HEARTBEAT_SECONDS', 15))
+    # Directory for per-worker event sockets; unset means a single process
+    EVENTS_SOCKET_DIR = os.environ.get('EVENTS_SOCKET_DIR')
+
+    # Every worker drops changed dashboards from the change feed (changes.py); the TTL is only a backstop
+    DASHBOARD_CACHE_TTL_SECONDS = float(os.environ.get('DASHBOARD_CACHE_TTL_SECONDS', 30))
+    DASHBOARD_CACHE_MAX_ENTRIES = int(os.environ.get('DASHBOARD_CACHE_MAX_ENTRIES', 50000))
+
+    # Unit analytics are dropped from the change feed on grade writes; the TTL is only a backstop
+    ANALYTICS_CACHE_TTL_SECONDS = float(os.environ.get('ANALYTICS_CACHE_TTL_SECONDS', 300))
+    ANALYTICS_AT_RISK_BELOW = float(os.environ.get('ANALYTICS_AT_RISK_BELOW', 50))
+
+    # Facet counts of filtered unit listings, per filter set, see catalog_filters.py
+    FACETS_CACHE_TTL_SECONDS = float(os.environ.get('FACETS_CACHE_TTL_SECONDS', 60))
+
+    # Background jobs, see jobs.py
+    JOBS_POLL_INTERVAL_SECONDS = float(os.environ.get('JOBS_POLL_INTERVAL_SECONDS', 1))
+    JOBS_LOCK_TIMEOUT_SECONDS = int(os.environ.get('JOBS_LOCK_TIMEOUT_SECONDS', 600))
+    JOBS_BACKOFF_BASE_SECONDS = float(os.environ.get('JOBS_BACKOFF_BASE_SECONDS', 5))
+    JOBS_BACKOFF_MAX_SECONDS = float(os.environ.get('JOBS_BACKOFF_MAX_SECONDS', 3600))
+    JOBS_RETENTION_DAYS = int(os.environ.get('JOBS_RETENTION_DAYS', 7))
+    # Run the jobs a request enqueues in the API process, for deployments without `flask jobs worker`
+    JOBS_RUN_INLINE = os.environ.get('JOBS_RUN_INLINE', '0') == '1'
+
+    # Per-request profiling, see profiling.py; off unless a token or a sample rate is set
+    PROFILING_TOKEN = os.environ.get('PROFILING_TOKEN')
+    PROFILING_SAMPLE_RATE = float(os.environ.get('PROFILING_SAMPLE_RATE', 0))
+    PROFILING_INTERVAL_MS = float(os.environ.get('PROFILING_INTERVAL_MS', 2))
+    PROFILING_KEEP = int(os.environ.get('PROFILING_KEEP', 50))
+    PROFILING_DIR = os.environ.get('PROFILING_DIR', os.path.join(tempfile.gettempdir(), 'lms-profiles'))
+
+    # Statements slower than this are logged with their query plan; 0 turns the log off
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', 100))
+    SLOW_QUERY_LOG = os.environ.get('SLOW_QUERY_LOG', os.path.join(tempfile.gettempdir(), 'lms-slow-queries.log'))
+    SLOW_QUERY_LOG_MAX_BYTES = int(os.environ.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024))
+
+    # Idempotency-Key handling for create routes, see idempotency.py
+    IDEMPOTENCY_KEY_TTL_HOURS = float(os.environ.get('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+    IDEMPOTENCY_WAIT_SECONDS = float(os.environ.get('IDEMPOTENCY_WAIT_SECONDS', 10))
+    IDEMPOTENCY_LOCK_SECONDS = float(os.environ.get('IDEMPOTENCY_LOCK_SECONDS', 60))
+
+    # Change feed that invalidates caches in every worker, see changes.py
+    CHANGES_RETENTION_MINUTES = float(os.environ.get('CHANGES_RETENTION_MINUTES', 60))
+    CHANGES_MAX_CATCH_UP = int(os.environ.get('CHANGES_MAX_CATCH_UP', 1000))
+    # Shared by all workers on the host; defaults to a file per database in the temp dir
+    CHANGES_STAMP_FILE = os.environ.get('CHANGES_STAMP_FILE')
+
+    # Memory-mapped unit catalog shared by the workers, see catalog_snapshot.py
+    CATALOG_SNAPSHOT_ENABLED = os.environ.get('CATALOG_SNAPSHOT_ENABLED', 'true').lower() == 'true'
+    # Defaults to a file per database in the temp dir
+    CATALOG_SNAPSHOT_PATH = os.environ.get('CATALOG_SNAPSHOT_PATH')
+    CATALOG_SNAPSHOT_MAX_CHANGES = int(os.environ.get('CATALOG_SNAPSHOT_MAX_CHANGES', 500))
+
+    # Typeahead index, see suggest.py: names changed since it was last compacted
+    SUGGEST_MAX_RECENT = int(os.environ.get('SUGGEST_MAX_RECENT', 1000))
+
+    # Archival of finished units' rows into attached per-year databases, see
+    # archive.py; 0 turns it off. ARCHIVE_DIR defaults to archive/ next to the database
+    ARCHIVE_AFTER_MONTHS = int(os.environ.get('ARCHIVE_AFTER_MONTHS', 0))
+    ARCHIVE_DIR = os.environ.get('ARCHIVE_DIR')
+    ARCHIVE_BATCH_SIZE = int(os.environ.get('ARCHIVE_BATCH_SIZE', 500))
+    ARCHIVE_PAUSE_MS = float(os.environ.get('ARCHIVE_PAUSE_MS', 50))
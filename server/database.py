@@ -1,5 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
-from flask_migrate import Migrate
+
+from slow_queries import slow_query_log
 
 db = SQLAlchemy()
 migrate = None
@@ -7,4 +8,9 @@ migrate = None
 def init_db(app):
     global migrate
     db.init_app(app)
-    migrate = Migrate(app, db)
\ No newline at end of file
+    with app.app_context():
+        slow_query_log.init_app(app, db.engine)
+    if app.config.get('MIGRATIONS_ENABLED'):
+        # Imported here: alembic roughly doubles the app's import time
+        from flask_migrate import Migrate
+        migrate = Migrate(app, db)
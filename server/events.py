@@ -0,0 +1,195 @@
+"""Per-user event stream behind /api/events.
+
+Write routes publish small events (a submission was graded, an assignment was
+created, ...) addressed to user ids. Each connected client holds a
+Subscription, a bounded queue that can be drained by a thread (sync SSE
+route) or by a coroutine (asgi.py), so an idle connection costs one queue.
+
+With several worker processes, set EVENTS_SOCKET_DIR. Workers that have
+subscribers bind a Unix datagram socket in that directory and publishers send
+every event to all sockets there. This is a brokerless stand-in for Redis
+pub/sub or similar on a single host. Event ids carry the publishing process's
+start time and pid, so ids from different workers never collide.
+"""
+import asyncio
+import itertools
+import json
+import os
+import queue
+import socket
+import threading
+import time
+from collections import defaultdict
+
+MAX_QUEUED_EVENTS = 100
+MAX_DATAGRAM = 60000
+
+
+class Subscription:
+    def __init__(self, user_id, loop=None):
+        self.user_id = user_id
+        self.loop = loop
+        self.dropped = 0
+        if loop is None:
+            self.queue = queue.Queue(MAX_QUEUED_EVENTS)
+        else:
+            self.queue = asyncio.Queue(MAX_QUEUED_EVENTS)
+
+    def put(self, event):
+        if self.loop is None:
+            self._put_nowait(event)
+        else:
+            self.loop.call_soon_threadsafe(self._put_nowait, event)
+
+    def _put_nowait(self, event):
+        try:
+            self.queue.put_nowait(event)
+        except (queue.Full, asyncio.QueueFull):
+            # A client this far behind reconnects and refetches anyway
+            self.dropped += 1
+
+    def get(self, timeout):
+        """Next event for a thread-based consumer, or None after ``timeout`` seconds."""
+        try:
+            return self.queue.get(timeout=timeout)
+        except queue.Empty:
+            return None
+
+
+def format_sse(event):
+    return (
+        f"id: {event['id']}\n"
+        f"event: {event['type']}\n"
+        f"data: {json.dumps(event['data'])}\n\n"
+    ).encode('utf-8')
+
+
+HEARTBEAT = b': keep-alive\n\n'
+
+
+class EventBroker:
+    def __init__(self):
+        self.heartbeat_seconds = 15
+        self._lock = threading.Lock()
+        self._subscribers = defaultdict(set)
+        self._ids = itertools.count(1)
+        self._id_prefix = None
+        self._id_pid = None
+        self._socket_dir = None
+        self._socket = None
+        self._socket_pid = None
+        self._app = None
+
+    def init_app(self, app):
+        self.heartbeat_seconds = app.config.get('EVENTS_HEARTBEAT_SECONDS', 15)
+        self._socket_dir = app.config.get('EVENTS_SOCKET_DIR')
+        self._app = app
+        app.extensions['events'] = self
+
+    def subscribe(self, user_id, loop=None):
+        subscription = Subscription(user_id, loop)
+        with self._lock:
+            self._subscribers[user_id].add(subscription)
+        if self._socket_dir:
+            self._listen()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            subscribers = self._subscribers.get(subscription.user_id)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscribers[subscription.user_id]
+
+    def publish(self, user_ids, event_type, data):
+        """Send an event to every open stream of the given users."""
+        user_ids = [user_id for user_id in user_ids if user_id is not None]
+        if not user_ids:
+            return
+        event = {'id': self._next_id(), 'users': user_ids, 'type': event_type, 'data': data}
+        self._deliver(event)
+        if self._socket_dir:
+            self._fan_out(event)
+
+    def _next_id(self):
+        # Per process, so workers forked after create_app() do not share a prefix
+        if self._id_pid != os.getpid():
+            with self._lock:
+                if self._id_pid != os.getpid():
+                    self._ids = itertools.count(1)
+                    self._id_prefix = f'{int(time.time() * 1000):x}-{os.getpid():x}'
+                    self._id_pid = os.getpid()
+        return f'{self._id_prefix}-{next(self._ids)}'
+
+    def connection_count(self):
+        with self._lock:
+            return sum(len(subscribers) for subscribers in self._subscribers.values())
+
+    def _deliver(self, event):
+        with self._lock:
+            targets = [
+                subscription
+                for user_id in event['users']
+                for subscription in self._subscribers.get(user_id, ())
+            ]
+        for subscription in targets:
+            subscription.put(event)
+
+    def _own_socket_path(self):
+        return os.path.join(self._socket_dir, f'worker-{os.getpid()}.sock')
+
+    def _listen(self):
+        # Bound per process, lazily, so workers forked after create_app() each get one
+        with self._lock:
+            if self._socket_pid == os.getpid():
+                return
+            os.makedirs(self._socket_dir, exist_ok=True)
+            path = self._own_socket_path()
+            if os.path.exists(path):
+                os.unlink(path)
+            sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(path)
+            self._socket, self._socket_pid = sock, os.getpid()
+        threading.Thread(target=self._receive, args=(sock,), name='events-receive', daemon=True).start()
+
+    def _receive(self, sock):
+        while True:
+            try:
+                payload = sock.recv(MAX_DATAGRAM)
+                self._deliver(json.loads(payload))
+            except OSError:
+                return
+            except ValueError:
+                continue
+
+    def _fan_out(self, event):
+        payload = json.dumps(event).encode('utf-8')
+        if len(payload) > MAX_DATAGRAM:
+            if self._app is not None:
+                self._app.logger.error(f"Event {event['type']} too large to fan out")
+            return
+        own_path = self._own_socket_path()
+        try:
+            names = os.listdir(self._socket_dir)
+        except FileNotFoundError:
+            return
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            for name in names:
+                path = os.path.join(self._socket_dir, name)
+                if not name.endswith('.sock') or path == own_path:
+                    continue
+                try:
+                    sock.sendto(payload, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # The worker that owned this socket is gone
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                except BlockingIOError:
+                    pass  # receiver is backed up, drop rather than stall the request
+
+
+events = EventBroker()
@@ -0,0 +1,35 @@
+"""Sparse fieldsets: ``?fields=id,title`` on unit, teacher and submission endpoints.
+
+A route declares the fields its resource has and asks for the requested
+subset. The same set then decides which columns, joins and count subqueries
+the statement selects and which keys the JSON gets, so a list view that only
+needs id and title neither loads nor sends the rest. Without ``fields`` every
+field is returned, as before.
+"""
+from flask import request
+
+
+class FieldSelectionError(ValueError):
+    pass
+
+
+def parse_fields(raw, available, key='id'):
+    """The requested subset of ``available``; the ``key`` field is always included."""
+    if not raw:
+        return frozenset(available)
+    fields = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = fields.difference(available)
+    if unknown:
+        raise FieldSelectionError(
+            f"Unknown fields: {', '.join(sorted(unknown))}. Available: {', '.join(available)}"
+        )
+    return frozenset(fields | {key})
+
+
+def requested_fields(available, key='id'):
+    return parse_fields(request.args.get('fields'), available, key)
+
+
+def shape(fields, values):
+    """Dict of the requested fields; ``values`` maps each field to a zero-argument callable."""
+    return {name: value() for name, value in values.items() if fields is None or name in fields}
@@ -0,0 +1,70 @@
+"""Students x assignments grade matrix for a teacher's unit.
+
+One grouped query pivots a page of the unit's students against a page of its
+assignments: every column is an ``avg(CASE WHEN assignment_id = ...)`` over the
+student's submissions, so each result row already is a row of the matrix. A
+cell is the average grade of the student's graded submissions for that
+assignment (as in grading.py), in the assignment's own points, or null.
+"""
+from sqlalchemy import and_, case, distinct, func, select
+
+from database import db
+from models import User, Enrollment, Assignment, Submission
+from queries import pagination_meta
+
+MAX_STUDENTS_PER_PAGE = 500
+MAX_ASSIGNMENTS_PER_PAGE = 100
+
+
+def gradebook(unit_id, page=1, per_page=100, assignment_page=1, assignments_per_page=50):
+    page, assignment_page = max(page, 1), max(assignment_page, 1)
+    per_page = min(max(per_page, 1), MAX_STUDENTS_PER_PAGE)
+    assignments_per_page = min(max(assignments_per_page, 1), MAX_ASSIGNMENTS_PER_PAGE)
+
+    assignments = db.session.execute(
+        select(Assignment.id, Assignment.title, Assignment.max_score)
+        .where(Assignment.unit_id == unit_id)
+        .order_by(Assignment.id)
+    ).all()
+    start = (assignment_page - 1) * assignments_per_page
+    columns = assignments[start:start + assignments_per_page]
+    column_ids = [assignment.id for assignment in columns]
+
+    total_students = db.session.scalar(
+        select(func.count(distinct(Enrollment.student_id))).where(Enrollment.unit_id == unit_id)
+    )
+    students = select(Enrollment.student_id, User.username)\
+        .join(User, User.id == Enrollment.student_id)\
+        .where(Enrollment.unit_id == unit_id)\
+        .distinct()\
+        .order_by(Enrollment.student_id)\
+        .offset((page - 1) * per_page)\
+        .limit(per_page)\
+        .subquery()
+
+    cells = [
+        func.avg(case((Submission.assignment_id == assignment_id, Submission.grade)))
+        for assignment_id in column_ids
+    ]
+    rows = db.session.execute(
+        select(students.c.student_id, students.c.username, *cells)
+        .select_from(students)
+        .outerjoin(Submission, and_(
+            Submission.student_id == students.c.student_id,
+            Submission.assignment_id.in_(column_ids)
+        ))
+        .group_by(students.c.student_id, students.c.username)
+        .order_by(students.c.student_id)
+    ).all()
+
+    return {
+        'unit_id': unit_id,
+        'student_ids': [row[0] for row in rows],
+        'student_names': [row[1] for row in rows],
+        'assignment_ids': column_ids,
+        'assignment_titles': [assignment.title for assignment in columns],
+        'max_scores': [assignment.max_score for assignment in columns],
+        'grades': [list(row[2:]) for row in rows],
+        'rows': pagination_meta(total_students, page, per_page),
+        'columns': pagination_meta(len(assignments), assignment_page, assignments_per_page)
+    }
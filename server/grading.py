@@ -0,0 +1,53 @@
+"""Stored weighted overall scores.
+
+Each unit has relative weights for the assignment, CAT and exam scores.
+An enrollment's overall_score is the weighted average of the scores it has
+(missing components are left out of both sums), rounded to two places, and
+becomes its grade. Scores are recomputed in SQL: one UPDATE for a whole unit
+when its weights change, or for a single row when a score is written, so the
+results pages only read stored columns.
+"""
+from sqlalchemy import case, func, update
+
+from changes import change, changes
+from database import db
+from models import Unit, Enrollment
+
+COMPONENTS = ('assignment', 'cat', 'exam')
+
+
+def unit_weights(unit):
+    return {component: getattr(unit, f'{component}_weight') for component in COMPONENTS}
+
+
+def overall_score_expression(weights):
+    scores = [getattr(Enrollment, f'{component}_score') for component in COMPONENTS]
+    factors = [float(weights[component]) for component in COMPONENTS]
+    weighted = sum(factor * func.coalesce(score, 0) for factor, score in zip(factors, scores))
+    total_weight = sum(case((score.isnot(None), factor), else_=0.0) for factor, score in zip(factors, scores))
+    return func.round(weighted / func.nullif(total_weight, 0.0), 2)
+
+
+def recompute_grades(unit, student_id=None):
+    """Recompute overall_score and grade for a unit, or one student's enrollment in it.
+
+    Enrollments without any scores keep the grade they have. The caller
+    commits; the change event recorded here invalidates cached views of the
+    grades in every worker.
+    """
+    overall_score = overall_score_expression(unit_weights(unit))
+    statement = update(Enrollment)\
+        .where(Enrollment.unit_id == unit.id)\
+        .values(overall_score=overall_score, grade=func.coalesce(overall_score, Enrollment.grade))\
+        .execution_options(synchronize_session=False)
+    if student_id is not None:
+        statement = statement.where(Enrollment.student_id == student_id)
+    changes.record(change('enrollment', unit_id=unit.id, user_id=student_id))
+    return db.session.execute(statement).rowcount
+
+
+def recompute_all_grades():
+    units = Unit.query.all()
+    updated = sum(recompute_grades(unit) for unit in units)
+    db.session.commit()
+    return updated
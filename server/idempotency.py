@@ -0,0 +1,151 @@
+"""Idempotency-Key support for POST routes that create things.
+
+A client that may retry sends the same ``Idempotency-Key`` header with every
+attempt. The first attempt inserts a pending row for (user, key) and runs the
+handler; its response is then stored on the row. A retry finds the row and gets
+the stored response back without the handler, or its validation queries,
+running again. A retry that arrives while the first attempt is still running
+waits for it (up to IDEMPOTENCY_WAIT_SECONDS), so concurrent duplicates
+execute once. The primary key makes the insert the arbiter across processes.
+
+Responses with a 5xx status are not stored, so the client can retry those.
+Keys expire after IDEMPOTENCY_KEY_TTL_HOURS and are purged in batches by the
+``idempotency.purge`` periodic job.
+"""
+import hashlib
+import time
+from datetime import datetime, timedelta
+from functools import wraps
+
+from flask import current_app, jsonify, make_response, request
+from sqlalchemy import and_, delete, or_, select, tuple_, update
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+MAX_KEY_LENGTH = 255
+PURGE_BATCH = 1000
+
+
+def request_hash():
+    digest = hashlib.sha256()
+    digest.update(f'{request.method} {request.path}\n'.encode('utf-8'))
+    digest.update(request.get_data())
+    return digest.hexdigest()
+
+
+def _claim(user_id, key, fingerprint):
+    """Insert the pending row. Returns False if the key is already taken."""
+    now = datetime.utcnow()
+    ttl = timedelta(hours=current_app.config.get('IDEMPOTENCY_KEY_TTL_HOURS', 24))
+    abandoned = now - timedelta(seconds=current_app.config.get('IDEMPOTENCY_LOCK_SECONDS', 60))
+    # An expired key can be used again, and so can one whose first attempt
+    # never stored a response (its worker died)
+    db.session.execute(
+        delete(IdempotencyKey)
+        .where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        .where(or_(
+            IdempotencyKey.expires_at < now,
+            and_(IdempotencyKey.status_code.is_(None), IdempotencyKey.created_at < abandoned)
+        ))
+    )
+    db.session.add(IdempotencyKey(
+        user_id=user_id, key=key, request_hash=fingerprint, created_at=now, expires_at=now + ttl
+    ))
+    try:
+        db.session.commit()
+        return True
+    except IntegrityError:
+        db.session.rollback()
+        return False
+
+
+def _wait_for_response(user_id, key):
+    """The stored row once the first attempt has finished, None if it released the
+    key, or False if it is still running after IDEMPOTENCY_WAIT_SECONDS."""
+    deadline = time.monotonic() + current_app.config.get('IDEMPOTENCY_WAIT_SECONDS', 10)
+    delay = 0.02
+    while True:
+        row = db.session.execute(
+            select(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+        ).scalar_one_or_none()
+        if row is None or row.status_code is not None:
+            return row
+        # End the read transaction so the next poll sees the other attempt's commit
+        db.session.commit()
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(delay)
+        delay = min(delay * 2, 0.2)
+
+
+def _release(user_id, key):
+    db.session.rollback()
+    db.session.execute(
+        delete(IdempotencyKey).where(IdempotencyKey.user_id == user_id, IdempotencyKey.key == key)
+    )
+    db.session.commit()
+
+
+def idempotent(f):
+    """Honour Idempotency-Key on a route; place it below token_required."""
+    @wraps(f)
+    def decorated(current_user, *args, **kwargs):
+        key = request.headers.get(HEADER)
+        if key is None:
+            return f(current_user, *args, **kwargs)
+        if not key or len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'{HEADER} must be 1 to {MAX_KEY_LENGTH} characters'}), 400
+
+        fingerprint = request_hash()
+        while not _claim(current_user.id, key, fingerprint):
+            row = _wait_for_response(current_user.id, key)
+            if row is None:
+                # The first attempt failed and released the key: run this one
+                continue
+            if row is False:
+                response = jsonify({'error': 'A request with this Idempotency-Key is still in progress'})
+                response.headers['Retry-After'] = '1'
+                return response, 409
+            if row.request_hash != fingerprint:
+                return jsonify({'error': f'{HEADER} was already used for a different request'}), 422
+            response = current_app.response_class(row.body, status=row.status_code, content_type=row.content_type)
+            response.headers[REPLAYED_HEADER] = 'true'
+            return response
+
+        try:
+            response = make_response(f(current_user, *args, **kwargs))
+        except Exception:
+            _release(current_user.id, key)
+            raise
+        if response.status_code >= 500:
+            _release(current_user.id, key)
+            return response
+
+        db.session.execute(
+            update(IdempotencyKey)
+            .where(IdempotencyKey.user_id == current_user.id, IdempotencyKey.key == key)
+            .values(status_code=response.status_code, content_type=response.content_type, body=response.get_data())
+        )
+        db.session.commit()
+        return response
+    return decorated
+
+
+def purge_expired_keys(batch_size=PURGE_BATCH):
+    """Delete expired keys, committing every batch_size rows. Returns the number deleted."""
+    deleted = 0
+    while True:
+        expired = select(IdempotencyKey.user_id, IdempotencyKey.key)\
+            .where(IdempotencyKey.expires_at < datetime.utcnow())\
+            .limit(batch_size)
+        count = db.session.execute(
+            delete(IdempotencyKey).where(tuple_(IdempotencyKey.user_id, IdempotencyKey.key).in_(expired))
+        ).rowcount
+        db.session.commit()
+        deleted += count
+        if count < batch_size:
+            return deleted
@@ -0,0 +1,328 @@
+"""Durable background jobs kept in the job table.
+
+Request handlers call ``jobs.enqueue(name, payload)`` before their own commit,
+so a job exists exactly when the change that asked for it does. ``flask jobs
+worker`` claims due jobs with a conditional UPDATE (the worker that flips a
+row from queued to running owns it) and runs them on a thread pool; any
+number of worker processes can share the database. A job that raises is
+retried after an exponential backoff until max_attempts, then marked failed
+with its last error kept. Jobs whose worker died mid-run are queued again once
+their lock is older than JOBS_LOCK_TIMEOUT_SECONDS.
+
+With JOBS_RUN_INLINE set, for deployments without a worker, jobs a request
+enqueues run in that request's process once its handler has committed,
+before the response goes out. Otherwise, if queued jobs are left waiting for
+longer than the lock timeout, enqueue() logs a warning that no worker seems
+to be running.
+
+Periodic tasks are enqueued by whichever worker first reaches their next slot.
+The slot goes into the unique ``unique_key`` column, so the same insert fails
+in every other worker and each run happens once.
+"""
+import logging
+import os
+import random
+import signal
+import socket
+import threading
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+from flask import g, has_request_context
+from sqlalchemy import delete, func, inspect, select, update
+from sqlalchemy.exc import IntegrityError
+
+from database import db
+from models import Job
+
+logger = logging.getLogger(__name__)
+
+Task = namedtuple('Task', 'name func max_attempts every')
+
+QUEUED = 'queued'
+RUNNING = 'running'
+SUCCEEDED = 'succeeded'
+FAILED = 'failed'
+STATUSES = (QUEUED, RUNNING, SUCCEEDED, FAILED)
+
+
+class JobQueue:
+    def __init__(self):
+        self.tasks = {}
+        self.poll_interval = 1.0
+        self.lock_timeout = 600
+        self.backoff_base = 5
+        self.backoff_max = 3600
+        self.retention_days = 7
+        self.run_inline = False
+        self._app = None
+        self._overdue_checked_at = None
+        # Periodic task name -> last slot this process tried to enqueue
+        self._scheduled = {}
+
+    def init_app(self, app):
+        self.poll_interval = app.config.get('JOBS_POLL_INTERVAL_SECONDS', 1.0)
+        self.lock_timeout = app.config.get('JOBS_LOCK_TIMEOUT_SECONDS', 600)
+        self.backoff_base = app.config.get('JOBS_BACKOFF_BASE_SECONDS', 5)
+        self.backoff_max = app.config.get('JOBS_BACKOFF_MAX_SECONDS', 3600)
+        self.retention_days = app.config.get('JOBS_RETENTION_DAYS', 7)
+        self.run_inline = app.config.get('JOBS_RUN_INLINE', False)
+        self._app = app
+        app.extensions['jobs'] = self
+        if self.run_inline:
+            app.after_request(self._run_enqueued)
+
+    def task(self, name, max_attempts=3, every=None):
+        """Register a job handler; ``every`` (seconds) also runs it periodically."""
+        def register(func):
+            self.tasks[name] = Task(name, func, max_attempts, every)
+            return func
+        return register
+
+    def enqueue(self, name, payload=None, delay=0, created_by=None, unique_key=None):
+        """Add a job to the session. It is queued once the caller commits."""
+        if name not in self.tasks:
+            raise KeyError(f'Unknown job: {name}')
+        job = Job(
+            name=name,
+            payload=payload or {},
+            max_attempts=self.tasks[name].max_attempts,
+            run_at=datetime.utcnow() + timedelta(seconds=delay),
+            created_by=created_by,
+            unique_key=unique_key
+        )
+        db.session.add(job)
+        if self.run_inline and has_request_context() and not delay:
+            g.setdefault('inline_jobs', []).append(job)
+        else:
+            self._warn_if_unattended()
+        return job
+
+    def _warn_if_unattended(self):
+        """Log a warning, at most once per lock timeout, when queued jobs are overdue."""
+        now = time.monotonic()
+        if self._overdue_checked_at is not None and now - self._overdue_checked_at < self.lock_timeout:
+            return
+        self._overdue_checked_at = now
+        oldest = db.session.scalar(
+            select(func.min(Job.run_at)).where(Job.status == QUEUED).execution_options(autoflush=False)
+        )
+        if oldest is not None and oldest < datetime.utcnow() - timedelta(seconds=self.lock_timeout):
+            logger.warning(
+                'Jobs have been queued since %s without running; start `flask jobs worker`, '
+                'or set JOBS_RUN_INLINE to run them in the API processes', oldest
+            )
+
+    def _run_enqueued(self, response):
+        """after_request hook: run the jobs the request enqueued and committed."""
+        worker_id = f'{socket.gethostname()}:{os.getpid()}:inline'
+        for job in g.pop('inline_jobs', ()):
+            state = inspect(job)
+            # Jobs of a rolled back transaction are transient again
+            if not state.persistent:
+                continue
+            job_id = state.identity[0]
+            claimed = db.session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == QUEUED)
+                .values(status=RUNNING, locked_by=worker_id, locked_at=datetime.utcnow(), attempts=Job.attempts + 1)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                self.run(job_id, worker_id)
+        return response
+
+    def backoff(self, attempts):
+        delay = min(self.backoff_base * 2 ** (attempts - 1), self.backoff_max)
+        # Jitter so jobs that failed together do not all retry together
+        return delay * random.uniform(0.5, 1.0)
+
+    def claim(self, worker_id):
+        """Take the next due job for this worker. Returns its id, or None."""
+        while True:
+            now = datetime.utcnow()
+            job_id = db.session.scalar(
+                select(Job.id)
+                .where(Job.status == QUEUED, Job.run_at <= now)
+                .order_by(Job.run_at, Job.id)
+                .limit(1)
+            )
+            if job_id is None:
+                db.session.commit()
+                return None
+            claimed = db.session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.status == QUEUED)
+                .values(status=RUNNING, locked_by=worker_id, locked_at=now, attempts=Job.attempts + 1)
+            ).rowcount
+            db.session.commit()
+            if claimed:
+                return job_id
+            # Another worker won the race for this row, try the next one
+
+    def run(self, job_id, worker_id):
+        """Run a claimed job and record its outcome. Returns the new status."""
+        job = db.session.get(Job, job_id)
+        name, payload, attempts, max_attempts = job.name, job.payload or {}, job.attempts, job.max_attempts
+        task = self.tasks.get(name)
+        try:
+            if task is None:
+                raise LookupError(f'No handler registered for job {name!r}')
+            result = task.func(**payload)
+            db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.exception('Job %s (%s) failed on attempt %s', job_id, name, attempts)
+            if attempts < max_attempts:
+                values = {'status': QUEUED, 'run_at': datetime.utcnow() + timedelta(seconds=self.backoff(attempts))}
+            else:
+                values = {'status': FAILED, 'finished_at': datetime.utcnow()}
+            values['last_error'] = f'{type(e).__name__}: {e}'
+        else:
+            values = {'status': SUCCEEDED, 'finished_at': datetime.utcnow(), 'result': result}
+
+        # Only the worker still holding the lock records an outcome
+        try:
+            db.session.execute(
+                update(Job)
+                .where(Job.id == job_id, Job.locked_by == worker_id)
+                .values(locked_by=None, locked_at=None, **values)
+            )
+            db.session.commit()
+        except Exception:
+            # The job stays locked; requeue_stale() releases it once the lock expires
+            db.session.rollback()
+            logger.exception('Could not record the outcome of job %s (%s)', job_id, name)
+        return values['status']
+
+    def requeue_stale(self):
+        """Release jobs locked by workers that stopped without finishing them."""
+        cutoff = datetime.utcnow() - timedelta(seconds=self.lock_timeout)
+        stale = (Job.status == RUNNING) & (Job.locked_at < cutoff)
+        failed = db.session.execute(
+            update(Job)
+            .where(stale, Job.attempts >= Job.max_attempts)
+            .values(status=FAILED, locked_by=None, locked_at=None, finished_at=datetime.utcnow(),
+                    last_error='Worker lock expired')
+        ).rowcount
+        requeued = db.session.execute(
+            update(Job).where(stale).values(status=QUEUED, locked_by=None, locked_at=None)
+        ).rowcount
+        db.session.commit()
+        return requeued + failed
+
+    def schedule_periodic(self):
+        """Enqueue the current run of every periodic task that has not been enqueued yet."""
+        now = time.time()
+        for task in self.tasks.values():
+            if not task.every:
+                continue
+            slot = int(now // task.every)
+            if self._scheduled.get(task.name) == slot:
+                continue
+            try:
+                self.enqueue(task.name, unique_key=f'{task.name}@{slot}')
+                db.session.commit()
+            except IntegrityError:
+                db.session.rollback()
+            # Marked only once enqueued, so a failed attempt is retried on the next poll
+            self._scheduled[task.name] = slot
+
+    def prune(self):
+        """Delete finished jobs older than the retention period."""
+        cutoff = datetime.utcnow() - timedelta(days=self.retention_days)
+        deleted = db.session.execute(
+            delete(Job).where(Job.status.in_((SUCCEEDED, FAILED)), Job.finished_at < cutoff)
+        ).rowcount
+        db.session.commit()
+        return deleted
+
+    def counts(self):
+        rows = db.session.execute(select(Job.status, func.count()).group_by(Job.status)).all()
+        return {status: 0 for status in STATUSES} | dict(rows)
+
+
+class Worker:
+    """Claims jobs in a loop and runs up to ``concurrency`` of them at once."""
+
+    def __init__(self, queue, app, concurrency=4):
+        self.queue = queue
+        self.app = app
+        self.concurrency = concurrency
+        self.id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self._slots = threading.Semaphore(concurrency)
+
+    def _execute(self, job_id):
+        try:
+            with self.app.app_context():
+                self.queue.run(job_id, self.id)
+        finally:
+            self._slots.release()
+
+    def run(self):
+        last_maintenance = 0.0
+        with ThreadPoolExecutor(self.concurrency, thread_name_prefix='job') as pool:
+            while not self.stopping.is_set():
+                if not self._slots.acquire(timeout=self.queue.poll_interval):
+                    continue
+                with self.app.app_context():
+                    try:
+                        if time.monotonic() - last_maintenance >= self.queue.poll_interval * 10:
+                            self.queue.requeue_stale()
+                            last_maintenance = time.monotonic()
+                        self.queue.schedule_periodic()
+                        job_id = self.queue.claim(self.id)
+                    except Exception:
+                        # Typically "database is locked"; try again after the next poll interval
+                        db.session.rollback()
+                        logger.exception('Job worker %s could not claim a job', self.id)
+                        job_id = None
+                if job_id is None:
+                    self._slots.release()
+                    self.stopping.wait(self.queue.poll_interval)
+                    continue
+                pool.submit(self._execute, job_id)
+        # Leaving the with block waits for running jobs to finish
+
+
+def run_workers(app, processes=1, concurrency=4):
+    """Run worker processes until SIGINT or SIGTERM; in-process when processes is 1."""
+    if processes <= 1:
+        worker = Worker(jobs, app, concurrency)
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            signal.signal(signum, lambda *_: worker.stopping.set())
+        worker.run()
+        return
+
+    import multiprocessing
+
+    context = multiprocessing.get_context('fork')
+    children = [
+        context.Process(target=_worker_process, args=(app, concurrency), name=f'jobs-worker-{index}')
+        for index in range(processes)
+    ]
+    for child in children:
+        child.start()
+
+    def stop(*_):
+        for child in children:
+            if child.is_alive():
+                child.terminate()
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, stop)
+    for child in children:
+        child.join()
+
+
+def _worker_process(app, concurrency):
+    with app.app_context():
+        # Connections inherited from the parent must not be shared
+        db.engine.dispose(close=False)
+    run_workers(app, 1, concurrency)
+
+
+jobs = JobQueue()
@@ -1,8 +1,17 @@
 from database import db
+from fieldsets import shape
+from text_codec import encode_text, decode_text
 from sqlalchemy.ext.hybrid import hybrid_property
 from sqlalchemy import select, func
 from datetime import datetime
-import bcrypt
+
+USER_FIELDS = (
+    'id', 'username', 'email', 'role', 'bio', 'qualifications', 'total_units', 'total_students',
+)
+UNIT_FIELDS = (
+    'id', 'title', 'description', 'category', 'video_url', 'teacher', 'teacher_id',
+    'start_date', 'end_date', 'average_rating', 'rating_count', 'progress',
+)
 
 class User(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -10,8 +19,10 @@ class User(db.Model):
     email = db.Column(db.String(120), unique=True, nullable=False)
     password_hash = db.Column(db.String(128), nullable=False)
     role = db.Column(db.String(20), nullable=False)  # 'teacher' or 'student'
-    bio = db.Column(db.Text)
-    qualifications = db.Column(db.Text)
+    # Long free text is deferred: loaded on first access, or up front with
+    # load_only()/undefer() by the queries whose responses include it
+    bio = db.deferred(db.Column(db.Text))
+    qualifications = db.deferred(db.Column(db.Text))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
     # Relationships
@@ -22,30 +33,46 @@ class User(db.Model):
     profile_settings = db.relationship('ProfileSettings', back_populates='user', uselist=False, lazy=True)
 
     def set_password(self, password):
+        import bcrypt  # imported on first use to keep app startup light
         password_bytes = password.encode('utf-8')
         salt = bcrypt.gensalt()
         self.password_hash = bcrypt.hashpw(password_bytes, salt).decode('utf-8')
 
     def check_password(self, password):
+        import bcrypt
         password_bytes = password.encode('utf-8')
         return bcrypt.checkpw(password_bytes, self.password_hash.encode('utf-8'))
 
     def __repr__(self):
         return f'<User {self.username}>'
 
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'username': self.username,
-            'email': self.email,
-            'role': self.role,
-            'bio': self.bio,
-            'qualifications': self.qualifications,
-            'total_units': len(self.created_units),
-            'total_students': sum(len(unit.enrollments) for unit in self.created_units)
-        }
+    def to_dict(self, fields=None):
+        # Only the requested fields are read, so the counts do not load units unless asked for
+        return shape(fields, {
+            'id': lambda: self.id,
+            'username': lambda: self.username,
+            'email': lambda: self.email,
+            'role': lambda: self.role,
+            'bio': lambda: self.bio,
+            'qualifications': lambda: self.qualifications,
+            'total_units': lambda: db.session.scalar(
+                select(func.count(Unit.id)).where(Unit.teacher_id == self.id)
+            ),
+            'total_students': lambda: db.session.scalar(
+                select(func.count(Enrollment.id))
+                .join(Unit, Unit.id == Enrollment.unit_id)
+                .where(Unit.teacher_id == self.id)
+            )
+        })
 
 class Unit(db.Model):
+    __table_args__ = (
+        # The combined catalog filters in catalog_filters.py: a category or a
+        # teacher, narrowed by a date range
+        db.Index('ix_unit_category_start_date', 'category', 'start_date'),
+        db.Index('ix_unit_teacher_id_start_date', 'teacher_id', 'start_date'),
+        db.Index('ix_unit_end_date', 'end_date'),
+    )
     
     @hybrid_property
     def average_rating(self):
@@ -66,7 +93,7 @@ class Unit(db.Model):
         return select(func.count(Rating.id)).where(Rating.unit_id == cls.id).label('rating_count')
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(120), nullable=False)
-    description = db.Column(db.Text)
+    description = db.deferred(db.Column(db.Text))
     category = db.Column(db.String(50))
     video_url = db.Column(db.String(505))  # YouTube video URL
     
@@ -74,6 +101,10 @@ class Unit(db.Model):
     end_date = db.Column(db.DateTime)
     teacher_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    # Relative weights of the score components in an enrollment's overall score, see grading.py
+    assignment_weight = db.Column(db.Float, nullable=False, default=1.0, server_default='1.0')
+    cat_weight = db.Column(db.Float, nullable=False, default=1.0, server_default='1.0')
+    exam_weight = db.Column(db.Float, nullable=False, default=1.0, server_default='1.0')
 
 
     # Relationships
@@ -84,33 +115,39 @@ class Unit(db.Model):
     def __repr__(self):
         return f'<Unit {self.title}>'
         
-    def to_dict(self):
-        return {
-            'id': self.id,
-            'title': self.title,
-            'description': self.description,
-            'category': self.category,
-            'video_url': self.video_url,
-            'teacher': self.teacher.username,
-            'teacher_id': self.teacher_id,
-            'start_date': self.start_date.isoformat() if self.start_date else None,
-            'end_date': self.end_date.isoformat() if self.end_date else None,
-            'average_rating': self.average_rating,
-            'rating_count': self.rating_count,
-            'progress': 0  # Default progress, will be overridden by enrollment data when needed
-        }
+    def to_dict(self, fields=None):
+        return shape(fields, {
+            'id': lambda: self.id,
+            'title': lambda: self.title,
+            'description': lambda: self.description,
+            'category': lambda: self.category,
+            'video_url': lambda: self.video_url,
+            'teacher': lambda: self.teacher.username,
+            'teacher_id': lambda: self.teacher_id,
+            'start_date': lambda: self.start_date.isoformat() if self.start_date else None,
+            'end_date': lambda: self.end_date.isoformat() if self.end_date else None,
+            'average_rating': lambda: self.average_rating,
+            'rating_count': lambda: self.rating_count,
+            'progress': lambda: 0  # Default progress, will be overridden by enrollment data when needed
+        })
 
 class Enrollment(db.Model):
+    __table_args__ = (
+        db.Index('ix_enrollment_student_id_unit_id', 'student_id', 'unit_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    unit_id = db.Column(db.Integer, db.ForeignKey('unit.id'), nullable=False)
+    unit_id = db.Column(db.Integer, db.ForeignKey('unit.id'), nullable=False, index=True)
     enrollment_date = db.Column(db.DateTime, default=datetime.utcnow)
     grade = db.Column(db.Float)
-    feedback = db.Column(db.Text)
+    feedback = db.deferred(db.Column(db.Text))
     progress = db.Column(db.Integer, default=0)
     assignment_score = db.Column(db.Float)
     cat_score = db.Column(db.Float)
     exam_score = db.Column(db.Float)
+    # Weighted average of the scores above, kept up to date by grading.py
+    overall_score = db.Column(db.Float)
 
     def __repr__(self):
         return f'<Enrollment {self.student_id}-{self.unit_id}>'
@@ -120,15 +157,45 @@ class Performance(db.Model):
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     unit_id = db.Column(db.Integer, db.ForeignKey('unit.id'), nullable=False)
     score = db.Column(db.Float)    
-    trend_data = db.Column(db.JSON)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     date_recorded = db.Column(db.DateTime, default=datetime.utcnow)
-    trend_data = db.Column(db.JSON)
 
     def __repr__(self):
         return f'<Performance {self.user_id}-{self.unit_id}>'
 
+class MetricPoint(db.Model):
+    # Raw points of a student's per-unit metric time series, see timeseries.py.
+    # Without a rowid the table is stored in primary key order, so a series is
+    # one contiguous range of the b-tree.
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, autoincrement=False)
+    unit_id = db.Column(db.Integer, db.ForeignKey('unit.id'), primary_key=True, autoincrement=False)
+    metric = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    ts = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Unix time in seconds
+    value = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<MetricPoint {self.student_id}-{self.unit_id}-{self.metric}@{self.ts}>'
+
+class MetricRollup(db.Model):
+    # Daily and weekly aggregates of MetricPoint, see timeseries.py
+    __table_args__ = {'sqlite_with_rowid': False}
+
+    student_id = db.Column(db.Integer, db.ForeignKey('user.id'), primary_key=True, autoincrement=False)
+    unit_id = db.Column(db.Integer, db.ForeignKey('unit.id'), primary_key=True, autoincrement=False)
+    metric = db.Column(db.SmallInteger, primary_key=True, autoincrement=False)
+    resolution = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Bucket length in seconds
+    bucket = db.Column(db.Integer, primary_key=True, autoincrement=False)  # Unix time the bucket starts
+    count = db.Column(db.Integer, nullable=False)
+    total = db.Column(db.Float, nullable=False)
+    minimum = db.Column(db.Float, nullable=False)
+    maximum = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<MetricRollup {self.student_id}-{self.unit_id}-{self.metric}/{self.resolution}@{self.bucket}>'
+
 class ProfileSettings(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
@@ -140,6 +207,11 @@ class ProfileSettings(db.Model):
         return f'<ProfileSettings {self.user_id}>'
 
 class Rating(db.Model):
+    __table_args__ = (
+        # A unit's ratings, covering the average behind min_rating and the rating facet
+        db.Index('ix_rating_unit_id_score', 'unit_id', 'score'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     unit_id = db.Column(db.Integer, db.ForeignKey('unit.id'), nullable=False)
@@ -163,15 +235,159 @@ class Assignment(db.Model):
         return f'<Assignment {self.title}>'
 
 class Submission(db.Model):
+    __table_args__ = (
+        # Covers the per-assignment grade scans in analytics.py
+        db.Index('ix_submission_assignment_id_grade', 'assignment_id', 'grade'),
+        # A student's submissions, and their cells in the gradebook pivot
+        db.Index('ix_submission_student_id_assignment_id', 'student_id', 'assignment_id'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False)
     student_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
-    submission_text = db.Column(db.Text, nullable=True)  # Optional text explanation
     document_url = db.Column(db.String(255), nullable=True)  # URL to the submitted document
     submission_link = db.Column(db.String(255), nullable=True)  # URL to external document
     submitted_at = db.Column(db.DateTime, default=datetime.utcnow)
     grade = db.Column(db.Float)  # Grade can be updated later
-    feedback = db.Column(db.Text)
+    feedback = db.deferred(db.Column(db.Text))
+    # Optional text explanation, kept in a side table, see text_codec.py
+    content = db.relationship('SubmissionContent', uselist=False, lazy=True, cascade='all, delete-orphan')
+
+    @property
+    def submission_text(self):
+        return self.content.text if self.content else None
+
+    @submission_text.setter
+    def submission_text(self, text):
+        if text is None:
+            self.content = None
+        elif self.content:
+            self.content.text = text
+        else:
+            self.content = SubmissionContent(text=text)
+
+    def __repr__(self):
+        return f'<Submission {self.id} for Assignment {self.assignment_id}>'
+
+class SubmissionContent(db.Model):
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), primary_key=True)
+    encoding = db.Column(db.String(10), nullable=False)  # 'plain' or 'zlib'
+    size = db.Column(db.Integer, nullable=False)  # Length of the text in UTF-8 bytes
+    data = db.Column(db.LargeBinary, nullable=False)
+
+    @property
+    def text(self):
+        return decode_text(self.encoding, self.data)
+
+    @text.setter
+    def text(self, text):
+        self.encoding, self.size, self.data = encode_text(text)
+
+    def __repr__(self):
+        return f'<SubmissionContent {self.submission_id} ({self.encoding}, {self.size} bytes)>'
+
+class RelatedUnit(db.Model):
+    # Precomputed content-similarity neighbours, see related_units.py
+    unit_id = db.Column(db.Integer, db.ForeignKey('unit.id'), primary_key=True)
+    rank = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    related_unit_id = db.Column(db.Integer, db.ForeignKey('unit.id'), nullable=False)
+    score = db.Column(db.Float, nullable=False)
+
+    def __repr__(self):
+        return f'<RelatedUnit {self.unit_id}->{self.related_unit_id}>'
+
+class SubmissionSignature(db.Model):
+    # MinHash signature of a submission's text, see similarity.py
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), primary_key=True)
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), nullable=False, index=True)
+    signature = db.Column(db.LargeBinary, nullable=False)
+
+    def __repr__(self):
+        return f'<SubmissionSignature {self.submission_id}>'
+
+class SubmissionBucket(db.Model):
+    # One LSH bucket per band of a signature; submissions sharing a bucket are candidates
+    assignment_id = db.Column(db.Integer, db.ForeignKey('assignment.id'), primary_key=True, autoincrement=False)
+    band = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    bucket = db.Column(db.BigInteger, primary_key=True, autoincrement=False)
+    submission_id = db.Column(db.Integer, db.ForeignKey('submission.id'), primary_key=True, autoincrement=False)
+
+    def __repr__(self):
+        return f'<SubmissionBucket {self.assignment_id}/{self.band}/{self.bucket}>'
+
+class Job(db.Model):
+    # Background work run by `flask jobs worker`, see jobs.py
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # queued, running, succeeded, failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=3)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # Set for periodic runs so that only one worker enqueues each of them
+    unique_key = db.Column(db.String(200), unique=True)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    locked_by = db.Column(db.String(100))
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    result = db.Column(db.JSON)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.name} {self.status}>'
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+            'last_error': self.last_error,
+            'result': self.result
+        }
+
+class IdempotencyKey(db.Model):
+    # Stored first response of a POST sent with an Idempotency-Key header, see idempotency.py
+    __table_args__ = (
+        db.Index('ix_idempotency_key_expires_at', 'expires_at'),
+    )
+
+    user_id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    key = db.Column(db.String(255), primary_key=True)
+    request_hash = db.Column(db.String(64), nullable=False)
+    # Null while the first request is still running
+    status_code = db.Column(db.Integer)
+    content_type = db.Column(db.String(100))
+    body = db.Column(db.LargeBinary)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    def __repr__(self):
+        return f'<IdempotencyKey {self.user_id}:{self.key}>'
+
+class ChangeEvent(db.Model):
+    # Outbox of committed changes that every worker replays to invalidate its caches, see changes.py
+    __table_args__ = (
+        db.Index('ix_change_event_created_at', 'created_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entity = db.Column(db.String(20), nullable=False)
+    op = db.Column(db.String(10), nullable=False)
+    entity_id = db.Column(db.Integer)
+    # The unit and user the change belongs to; null stands for every unit or user
+    unit_id = db.Column(db.Integer)
+    user_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
 
     def __repr__(self):
-        return f'<Submission {self.id} for Assignment {self.assignment_id}>'
\ No newline at end of file
+        return f'<ChangeEvent {self.id} {self.op} {self.entity} {self.entity_id}>'
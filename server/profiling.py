@@ -0,0 +1,268 @@
+"""Opt-in per-request profiling.
+
+A request is profiled when it carries ``X-Profile-Token`` matching
+PROFILING_TOKEN, or when it is picked at random with probability
+PROFILING_SAMPLE_RATE. While its handler runs, a sampler thread records the
+request thread's stack every PROFILING_INTERVAL_MS milliseconds, and an engine
+hook counts the SQL statements it issues.
+
+Profiles are written to PROFILING_DIR in collapsed-stack format (one
+``frame;frame;frame count`` line per distinct stack, which speedscope and
+flamegraph.pl open directly), next to a JSON file with the endpoint, status,
+duration, query count and the user's id and role. The directory is a ring of
+the PROFILING_KEEP slowest profiles: a sampled request only lands there if it
+was slower than the fastest one kept. Token-requested profiles are always
+written and their id is returned in the ``X-Profile-Id`` header.
+"""
+import hmac
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from datetime import datetime
+
+from flask import g, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+TOKEN_HEADER = 'X-Profile-Token'
+ID_HEADER = 'X-Profile-Id'
+ENVIRON_KEY = 'lms.profile'
+# Set by sampling_app() on requests whose sample was already drawn
+SAMPLED_KEY = 'lms.profile_sampled'
+PROFILE_ID_RE = re.compile(r'^\d{12}-[0-9a-f]{12}$')
+SERVER_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def _frame_name(code):
+    filename = code.co_filename
+    if filename.startswith(SERVER_DIR):
+        filename = os.path.relpath(filename, SERVER_DIR)
+    elif 'site-packages' in filename:
+        filename = filename.split('site-packages' + os.sep, 1)[1]
+    return f'{code.co_name} ({filename}:{code.co_firstlineno})'.replace(';', ':')
+
+
+def collapse(frame):
+    """The stack ending at ``frame`` as semicolon-separated frames, outermost first."""
+    names = []
+    while frame is not None:
+        names.append(_frame_name(frame.f_code))
+        frame = frame.f_back
+    return ';'.join(reversed(names))
+
+
+class Sampler(threading.Thread):
+    """Samples the stack of one thread until stopped."""
+
+    def __init__(self, thread_id, interval):
+        super().__init__(name='profile-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+
+    def run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is not None:
+                self.stacks[collapse(frame)] += 1
+
+    def stop(self):
+        self._stopped.set()
+        self.join()
+        return self.stacks
+
+
+class ActiveProfile:
+    def __init__(self, forced, sampler):
+        self.forced = forced
+        self.sampler = sampler
+        self.queries = 0
+        self.started_at = datetime.utcnow()
+        self.started = time.perf_counter()
+
+
+class ProfileStore:
+    """Directory ring of the slowest profiles; file names sort by duration."""
+
+    def __init__(self, directory, keep):
+        self.directory = directory
+        self.keep = keep
+        self._lock = threading.Lock()
+
+    def _ids(self):
+        if not os.path.isdir(self.directory):
+            return []
+        return sorted(name[:-5] for name in os.listdir(self.directory)
+                      if name.endswith('.json') and PROFILE_ID_RE.match(name[:-5]))
+
+    def _remove(self, profile_id):
+        for suffix in ('.json', '.collapsed'):
+            try:
+                os.remove(os.path.join(self.directory, profile_id + suffix))
+            except FileNotFoundError:
+                pass
+
+    def save(self, record, stacks, force=False):
+        """Write a profile unless the ring is full of slower ones. Returns its id or None."""
+        profile_id = f"{min(int(record['duration_ms'] * 1000), 10 ** 12 - 1):012d}-{uuid.uuid4().hex[:12]}"
+        with self._lock:
+            ids = self._ids()
+            if not force and len(ids) >= self.keep and profile_id <= ids[0]:
+                return None
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, profile_id)
+            with open(path + '.collapsed', 'w') as f:
+                f.writelines(f'{stack} {count}\n' for stack, count in stacks.most_common())
+            # The metadata is written last, so listings only see complete profiles
+            with open(path + '.json', 'w') as f:
+                json.dump(dict(record, id=profile_id), f)
+            ids = self._ids()
+            excess = len(ids) - self.keep
+            # A forced profile is kept even when it is the fastest; the
+            # fastest other profile makes room for it
+            candidates = [other for other in ids if other != profile_id] if force else ids
+            for stale in candidates[:max(0, excess)]:
+                self._remove(stale)
+        return profile_id
+
+    def list(self):
+        """Metadata of the kept profiles, slowest first."""
+        records = []
+        for profile_id in reversed(self._ids()):
+            record = self.metadata(profile_id)
+            if record is not None:
+                records.append(record)
+        return records
+
+    def metadata(self, profile_id):
+        if not PROFILE_ID_RE.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, profile_id + '.json')) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def collapsed(self, profile_id):
+        if not PROFILE_ID_RE.match(profile_id):
+            return None
+        try:
+            with open(os.path.join(self.directory, profile_id + '.collapsed')) as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+
+class RequestProfiler:
+    def __init__(self):
+        self.token = None
+        self.sample_rate = 0.0
+        self.interval = 0.002
+        self.store = None
+        # Request thread id -> ActiveProfile; /api/batch sub-requests run on the
+        # outer request's thread and are covered by its profile
+        self._active = {}
+        self._listening = False
+
+    def init_app(self, app):
+        self.token = app.config.get('PROFILING_TOKEN')
+        self.sample_rate = app.config.get('PROFILING_SAMPLE_RATE', 0.0)
+        self.interval = app.config.get('PROFILING_INTERVAL_MS', 2) / 1000.0
+        self.store = ProfileStore(app.config['PROFILING_DIR'], app.config.get('PROFILING_KEEP', 50))
+        app.extensions['profiler'] = self
+
+        if not self.token and not self.sample_rate:
+            return
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.teardown_request(self._discard)
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._count_query)
+            self._listening = True
+
+    @property
+    def enabled(self):
+        return bool(self.token or self.sample_rate)
+
+    def authorized(self):
+        """Whether the request carries the profiling token."""
+        return self.token_matches(request.headers.get(TOKEN_HEADER))
+
+    def token_matches(self, supplied):
+        return bool(self.token) and supplied is not None and hmac.compare_digest(supplied, self.token)
+
+    def sampled(self):
+        """Draw whether an unrequested request is profiled."""
+        return bool(self.sample_rate) and random.random() < self.sample_rate
+
+    def sampling_app(self, wsgi_app):
+        """Wrap ``wsgi_app`` so every request it serves counts as sampled.
+
+        For callers that drew the sample themselves, such as the ASGI app
+        before handing a request on to Flask.
+        """
+        def app(environ, start_response):
+            environ[SAMPLED_KEY] = True
+            return wsgi_app(environ, start_response)
+        return app
+
+    def _count_query(self, *args):
+        profile = self._active.get(threading.get_ident())
+        if profile is not None:
+            profile.queries += 1
+
+    def _start(self):
+        thread_id = threading.get_ident()
+        if thread_id in self._active:
+            return
+        forced = self.authorized()
+        if not forced and not request.environ.get(SAMPLED_KEY) and not self.sampled():
+            return
+        sampler = Sampler(thread_id, self.interval)
+        profile = ActiveProfile(forced, sampler)
+        self._active[thread_id] = profile
+        request.environ[ENVIRON_KEY] = profile
+        sampler.start()
+
+    def _finish(self, response):
+        profile = request.environ.pop(ENVIRON_KEY, None)
+        if profile is None:
+            return response
+        self._active.pop(threading.get_ident(), None)
+        stacks = profile.sampler.stop()
+        user = g.get('current_user')
+        record = {
+            'endpoint': request.endpoint,
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'duration_ms': round((time.perf_counter() - profile.started) * 1000, 3),
+            'queries': profile.queries,
+            'user_id': user.id if user is not None else None,
+            'role': user.role if user is not None else None,
+            'samples': sum(stacks.values()),
+            'interval_ms': self.interval * 1000,
+            'requested': profile.forced,
+            'started_at': profile.started_at.isoformat()
+        }
+        profile_id = self.store.save(record, stacks, force=profile.forced)
+        if profile.forced and profile_id:
+            response.headers[ID_HEADER] = profile_id
+        return response
+
+    def _discard(self, exc):
+        # after_request does not run when the handler raised
+        profile = request.environ.pop(ENVIRON_KEY, None)
+        if profile is not None:
+            self._active.pop(threading.get_ident(), None)
+            profile.sampler.stop()
+
+
+profiler = RequestProfiler()
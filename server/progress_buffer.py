@@ -0,0 +1,140 @@
+"""Write-coalescing buffer for unit progress updates.
+
+The video player reports progress every few seconds per watching student.
+Instead of one UPDATE and commit per report, updates land in an in-memory
+map keyed by (student, unit) that only keeps the highest value seen, and a
+background thread writes the whole map in one transaction every
+PROGRESS_FLUSH_INTERVAL_MS milliseconds, or sooner once
+PROGRESS_FLUSH_MAX_ENTRIES entries are waiting. Whatever is still buffered is
+flushed when the process exits.
+
+Reads that show progress merge in pending_for_student() so students never see
+their progress jump backwards while a flush is outstanding. Each flush also
+records one change event per student, so other workers drop their cached
+dashboards, and appends the flushed values to the 'progress' time series
+(see timeseries.py).
+"""
+import atexit
+import threading
+import time
+
+from sqlalchemy import bindparam, func, update
+
+from changes import change, changes
+from database import db
+from models import Enrollment
+from timeseries import METRICS, timeseries
+
+
+class ProgressBuffer:
+    def __init__(self, flush_interval_ms=500, max_entries=1000):
+        self.flush_interval = flush_interval_ms / 1000.0
+        self.max_entries = max_entries
+        self._app = None
+        self._lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._stopping = False
+        # student_id -> {unit_id: progress}
+        self._pending = {}
+        self._pending_count = 0
+        # Entries taken by a flush that has not committed yet, still visible to reads
+        self._inflight = {}
+
+    def init_app(self, app):
+        self.flush_interval = app.config.get('PROGRESS_FLUSH_INTERVAL_MS', 500) / 1000.0
+        self.max_entries = app.config.get('PROGRESS_FLUSH_MAX_ENTRIES', 1000)
+        self._app = app
+        app.extensions['progress_buffer'] = self
+        atexit.register(self.stop)
+
+    def record(self, student_id, unit_id, progress):
+        """Buffer a progress report, returning the value that will be stored."""
+        with self._lock:
+            units = self._pending.setdefault(student_id, {})
+            if unit_id not in units:
+                self._pending_count += 1
+            progress = max(progress, units.get(unit_id, 0))
+            units[unit_id] = progress
+            full = self._pending_count >= self.max_entries
+            if self._thread is None and not self._stopping:
+                self._thread = threading.Thread(target=self._run, name='progress-flush', daemon=True)
+                self._thread.start()
+        if full:
+            self._wakeup.set()
+        return progress
+
+    def pending_for_student(self, student_id):
+        """Buffered progress of one student as {unit_id: progress}."""
+        with self._lock:
+            merged = dict(self._inflight.get(student_id, {}))
+            for unit_id, progress in self._pending.get(student_id, {}).items():
+                merged[unit_id] = max(progress, merged.get(unit_id, 0))
+            return merged
+
+    def flush(self):
+        """Write everything buffered so far in a single transaction."""
+        with self._flush_lock:
+            with self._lock:
+                if not self._pending:
+                    return 0
+                batch, self._pending, self._pending_count = self._pending, {}, 0
+                self._inflight = batch
+
+            rows = [
+                {'b_student_id': student_id, 'b_unit_id': unit_id, 'b_progress': progress}
+                for student_id, units in batch.items()
+                for unit_id, progress in units.items()
+            ]
+            now = time.time()
+            statement = update(Enrollment.__table__)\
+                .where(Enrollment.__table__.c.student_id == bindparam('b_student_id'))\
+                .where(Enrollment.__table__.c.unit_id == bindparam('b_unit_id'))\
+                .values(progress=func.max(func.coalesce(Enrollment.__table__.c.progress, 0), bindparam('b_progress')))
+            try:
+                with self._app.app_context():
+                    with db.engine.begin() as connection:
+                        connection.execute(statement, rows)
+                        timeseries.append((
+                            (row['b_student_id'], row['b_unit_id'], METRICS['progress'], now, row['b_progress'])
+                            for row in rows
+                        ), connection=connection)
+                        changes.record(*(change('progress', user_id=student_id) for student_id in batch),
+                                       connection=connection)
+            except Exception:
+                # Put the batch back so the next flush retries it
+                with self._lock:
+                    for student_id, units in batch.items():
+                        pending = self._pending.setdefault(student_id, {})
+                        for unit_id, progress in units.items():
+                            if unit_id not in pending:
+                                self._pending_count += 1
+                            pending[unit_id] = max(progress, pending.get(unit_id, 0))
+                    self._inflight = {}
+                raise
+            changes.notify()
+            with self._lock:
+                self._inflight = {}
+            return len(rows)
+
+    def _run(self):
+        while not self._stopping:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                self._app.logger.error(f'Error flushing progress updates: {str(e)}')
+
+    def stop(self):
+        """Stop the flush thread and write out anything still buffered."""
+        self._stopping = True
+        self._wakeup.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        if self._app is not None:
+            self.flush()
+
+
+progress_buffer = ProgressBuffer()
@@ -0,0 +1,254 @@
+"""Select statements for catalog listings.
+
+Built with plain select() so they run unchanged on the sync session and on
+the async engine used by asgi.py. Each takes the requested sparse fieldset
+(see fieldsets.py) and only selects the columns, joins and count subqueries
+those fields need.
+"""
+from sqlalchemy import case, func, select
+from sqlalchemy.orm import joinedload, load_only, selectinload
+
+from fieldsets import shape
+from models import Unit, User, Enrollment, Assignment, Submission, USER_FIELDS
+
+# Submission columns a fieldset can leave out
+SUBMISSION_COLUMNS = ('document_url', 'submission_link', 'submitted_at', 'grade', 'feedback')
+
+UNIT_SUMMARY_FIELDS = (
+    'id', 'title', 'description', 'category', 'start_date', 'end_date', 'teacher',
+    'average_rating', 'rating_count', 'total_enrolled',
+)
+UNIT_DETAIL_FIELDS = UNIT_SUMMARY_FIELDS + ('video_url', 'is_enrolled', 'assignments', 'related_units')
+
+
+def unit_summary_select(fields=UNIT_SUMMARY_FIELDS):
+    """Unit listing rows with teacher name, rating and enrollment count in one statement."""
+    columns = [Unit.id]
+    columns += [
+        getattr(Unit, name) for name in ('title', 'description', 'category', 'start_date', 'end_date')
+        if name in fields
+    ]
+    if 'teacher' in fields:
+        columns += [Unit.teacher_id, User.username.label('teacher_name')]
+    if 'average_rating' in fields:
+        columns.append(func.coalesce(Unit.average_rating, 0.0).label('average_rating'))
+    if 'rating_count' in fields:
+        columns.append(Unit.rating_count)
+    if 'total_enrolled' in fields:
+        total_enrolled = select(func.count(Enrollment.id))\
+            .where(Enrollment.unit_id == Unit.id)\
+            .correlate(Unit)\
+            .scalar_subquery()
+        columns.append(total_enrolled.label('total_enrolled'))
+
+    statement = select(*columns)
+    if 'teacher' in fields:
+        statement = statement.join(User, User.id == Unit.teacher_id)
+    return statement
+
+
+def unit_page_statements(statement, sort_by, page, per_page):
+    """(count, page) selects for one page of a unit listing ``statement``."""
+    statement = order_units(statement, sort_by)
+    count = select(func.count()).select_from(statement.order_by(None).subquery())
+    return count, statement.offset((page - 1) * per_page).limit(per_page)
+
+
+def unit_detail_select(unit_id, fields=UNIT_DETAIL_FIELDS):
+    """The unit detail row: the summary columns plus what the detail fields need."""
+    statement = unit_summary_select(fields).where(Unit.id == unit_id)
+    if 'teacher' in fields:
+        statement = statement.add_columns(User.bio.label('teacher_bio'))
+    if 'video_url' in fields:
+        statement = statement.add_columns(Unit.video_url)
+    if 'related_units' in fields and 'category' not in fields:
+        # The related units fallback matches on category
+        statement = statement.add_columns(Unit.category)
+    return statement
+
+
+def enrolled_statement(student_id, unit_id):
+    return select(Enrollment.id).where(Enrollment.student_id == student_id, Enrollment.unit_id == unit_id).limit(1)
+
+
+def unit_assignments_statement(unit_id):
+    return select(Assignment.id, Assignment.title).where(Assignment.unit_id == unit_id)
+
+
+def unit_detail(row, fields, is_enrolled=False, assignments=(), related_units=()):
+    """The unit dict returned by GET /api/units/<id>; the extra parts are only read when requested."""
+    unit_data = unit_summary(row, fields)
+    if 'teacher' in fields:
+        unit_data['teacher']['bio'] = row.teacher_bio
+    if 'video_url' in fields:
+        unit_data['video_url'] = row.video_url
+    if 'is_enrolled' in fields:
+        unit_data['is_enrolled'] = is_enrolled
+    if 'assignments' in fields:
+        unit_data['assignments'] = [{
+            'id': assignment.id,
+            'title': assignment.title
+        } for assignment in assignments]
+    if 'related_units' in fields:
+        unit_data['related_units'] = [{
+            'id': related.id,
+            'title': related.title,
+            'description': related.description,
+            'teacher': {
+                'id': related.teacher_id,
+                'name': related.teacher_name
+            },
+            'average_rating': related.average_rating,
+            'total_enrolled': related.total_enrolled
+        } for related in related_units]
+    return unit_data
+
+
+def order_units(statement, sort_by):
+    """Order a unit listing as the catalog snapshot does: unrated and undated units last, ties by id."""
+    if sort_by == 'rating':
+        return statement.order_by(Unit.average_rating.desc().nulls_last(), Unit.id)
+    if sort_by == 'date':
+        return statement.order_by(Unit.start_date.desc().nulls_last(), Unit.id)
+    return statement.order_by(Unit.title, Unit.id)
+
+
+def unit_summary(row, fields=UNIT_SUMMARY_FIELDS):
+    """The unit dict returned by the catalog listing endpoints."""
+    return shape(fields, {
+        'id': lambda: row.id,
+        'title': lambda: row.title,
+        'description': lambda: row.description,
+        'category': lambda: row.category,
+        'start_date': lambda: row.start_date.isoformat() if row.start_date else None,
+        'end_date': lambda: row.end_date.isoformat() if row.end_date else None,
+        'teacher': lambda: {
+            'id': row.teacher_id,
+            'name': row.teacher_name
+        },
+        'average_rating': lambda: row.average_rating,
+        'rating_count': lambda: row.rating_count,
+        'total_enrolled': lambda: row.total_enrolled
+    })
+
+
+def unit_load_options(fields):
+    """ORM loader options for Unit.to_dict(fields): requested columns only, no lazy loads."""
+    columns = [
+        getattr(Unit, name)
+        for name in ('title', 'description', 'category', 'video_url', 'start_date', 'end_date')
+        if name in fields
+    ]
+    options = [load_only(Unit.id, Unit.teacher_id, *columns)]
+    if 'teacher' in fields:
+        options.append(joinedload(Unit.teacher).load_only(User.username))
+    if 'average_rating' in fields or 'rating_count' in fields:
+        options.append(selectinload(Unit.ratings))
+    return options
+
+
+def submission_load_options(fields, *columns):
+    """ORM loader options for the requested submission fields, plus ``columns``.
+
+    The text side table is only read, in one extra query, when
+    'submission_text' is requested.
+    """
+    columns += tuple(getattr(Submission, name) for name in SUBMISSION_COLUMNS if name in fields)
+    options = [load_only(Submission.id, Submission.assignment_id, *columns)]
+    if 'submission_text' in fields:
+        options.append(selectinload(Submission.content))
+    return options
+
+
+def load_deferred(objects, *attributes):
+    """Load deferred ``attributes`` of already loaded ``objects`` in one query instead of one each."""
+    if not objects:
+        return
+    model = type(objects[0])
+    model.query.options(load_only(model.id, *attributes))\
+        .filter(model.id.in_({obj.id for obj in objects}))\
+        .all()
+
+
+def teacher_summary_select(fields=USER_FIELDS):
+    """Teacher rows shaped like User.to_dict, with the counts as subqueries only when requested."""
+    columns = [User.id]
+    columns += [
+        getattr(User, name) for name in ('username', 'email', 'role', 'bio', 'qualifications')
+        if name in fields
+    ]
+    if 'total_units' in fields:
+        total_units = select(func.count(Unit.id))\
+            .where(Unit.teacher_id == User.id)\
+            .correlate(User)\
+            .scalar_subquery()
+        columns.append(total_units.label('total_units'))
+    if 'total_students' in fields:
+        total_students = select(func.count(Enrollment.id))\
+            .join(Unit, Unit.id == Enrollment.unit_id)\
+            .where(Unit.teacher_id == User.id)\
+            .correlate(User)\
+            .scalar_subquery()
+        columns.append(total_students.label('total_students'))
+    return select(*columns).where(User.role == 'teacher')
+
+
+def teacher_summary(row, fields=USER_FIELDS):
+    return {name: getattr(row, name) for name in USER_FIELDS if name in fields}
+
+
+def pagination_meta(total, page, per_page):
+    pages = (total + per_page - 1) // per_page if per_page else 0
+    return {
+        'total': total,
+        'pages': pages,
+        'current_page': page,
+        'has_next': page < pages,
+        'has_prev': page > 1
+    }
+
+
+def student_dashboard_statements(student_id):
+    """(totals, recent) selects behind the student dashboard: one aggregate, one join."""
+    totals = select(
+        func.count(Enrollment.id),
+        func.coalesce(func.sum(case((Enrollment.progress == 100, 1), else_=0)), 0),
+        func.avg(Enrollment.grade)
+    ).where(Enrollment.student_id == student_id)
+
+    recent = select(Unit.title, Enrollment.enrollment_date)\
+        .join(Unit, Unit.id == Enrollment.unit_id)\
+        .where(Enrollment.student_id == student_id)\
+        .order_by(Enrollment.enrollment_date.desc())\
+        .limit(5)
+    return totals, recent
+
+
+def stored_progress_statement(student_id, unit_ids):
+    return select(Enrollment.unit_id, Enrollment.progress).where(
+        Enrollment.student_id == student_id,
+        Enrollment.unit_id.in_(unit_ids)
+    )
+
+
+def student_dashboard(totals, recent, buffered, stored_progress):
+    """The dashboard dict from the two statements above.
+
+    ``buffered`` is progress still in the write-behind buffer and
+    ``stored_progress`` the database values for those units, since buffered
+    progress may complete units the aggregate does not count yet.
+    """
+    enrolled, completed, average_grade = totals
+    completed += sum(
+        1 for unit_id, progress in stored_progress.items()
+        if progress != 100 and buffered[unit_id] == 100
+    )
+    return {
+        'enrolledCourses': enrolled,
+        'completedCourses': completed,
+        'averageScore': round(average_grade * 100) if average_grade is not None else 0,
+        'recentActivities': [{
+            'description': f"Enrolled in {title}",
+            'date': enrollment_date.strftime('%Y-%m-%d %H:%M')
+        } for title, enrollment_date in recent]
+    }
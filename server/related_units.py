@@ -0,0 +1,292 @@
+"""Precomputed "related units" index.
+
+Units are turned into TF-IDF vectors over their title, description and
+category, and the top RELATED_UNITS_TOP_N most similar units of every unit are
+stored in the related_unit table ordered by rank. The unit detail page then
+reads its neighbours with a single primary-key range query.
+
+rebuild_related_index() recomputes everything in one batch (``flask
+rebuild-related``), index_unit() folds a newly created unit into the existing
+lists without touching unrelated rows, scoring it only against the units that
+share a term with it.
+"""
+import heapq
+import math
+import re
+import threading
+from collections import Counter, defaultdict
+
+from sqlalchemy import func, select
+
+from changes import changes
+from database import db
+from models import Unit, User, Enrollment, RelatedUnit
+
+RELATED_UNITS_TOP_N = 8
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+STOPWORDS = frozenset("""
+    a an and are as at be by for from has have in into is it its of on or
+    that the their this to was were will with you your
+""".split())
+
+# Title and category words say more about a unit than its description does
+TITLE_WEIGHT = 2.0
+CATEGORY_WEIGHT = 3.0
+
+
+def _terms(title, description, category):
+    terms = Counter()
+    for token in TOKEN_RE.findall((description or '').lower()):
+        if token not in STOPWORDS and len(token) > 1:
+            terms[token] += 1.0
+    for token in TOKEN_RE.findall((title or '').lower()):
+        if token not in STOPWORDS and len(token) > 1:
+            terms[token] += TITLE_WEIGHT
+    if category:
+        # Whole-category token so "Data Science" does not match "Computer Science"
+        terms['category:' + category.strip().lower()] += CATEGORY_WEIGHT
+    return terms
+
+
+def _load_documents():
+    rows = db.session.query(Unit.id, Unit.title, Unit.description, Unit.category).all()
+    return {row.id: _terms(row.title, row.description, row.category) for row in rows}
+
+
+def _vectorize(documents):
+    """Return L2-normalised TF-IDF vectors and an inverted index over them."""
+    doc_freq = Counter()
+    for terms in documents.values():
+        doc_freq.update(terms.keys())
+
+    total = len(documents)
+    vectors = {}
+    postings = defaultdict(list)
+    for unit_id, terms in documents.items():
+        vector = {
+            term: (1.0 + math.log(tf)) * math.log((1.0 + total) / (1.0 + doc_freq[term]))
+            for term, tf in terms.items()
+        }
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        if norm:
+            vector = {term: w / norm for term, w in vector.items() if w}
+        vectors[unit_id] = vector
+        for term, weight in vector.items():
+            postings[term].append((unit_id, weight))
+    return vectors, postings
+
+
+def _neighbours(unit_id, vector, postings, top_n):
+    # Only units sharing at least one term can have a non-zero cosine
+    scores = defaultdict(float)
+    for term, weight in vector.items():
+        for other_id, other_weight in postings.get(term, ()):
+            if other_id != unit_id:
+                scores[other_id] += weight * other_weight
+    return heapq.nlargest(top_n, ((score, other_id) for other_id, score in scores.items() if score > 0))
+
+
+def _rows_for(unit_id, neighbours):
+    return [
+        {'unit_id': unit_id, 'rank': rank, 'related_unit_id': other_id, 'score': score}
+        for rank, (score, other_id) in enumerate(neighbours)
+    ]
+
+
+def rebuild_related_index(top_n=RELATED_UNITS_TOP_N):
+    """Recompute the neighbour lists of every unit. Returns the number of units indexed."""
+    vectors, postings = _vectorize(_load_documents())
+
+    rows = []
+    for unit_id, vector in vectors.items():
+        rows.extend(_rows_for(unit_id, _neighbours(unit_id, vector, postings, top_n)))
+
+    db.session.query(RelatedUnit).delete()
+    if rows:
+        db.session.execute(RelatedUnit.__table__.insert(), rows)
+    db.session.commit()
+    return len(vectors)
+
+
+class TermIndex:
+    """Term counts, document frequencies and postings of every unit.
+
+    index_unit() keeps one per process so a new unit is scored only against
+    the units sharing a term with it. It is loaded on first use and kept
+    current from the change feed, so units other processes created or edited
+    are read back before the next unit is scored.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._documents = None
+        self._doc_freq = Counter()
+        self._postings = defaultdict(set)
+        self._pending = set()
+
+    def on_changes(self, changes):
+        """changes.py handler: note the units to read back before the next lookup."""
+        with self._lock:
+            if self._documents is None:
+                return
+            for change in changes:
+                if change.entity is None:
+                    self._documents = None
+                    return
+                if change.entity == 'unit':
+                    self._pending.add(change.entity_id)
+
+    def _put(self, unit_id, terms):
+        """Replace the unit's terms; ``None`` drops the unit."""
+        old = self._documents.pop(unit_id, None)
+        if old:
+            for term in old:
+                self._doc_freq[term] -= 1
+                if not self._doc_freq[term]:
+                    del self._doc_freq[term]
+                self._postings[term].discard(unit_id)
+                if not self._postings[term]:
+                    del self._postings[term]
+        if terms is not None:
+            self._documents[unit_id] = terms
+            for term in terms:
+                self._doc_freq[term] += 1
+                self._postings[term].add(unit_id)
+
+    def refresh(self, unit_ids=()):
+        """Load the index, or read back the pending units and ``unit_ids``."""
+        with self._lock:
+            if self._documents is None:
+                self._pending.clear()
+                self._documents, self._doc_freq, self._postings = {}, Counter(), defaultdict(set)
+                for unit_id, terms in _load_documents().items():
+                    self._put(unit_id, terms)
+                return
+            unit_ids = self._pending | set(unit_ids)
+            self._pending = set()
+        if not unit_ids:
+            return
+        # Read outside the lock; a unit edited meanwhile is pending again
+        rows = db.session.query(Unit.id, Unit.title, Unit.description, Unit.category)\
+            .filter(Unit.id.in_(unit_ids)).all()
+        documents = {row.id: _terms(row.title, row.description, row.category) for row in rows}
+        with self._lock:
+            if self._documents is not None:
+                for unit_id in unit_ids:
+                    self._put(unit_id, documents.get(unit_id))
+
+    def _vector(self, terms):
+        total = len(self._documents)
+        vector = {
+            term: (1.0 + math.log(tf)) * math.log((1.0 + total) / (1.0 + self._doc_freq[term]))
+            for term, tf in terms.items()
+        }
+        norm = math.sqrt(sum(w * w for w in vector.values()))
+        if norm:
+            vector = {term: w / norm for term, w in vector.items() if w}
+        return vector
+
+    def neighbours(self, unit_id, top_n):
+        """The unit's top_n (score, unit id) neighbours, or None for an unknown unit."""
+        with self._lock:
+            terms = self._documents.get(unit_id) if self._documents is not None else None
+            if terms is None:
+                return None
+            vector = self._vector(terms)
+            # Only units sharing at least one term can have a non-zero cosine
+            candidates = set()
+            for term in vector:
+                candidates |= self._postings[term]
+            candidates.discard(unit_id)
+            scores = []
+            for other_id in candidates:
+                other = self._vector(self._documents[other_id])
+                score = sum(weight * other.get(term, 0.0) for term, weight in vector.items())
+                if score > 0:
+                    scores.append((score, other_id))
+        return heapq.nlargest(top_n, scores)
+
+
+term_index = TermIndex()
+
+
+def index_unit(unit_id, top_n=RELATED_UNITS_TOP_N):
+    """Add a new unit to the index.
+
+    Writes the unit's own neighbour list and inserts it into the lists of the
+    units it is now among the top_n most similar to. Only units sharing a term
+    with the new one are scored. Scores of other pairs are left alone even
+    though document frequencies shifted slightly; running
+    ``flask rebuild-related`` corrects that drift.
+    """
+    changes.catch_up()
+    term_index.refresh([unit_id])
+    neighbours = term_index.neighbours(unit_id, top_n)
+    if neighbours is None:
+        return
+
+    rows = _rows_for(unit_id, neighbours)
+
+    # Cosine similarity is symmetric, so the new unit's neighbours are exactly
+    # the units whose lists it may enter
+    candidate_scores = {other_id: score for score, other_id in neighbours}
+    existing = defaultdict(list)
+    if candidate_scores:
+        for row in RelatedUnit.query.filter(RelatedUnit.unit_id.in_(candidate_scores)).all():
+            existing[row.unit_id].append((row.score, row.related_unit_id))
+
+    changed = []
+    for other_id, score in candidate_scores.items():
+        current = existing[other_id]
+        if len(current) < top_n or score > min(current)[0]:
+            current.append((score, unit_id))
+            rows.extend(_rows_for(other_id, heapq.nlargest(top_n, current)))
+            changed.append(other_id)
+
+    db.session.query(RelatedUnit).filter(
+        RelatedUnit.unit_id.in_(changed + [unit_id])
+    ).delete(synchronize_session=False)
+    if rows:
+        db.session.execute(RelatedUnit.__table__.insert(), rows)
+    db.session.commit()
+
+
+def related_unit_statements(unit_id, category, limit=4):
+    """Selects for the units related to a unit, best match first.
+
+    Returns the precomputed-index query and the same-category fallback used
+    for units that have not been indexed yet. Both select the summary fields
+    (teacher name, rating, enrollment count) in the same statement.
+    """
+    total_enrolled = select(func.count(Enrollment.id))\
+        .where(Enrollment.unit_id == Unit.id)\
+        .correlate(Unit)\
+        .scalar_subquery()
+
+    summary = select(
+        Unit.id,
+        Unit.title,
+        Unit.description,
+        Unit.teacher_id,
+        User.username.label('teacher_name'),
+        func.coalesce(Unit.average_rating, 0.0).label('average_rating'),
+        total_enrolled.label('total_enrolled')
+    ).join(User, User.id == Unit.teacher_id)
+
+    indexed = summary.join(RelatedUnit, RelatedUnit.related_unit_id == Unit.id)\
+        .where(RelatedUnit.unit_id == unit_id)\
+        .order_by(RelatedUnit.rank)\
+        .limit(limit)
+    fallback = summary.where(Unit.category == category, Unit.id != unit_id)\
+        .limit(limit)
+    return indexed, fallback
+
+
+def related_unit_rows(unit, limit=4):
+    """Summary rows for the units related to ``unit``, best match first."""
+    indexed, fallback = related_unit_statements(unit.id, unit.category, limit)
+    rows = db.session.execute(indexed).all()
+    if rows:
+        return rows
+    return db.session.execute(fallback).all()
@@ -0,0 +1,37 @@
+"""Per-batch memo for data several routes load for the same user.
+
+/api/batch runs its sub-requests inside one app context, so they share a
+SQLAlchemy session. The identity map only holds weak references though, so
+``memoized`` keeps a small dict on ``g``: the decoded token, the current user
+and a student's enrollments are loaded once per batch instead of once per
+sub-request. Outside a batch it simply calls the loader.
+"""
+from flask import g
+from sqlalchemy.orm import joinedload
+
+from models import Enrollment, Unit
+
+
+def begin_batch():
+    g.batch_memo = {}
+
+
+def memoized(key, loader):
+    memo = g.get('batch_memo')
+    if memo is None:
+        return loader()
+    if key not in memo:
+        memo[key] = loader()
+    return memo[key]
+
+
+def student_enrollments(student_id):
+    """All enrollments of a student, with the unit fields the student routes read preloaded."""
+    return memoized(('enrollments', student_id), lambda: (
+        Enrollment.query.options(
+            joinedload(Enrollment.unit).joinedload(Unit.teacher),
+            joinedload(Enrollment.unit).selectinload(Unit.ratings)
+        )
+        .filter_by(student_id=student_id)
+        .all()
+    ))
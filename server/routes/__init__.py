@@ -0,0 +1,6 @@
+from routes import accounts, batch, catalog, jobs, ops, profile, streams, student, teacher
+
+
+def register_blueprints(app):
+    for module in (accounts, catalog, student, teacher, profile, streams, batch, jobs, ops):
+        app.register_blueprint(module.bp)
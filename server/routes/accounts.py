@@ -0,0 +1,123 @@
+from flask import Blueprint, jsonify, request
+
+from auth import generate_token
+from database import db
+from models import User
+
+bp = Blueprint('accounts', __name__)
+
+
+@bp.route('/api/login', methods=['POST'])
+def login():
+    data = request.get_json()
+    if not data or not data.get('email') or not data.get('password'):
+        return jsonify({'error': 'Missing credentials'}), 400
+
+    user = User.query.filter_by(email=data['email']).first()
+    if not user or not user.check_password(data['password']):
+        return jsonify({'error': 'Invalid credentials'}), 401
+
+    token = generate_token(user.id)
+    response = jsonify({
+        'message': 'Login successful',
+        'access_token': token,
+        'user_id': user.id,
+        'role': user.role
+    })
+    response.set_cookie('token', token, httponly=True, secure=True)
+    return response, 200
+
+
+@bp.route('/api/teacher/login', methods=['POST', 'OPTIONS'])
+def teacher_login():
+    if request.method == 'OPTIONS':
+        return '', 200
+
+    data = request.get_json()
+    if not data or not data.get('email') or not data.get('password'):
+        return jsonify({'error': 'Missing credentials'}), 400
+
+    user = User.query.filter_by(email=data['email'], role='teacher').first()
+    if not user:
+        return jsonify({'error': 'Teacher account not found'}), 404
+
+    if not user.check_password(data['password']):
+        return jsonify({'error': 'Invalid credentials'}), 401
+
+    token = generate_token(user.id)
+    response = jsonify({
+        'message': 'Login successful',
+        'access_token': token,
+        'user_id': user.id,
+        'role': user.role
+    })
+    response.set_cookie('token', token, httponly=True, secure=True)
+    return response, 200
+
+
+@bp.route('/api/register', methods=['POST', 'OPTIONS'])
+def register():
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    data = request.get_json()
+    if not data or not data.get('username') or not data.get('email') or not data.get('password'):
+        return jsonify({'error': 'Missing required fields'}), 400
+
+    if User.query.filter_by(email=data['email']).first():
+        return jsonify({'error': 'Email already exists'}), 409
+    
+    new_user = User(
+        username=data['username'],
+        email=data['email'],
+        role='student'
+    )
+    new_user.set_password(data['password'])
+    db.session.add(new_user)
+    db.session.commit()
+    
+    token = generate_token(new_user.id)
+    response = jsonify({
+        'message': 'User created successfully',
+        'access_token': token,
+        'user_id': new_user.id,
+        'role': new_user.role
+    })
+    response.set_cookie('token', token, httponly=True, secure=True)
+    return response, 201
+
+
+@bp.route('/api/teacher/register', methods=['POST', 'OPTIONS'])
+def teacher_register():
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    data = request.get_json()
+    if not data or not data.get('username') or not data.get('email') or not data.get('password'):
+        return jsonify({'error': 'Missing required fields'}), 400
+
+    if User.query.filter_by(email=data['email']).first():
+        return jsonify({'error': 'Email already exists'}), 409
+    
+    new_teacher = User(
+        username=data['username'],
+        email=data['email'],
+        role='teacher',
+        qualifications=data.get('qualifications'),
+        bio=data.get('bio')
+    )
+    new_teacher.set_password(data['password'])
+    db.session.add(new_teacher)
+    db.session.commit()
+    
+    token = generate_token(new_teacher.id)
+    response = jsonify({
+        'message': 'Teacher registered successfully',
+        'access_token': token,
+        'user_id': new_teacher.id,
+        'role': new_teacher.role
+    })
+    response.set_cookie('token', token, httponly=True, secure=True)
+    return response, 201
+
+# Protected routes
@@ -0,0 +1,61 @@
+from flask import Blueprint, current_app, jsonify, request
+from werkzeug.test import EnvironBuilder
+
+from database import db
+from request_memo import begin_batch
+
+bp = Blueprint('batch', __name__)
+
+MAX_BATCH_REQUESTS = 20
+# Sub-requests are reads only; streams and nested batches are refused
+UNBATCHABLE_PATHS = ('/api/batch', '/api/events')
+
+
+def run_sub_request(item, headers):
+    path = item.get('path') if isinstance(item, dict) else None
+    method = (item.get('method') or 'GET').upper() if isinstance(item, dict) else 'GET'
+    if not path or not path.startswith('/api/') or path.split('?')[0] in UNBATCHABLE_PATHS:
+        return 400, {'error': 'Invalid path'}
+    if method != 'GET':
+        return 405, {'error': 'Only GET requests can be batched'}
+
+    environ = EnvironBuilder(path=path, method='GET', headers=headers).get_environ()
+    # The app context, and with it the session, is shared with the outer request
+    with current_app.request_context(environ):
+        try:
+            response = current_app.full_dispatch_request()
+        except Exception as e:
+            db.session.rollback()
+            return 500, {'error': str(e)}
+    if response.is_json:
+        return response.status_code, response.get_json()
+    return response.status_code, response.get_data(as_text=True)
+
+
+@bp.route('/api/batch', methods=['POST'])
+def run_batch():
+    """Run several GET requests in one round trip.
+
+    Body: {"requests": [{"id": "dashboard", "path": "/api/student/dashboard/1"}, ...]}
+    """
+    data = request.get_json(silent=True) or {}
+    items = data.get('requests')
+    if not isinstance(items, list) or not items:
+        return jsonify({'error': 'requests must be a non-empty list'}), 400
+    if len(items) > MAX_BATCH_REQUESTS:
+        return jsonify({'error': f'At most {MAX_BATCH_REQUESTS} requests per batch'}), 400
+
+    headers = {}
+    if request.headers.get('Authorization'):
+        headers['Authorization'] = request.headers['Authorization']
+
+    begin_batch()
+    responses = []
+    for item in items:
+        status, body = run_sub_request(item, headers)
+        responses.append({
+            'id': item.get('id') if isinstance(item, dict) else None,
+            'status': status,
+            'body': body
+        })
+    return jsonify({'responses': responses})
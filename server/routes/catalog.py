@@ -0,0 +1,319 @@
+from flask import Blueprint, jsonify, request, make_response
+from sqlalchemy import func
+from sqlalchemy.orm import load_only
+
+from auth import decode_token
+from cache import facets_cache
+from catalog_filters import (
+    FilterError, category_facet_statement, facets_from_rows, filter_clauses, parse_filters, rating_facet_statement,
+    snapshot_facets, snapshot_mask,
+)
+from catalog_snapshot import catalog_snapshots
+from database import db
+from fieldsets import FieldSelectionError, requested_fields
+from models import User, Unit, Rating, UNIT_FIELDS, USER_FIELDS
+from queries import (
+    enrolled_statement, pagination_meta, teacher_summary, teacher_summary_select, unit_assignments_statement,
+    unit_detail, unit_detail_select, unit_load_options, unit_page_statements, unit_summary, unit_summary_select,
+    UNIT_DETAIL_FIELDS, UNIT_SUMMARY_FIELDS,
+)
+from related_units import related_unit_rows
+from suggest import fold, suggestions
+from trending import trending, WINDOWS
+
+bp = Blueprint('catalog', __name__)
+
+TEACHER_DETAIL_FIELDS = ('id', 'username', 'email', 'bio', 'qualifications', 'units', 'ratings')
+
+
+def unit_page(statement, fields, page, per_page, sort_by):
+    count, statement = unit_page_statements(statement, sort_by, page, per_page)
+    total = db.session.scalar(count)
+    rows = db.session.execute(statement).all()
+    return dict(
+        units=[unit_summary(row, fields) for row in rows],
+        **pagination_meta(total, page, per_page)
+    )
+
+
+def unit_facets(filters, snapshot=None):
+    facets = facets_cache.get(filters)
+    if facets is None:
+        generation = facets_cache.generation(filters)
+        if snapshot is not None:
+            facets = snapshot_facets(snapshot, filters)
+        else:
+            facets = facets_from_rows(
+                db.session.execute(category_facet_statement(filters)).all(),
+                db.session.execute(rating_facet_statement(filters)).all()
+            )
+        facets_cache.set(filters, facets, generation)
+    return facets
+
+
+@bp.route('/')
+def welcome():
+    return "Welcome to the LMS API!"
+
+
+@bp.route('/api/units', methods=['GET'])
+def get_units():
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 12, type=int)
+    sort_by = request.args.get('sort_by', 'title')
+
+    try:
+        fields = requested_fields(UNIT_SUMMARY_FIELDS)
+        filters = parse_filters(request.args)
+        snapshot = catalog_snapshots.current()
+        if filters is None:
+            if snapshot is not None:
+                return jsonify(snapshot.unit_page(fields, page, per_page, sort_by))
+            return jsonify(unit_page(unit_summary_select(fields), fields, page, per_page, sort_by))
+
+        if snapshot is not None:
+            units_data = snapshot.unit_page(fields, page, per_page, sort_by, mask=snapshot_mask(snapshot, filters))
+        else:
+            statement = unit_summary_select(fields).where(*filter_clauses(filters))
+            units_data = unit_page(statement, fields, page, per_page, sort_by)
+        units_data['facets'] = unit_facets(filters, snapshot)
+        return jsonify(units_data)
+    except (FieldSelectionError, FilterError) as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/units/latest')
+def get_latest_units():
+    try:
+        fields = requested_fields(UNIT_SUMMARY_FIELDS)
+    except FieldSelectionError as e:
+        return jsonify({'error': str(e)}), 400
+
+    snapshot = catalog_snapshots.current()
+    if snapshot is not None:
+        return jsonify(snapshot.latest(fields, 6))
+    rows = db.session.execute(
+        unit_summary_select(fields).order_by(Unit.created_at.desc().nulls_last(), Unit.id).limit(6)
+    ).all()
+    return jsonify([unit_summary(row, fields) for row in rows])
+
+
+@bp.route('/api/teacher/')
+def get_featured_teachers():
+    try:
+        fields = requested_fields(USER_FIELDS)
+    except FieldSelectionError as e:
+        return jsonify({'error': str(e)}), 400
+
+    featured_teachers = db.session.execute(
+        teacher_summary_select(fields)
+        .join(Unit, Unit.teacher_id == User.id)
+        .group_by(User.id)
+        .order_by(func.count(Unit.id).desc())
+        .limit(3)
+    ).all()
+    return jsonify([teacher_summary(teacher, fields) for teacher in featured_teachers])
+
+
+@bp.route('/api/units/popular')
+def get_popular_units():
+    window = request.args.get('window')
+    if window is not None and window not in WINDOWS:
+        return jsonify({'error': f'Unknown window, use one of: {", ".join(WINDOWS)}'}), 400
+    try:
+        fields = requested_fields(UNIT_SUMMARY_FIELDS + ('trending_score',))
+    except FieldSelectionError as e:
+        return jsonify({'error': str(e)}), 400
+
+    ranked = trending.top(6, window=window)
+    unit_ids = [unit_id for unit_id, _ in ranked]
+    rows = {
+        row.id: row
+        for row in db.session.execute(unit_summary_select(fields).where(Unit.id.in_(unit_ids))).all()
+    } if unit_ids else {}
+
+    units_data = []
+    for unit_id, score in ranked:
+        row = rows.get(unit_id)
+        if row is None:
+            continue
+        unit_data = unit_summary(row, fields)
+        if 'trending_score' in fields:
+            unit_data['trending_score'] = score
+        units_data.append(unit_data)
+
+    return jsonify(units_data)
+
+
+@bp.route('/api/units/recommended')
+def get_recommended_units():
+    try:
+        fields = requested_fields(UNIT_SUMMARY_FIELDS)
+    except FieldSelectionError as e:
+        return jsonify({'error': str(e)}), 400
+
+    rows = db.session.execute(
+        unit_summary_select(fields).order_by(Unit.average_rating.desc()).limit(3)
+    ).all()
+    return jsonify([unit_summary(row, fields) for row in rows])
+
+
+@bp.route('/api/units/category/<category>')
+def get_units_by_category(category):
+    page = request.args.get('page', 1, type=int)
+    per_page = request.args.get('per_page', 12, type=int)
+    sort_by = request.args.get('sort_by', 'title')
+
+    try:
+        fields = requested_fields(UNIT_SUMMARY_FIELDS)
+        snapshot = catalog_snapshots.current()
+        if snapshot is not None:
+            return jsonify(snapshot.unit_page(fields, page, per_page, sort_by, category))
+        statement = unit_summary_select(fields).where(Unit.category == category)
+        return jsonify(unit_page(statement, fields, page, per_page, sort_by))
+    except FieldSelectionError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/units/categories')
+def get_categories():
+    try:
+        snapshot = catalog_snapshots.current()
+        if snapshot is not None:
+            return jsonify({'categories': [category for category in snapshot.categories if category]})
+        categories = db.session.query(Unit.category).distinct().all()
+        return jsonify({'categories': [cat[0] for cat in categories if cat[0]]})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/units/suggest')
+def suggest_units():
+    prefix = request.args.get('prefix', '')
+    limit = request.args.get('limit', 5, type=int)
+    if not fold(prefix):
+        return jsonify({'error': 'prefix is required'}), 400
+    if not 1 <= limit <= 20:
+        return jsonify({'error': 'limit must be between 1 and 20'}), 400
+
+    try:
+        return jsonify(dict(prefix=prefix, **suggestions.suggest(prefix, limit)))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/units/<int:unit_id>')
+def get_unit_detail(unit_id):
+    import jwt
+
+    try:
+        fields = requested_fields(UNIT_DETAIL_FIELDS)
+    except FieldSelectionError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        unit = db.session.execute(unit_detail_select(unit_id, fields)).first()
+        if unit is None:
+            return jsonify({'error': 'Resource not found'}), 404
+
+        # Check if the current user is enrolled
+        is_enrolled = False
+        if 'is_enrolled' in fields:
+            auth_header = request.headers.get('Authorization')
+            if auth_header:
+                try:
+                    token = auth_header.split(" ")[1]
+                    payload = decode_token(token)
+                    current_user_id = int(payload['sub'])
+                    is_enrolled = db.session.scalar(enrolled_statement(current_user_id, unit_id)) is not None
+                except (jwt.ExpiredSignatureError, jwt.InvalidTokenError, IndexError):
+                    pass
+
+        assignments = db.session.execute(unit_assignments_statement(unit_id)).all() \
+            if 'assignments' in fields else ()
+        # Related units come from the precomputed similarity index
+        related_units = related_unit_rows(unit) if 'related_units' in fields else ()
+
+        return jsonify(unit_detail(unit, fields, is_enrolled, assignments, related_units))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/testimonials')
+def get_testimonials():
+    testimonials = [
+        {
+            'id': 1,
+            'name': 'John Doe',
+            'role': 'Student',
+            'content': 'The courses here have transformed my learning experience!',
+            'rating': 5
+        },
+        {
+            'id': 2,
+            'name': 'Jane Smith',
+            'role': 'Professional',
+            'content': 'Excellent platform for skill development.',
+            'rating': 4.5
+        }
+    ]
+    return jsonify(testimonials)
+
+
+@bp.route('/api/teacher/<int:teacher_id>', methods=['GET', 'OPTIONS'])
+def get_teacher_details(teacher_id):
+    # Handle preflight OPTIONS request
+    if request.method == 'OPTIONS':
+        response = make_response()
+        response.headers.add('Access-Control-Allow-Origin', '*')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        response.headers.add('Access-Control-Allow-Methods', 'GET,OPTIONS')
+        return response, 204
+
+    try:
+        fields = requested_fields(TEACHER_DETAIL_FIELDS)
+    except FieldSelectionError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        # Retrieve teacher data (ensure the user is a teacher)
+        columns = [
+            getattr(User, name) for name in ('username', 'email', 'bio', 'qualifications')
+            if name in fields
+        ]
+        teacher = User.query.options(load_only(User.id, User.role, *columns))\
+            .filter_by(id=teacher_id, role='teacher').first()
+        if not teacher:
+            return jsonify({'error': 'Teacher not found'}), 404
+
+        teacher_data = {
+            name: getattr(teacher, name) for name in ('id', 'username', 'email', 'bio', 'qualifications')
+            if name in fields
+        }
+
+        # Retrieve teacher's units ordered by creation date (most recent first)
+        if 'units' in fields:
+            units = Unit.query.options(*unit_load_options(UNIT_FIELDS))\
+                .filter_by(teacher_id=teacher_id)\
+                .order_by(Unit.created_at.desc())\
+                .all()
+            teacher_data['units'] = [unit.to_dict() for unit in units]
+
+        # Calculate overall rating across all units
+        if 'ratings' in fields:
+            avg_rating, total_count = db.session.query(func.avg(Rating.score), func.count(Rating.id))\
+                .join(Unit, Unit.id == Rating.unit_id)\
+                .filter(Unit.teacher_id == teacher_id)\
+                .one()
+            teacher_data['ratings'] = {
+                'average': avg_rating if total_count > 0 else 0,
+                'count': total_count
+            }
+
+        return jsonify(teacher_data)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
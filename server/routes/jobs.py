@@ -0,0 +1,30 @@
+from flask import Blueprint, jsonify, request
+
+from auth import token_required
+from jobs import STATUSES
+from models import Job
+
+bp = Blueprint('jobs', __name__)
+
+
+@bp.route('/api/jobs', methods=['GET'])
+@token_required
+def list_jobs(current_user):
+    status = request.args.get('status')
+    if status is not None and status not in STATUSES:
+        return jsonify({'error': f'status must be one of: {", ".join(STATUSES)}'}), 400
+
+    query = Job.query.filter_by(created_by=current_user.id)
+    if status:
+        query = query.filter_by(status=status)
+    jobs = query.order_by(Job.id.desc()).limit(request.args.get('limit', 50, type=int)).all()
+    return jsonify([job.to_dict() for job in jobs])
+
+
+@bp.route('/api/jobs/<int:job_id>', methods=['GET'])
+@token_required
+def get_job(current_user, job_id):
+    job = Job.query.filter_by(id=job_id, created_by=current_user.id).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict())
@@ -0,0 +1,76 @@
+from flask import Blueprint, Response, jsonify
+
+from admission import admission
+from auth import token_required
+from cache import caches
+from catalog_snapshot import catalog_snapshots
+from changes import changes
+from jobs import jobs
+from profiling import profiler
+from suggest import suggestions
+
+bp = Blueprint('ops', __name__)
+
+
+@bp.route('/api/admission/metrics')
+@token_required
+def admission_metrics(current_user):
+    return jsonify(admission.metrics())
+
+
+@bp.route('/api/cache/metrics')
+@token_required
+def cache_metrics(current_user):
+    return jsonify({name: cache.metrics() for name, cache in caches.items()})
+
+
+@bp.route('/api/catalog/snapshot/metrics')
+@token_required
+def catalog_snapshot_metrics(current_user):
+    return jsonify(catalog_snapshots.metrics())
+
+
+@bp.route('/api/changes/metrics')
+@token_required
+def changes_metrics(current_user):
+    return jsonify(changes.metrics())
+
+
+@bp.route('/api/suggest/metrics')
+@token_required
+def suggest_metrics(current_user):
+    return jsonify(suggestions.metrics())
+
+
+@bp.route('/api/jobs/metrics')
+@token_required
+def jobs_metrics(current_user):
+    return jsonify(jobs.counts())
+
+
+@bp.route('/api/profiles')
+def list_profiles():
+    if not profiler.authorized():
+        return jsonify({'error': 'Profiling token required'}), 403
+    return jsonify(profiler.store.list())
+
+
+@bp.route('/api/profiles/<profile_id>')
+def get_profile(profile_id):
+    if not profiler.authorized():
+        return jsonify({'error': 'Profiling token required'}), 403
+    record = profiler.store.metadata(profile_id)
+    if record is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return jsonify(dict(record, collapsed=profiler.store.collapsed(profile_id)))
+
+
+@bp.route('/api/profiles/<profile_id>/collapsed')
+def get_profile_stacks(profile_id):
+    """Collapsed stacks as plain text, for speedscope or flamegraph.pl."""
+    if not profiler.authorized():
+        return jsonify({'error': 'Profiling token required'}), 403
+    stacks = profiler.store.collapsed(profile_id)
+    if stacks is None:
+        return jsonify({'error': 'Profile not found'}), 404
+    return Response(stacks, mimetype='text/plain')
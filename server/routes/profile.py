@@ -0,0 +1,276 @@
+from flask import Blueprint, jsonify, request, make_response
+from flask_cors import cross_origin
+
+from auth import token_required
+from database import db
+from models import User, ProfileSettings
+
+bp = Blueprint('profile', __name__)
+
+
+@bp.route('/api/profile/<int:user_id>', methods=['GET', 'POST', 'PUT'])
+@token_required
+def manage_profile(current_user, user_id):
+    if current_user.id != user_id:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    if request.method == 'GET':
+        profile = ProfileSettings.query.filter_by(user_id=user_id).first()
+        if not profile:
+            return jsonify({'error': 'Profile not found'}), 404
+
+        user = User.query.get(user_id)
+        return jsonify({
+            'fullName': user.username,
+            'email': user.email,
+            'interests': user.bio,
+            'theme': profile.theme,
+            'notifications_enabled': profile.notifications_enabled,
+            'language': profile.language
+        })
+
+    data = request.get_json()
+    
+    if request.method == 'POST':
+        if ProfileSettings.query.filter_by(user_id=user_id).first():
+            return jsonify({'error': 'Profile already exists'}), 409
+
+        profile = ProfileSettings(
+            user_id=user_id,
+            theme=data.get('theme', 'light'),
+            notifications_enabled=data.get('notifications_enabled', True),
+            language=data.get('language', 'en')
+        )
+        
+        user = User.query.get(user_id)
+        if user:
+            user.username = data.get('fullName', user.username)
+            user.bio = data.get('interests', '')
+
+        db.session.add(profile)
+        db.session.commit()
+
+        return jsonify({
+            'message': 'Profile created successfully',
+            'profile': {
+                'fullName': user.username,
+                'email': user.email,
+                'interests': user.bio,
+                'theme': profile.theme,
+                'notifications_enabled': profile.notifications_enabled,
+                'language': profile.language
+            }
+        }), 201
+
+    elif request.method == 'PUT':
+        profile = ProfileSettings.query.filter_by(user_id=user_id).first()
+        if not profile:
+            return jsonify({'error': 'Profile not found'}), 404
+
+        profile.theme = data.get('theme', profile.theme)
+        profile.notifications_enabled = data.get('notifications_enabled', profile.notifications_enabled)
+        profile.language = data.get('language', profile.language)
+
+        user = User.query.get(user_id)
+        if user:
+            user.username = data.get('fullName', user.username)
+            user.bio = data.get('interests', user.bio)
+
+        db.session.commit()
+
+        return jsonify({
+            'message': 'Profile updated successfully',
+            'profile': {
+                'fullName': user.username,
+                'email': user.email,
+                'interests': user.bio,
+                'theme': profile.theme,
+                'notifications_enabled': profile.notifications_enabled,
+                'language': profile.language
+            }
+        })
+
+
+@bp.route('/api/users/<int:user_id>', methods=['GET'])
+@token_required
+def get_user_details(current_user, user_id):
+    if current_user.id != user_id:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    try:
+        user = User.query.get_or_404(user_id)
+        return jsonify({
+            'id': user.id,
+            'username': user.username,
+            'email': user.email,
+            'role': user.role
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/profile/<int:user_id>', methods=['GET', 'PUT', 'POST', 'OPTIONS'])
+@cross_origin()
+@token_required
+def user_profile(current_user, user_id):
+    # Allow preflight OPTIONS request
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    # Ensure the user is accessing their own profile
+    if current_user.id != user_id:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    # POST: Create profile if it doesn't exist
+    if request.method == 'POST':
+        if current_user.profile_settings:
+            return jsonify({'error': 'Profile already exists'}), 400
+        
+        data = request.get_json() or {}
+        
+        try:
+            profile_settings = ProfileSettings(
+                user_id=current_user.id,
+                fullName=data.get('fullName', current_user.username),
+                theme=data.get('theme', 'light'),
+                notifications_enabled=data.get('notifications_enabled', True),
+                language=data.get('language', 'en'),
+                interests=data.get('interests', '')
+            )
+            db.session.add(profile_settings)
+            
+            # Update user details if provided
+            current_user.username = data.get('fullName', current_user.username)
+            current_user.bio = data.get('interests', current_user.bio)
+            
+            db.session.commit()
+            
+            return jsonify({
+                'message': 'Profile created successfully',
+                'profile': {
+                    'fullName': current_user.username,
+                    'email': current_user.email,
+                    'interests': current_user.bio,
+                    'theme': profile_settings.theme,
+                    'notifications_enabled': profile_settings.notifications_enabled,
+                    'language': profile_settings.language
+                }
+            }), 201
+        
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 500
+
+    # GET: Return user profile data
+    if request.method == 'GET':
+        profile_settings = current_user.profile_settings
+        
+        if not profile_settings:
+            return jsonify({'error': 'Profile not found'}), 404
+
+        return jsonify({
+            'fullName': current_user.username,
+            'email': current_user.email,
+            'interests': current_user.bio or '',
+            'theme': profile_settings.theme,
+            'notifications_enabled': profile_settings.notifications_enabled,
+            'language': profile_settings.language
+        })
+
+    # PUT: Update user profile and profile settings
+    if request.method == 'PUT':
+        try:
+            data = request.get_json()
+            if not data:
+                return jsonify({'error': 'No data provided'}), 400
+
+            # Update basic user details
+            current_user.username = data.get('fullName', current_user.username)
+            current_user.bio = data.get('interests', current_user.bio)
+
+            # Retrieve or create profile settings
+            profile_settings = current_user.profile_settings
+            if not profile_settings:
+                profile_settings = ProfileSettings(
+                    user_id=current_user.id,
+                    theme=data.get('theme', 'light'),
+                    notifications_enabled=data.get('notifications_enabled', True),
+                    language=data.get('language', 'en')
+                )
+                db.session.add(profile_settings)
+            else:
+                # Update profile-related fields
+                profile_settings.theme = data.get('theme', profile_settings.theme)
+                profile_settings.notifications_enabled = data.get('notifications_enabled', profile_settings.notifications_enabled)
+                profile_settings.language = data.get('language', profile_settings.language)
+
+            db.session.commit()
+            
+            return jsonify({
+                'message': 'Profile updated successfully',
+                'profile': {
+                    'fullName': current_user.username,
+                    'email': current_user.email,
+                    'interests': current_user.bio,
+                    'theme': profile_settings.theme,
+                    'notifications_enabled': profile_settings.notifications_enabled,
+                    'language': profile_settings.language
+                }
+            })
+        
+        except Exception as e:
+            db.session.rollback()
+            return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/change-password/<int:user_id>', methods=['PATCH', 'OPTIONS'])
+@cross_origin()
+@token_required
+def update_password_endpoint(current_user, user_id):
+    # If it's an OPTIONS request, immediately return a successful CORS response
+    if request.method == 'OPTIONS':
+        response = make_response()
+        response.headers['Access-Control-Allow-Origin'] = '*'
+        response.headers['Access-Control-Allow-Methods'] = 'PATCH, OPTIONS'
+        response.headers['Access-Control-Allow-Headers'] = 'Content-Type, Authorization'
+        response.status_code = 200
+        return response
+
+    # Verify the user making the request matches the user ID in the URL
+    if current_user.id != user_id:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    data = request.get_json()
+    current_password = data.get('current_password')
+    new_password = data.get('new_password')
+    email = data.get('email')
+    user_type = data.get('user_type')  # Added to match frontend
+
+    # Validate input
+    if not all([current_password, new_password, email]):
+        return jsonify({'error': 'Current password, new password, and email are required'}), 400
+
+    # Verify email matches current user
+    if email != current_user.email:
+        return jsonify({'error': 'Email verification failed. Please ensure you are using the correct account.'}), 401
+
+    # Check current password
+    if not current_user.check_password(current_password):
+        return jsonify({'error': 'Current password is incorrect'}), 401
+
+    # Validate new password
+    if len(new_password) < 6:
+        return jsonify({'error': 'Password must be at least 6 characters long'}), 400
+
+    try:
+        # Update password
+        current_user.set_password(new_password)
+        db.session.commit()
+        return jsonify({
+            'message': 'Password updated successfully', 
+            'user_type': user_type
+        }), 200
+
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': 'An error occurred while updating the password'}), 500
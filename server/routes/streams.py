@@ -0,0 +1,60 @@
+from flask import Blueprint, Response, jsonify, request
+
+from auth import BLACKLIST, decode_token
+from events import events, format_sse, HEARTBEAT
+from models import User
+
+bp = Blueprint('streams', __name__)
+
+
+def stream_token():
+    """Bearer token from the Authorization header or, for EventSource clients, ?token=."""
+    auth_header = request.headers.get('Authorization')
+    if auth_header and len(auth_header.split(" ")) > 1:
+        return auth_header.split(" ")[1]
+    return request.args.get('token')
+
+
+@bp.route('/api/events')
+def stream_events():
+    """Event stream for the WSGI app.
+
+    Each open stream holds a worker thread for as long as the client stays
+    connected, so a gunicorn worker serves at most as many streams as it has
+    threads. Deployments with many clients serve /api/events from
+    ``uvicorn asgi:app``, where a stream is a coroutine.
+    """
+    import jwt
+
+    token = stream_token()
+    if not token:
+        return jsonify({'message': 'Token is required'}), 401
+    if token in BLACKLIST:
+        return jsonify({'message': 'Token has been revoked'}), 401
+
+    try:
+        payload = decode_token(token)
+    except jwt.ExpiredSignatureError:
+        return jsonify({'message': 'Token has expired'}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({'message': 'Invalid token'}), 401
+
+    user = User.query.get(int(payload['sub']))
+    if not user:
+        return jsonify({'message': 'User not found'}), 404
+
+    subscription = events.subscribe(user.id)
+
+    def generate():
+        try:
+            yield HEARTBEAT
+            while True:
+                event = subscription.get(timeout=events.heartbeat_seconds)
+                yield format_sse(event) if event else HEARTBEAT
+        finally:
+            events.unsubscribe(subscription)
+
+    return Response(generate(), mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
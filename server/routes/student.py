@@ -0,0 +1,628 @@
+import calendar
+import os
+from datetime import datetime
+
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy.orm import joinedload
+from werkzeug.utils import secure_filename
+
+from archive import archive
+from auth import BLACKLIST, decode_token, token_required
+from cache import dashboard_cache
+from database import db
+from events import events
+from fieldsets import FieldSelectionError, requested_fields, shape
+from idempotency import idempotent
+from jobs import jobs
+from models import User, Unit, Enrollment, Rating, Assignment, Submission, Performance, UNIT_FIELDS
+from progress_buffer import progress_buffer
+from queries import (
+    load_deferred, student_dashboard, student_dashboard_statements, stored_progress_statement,
+    submission_load_options, unit_load_options,
+)
+from request_memo import student_enrollments
+from timeseries import DAY, METRICS, RESOLUTIONS, WEEK, timeseries
+
+bp = Blueprint('student', __name__)
+
+STUDENT_SUBMISSION_FIELDS = (
+    'submission_id', 'assignment_id', 'assignment_title', 'unit_title', 'submission_text',
+    'document_url', 'submission_link', 'submitted_at', 'grade', 'feedback',
+)
+
+
+@bp.route('/api/student/<int:student_id>/units', methods=['GET', 'OPTIONS'])
+def get_student_units(student_id):
+    import jwt
+
+    if request.method == 'OPTIONS':
+        response = jsonify({})
+        response.headers.add('Access-Control-Allow-Methods', 'GET')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        return response, 204
+
+    # Apply token_required decorator logic manually for non-OPTIONS requests
+    token = None
+    auth_header = request.headers.get('Authorization')
+
+    if not auth_header:
+        return jsonify({'message': 'Token is required'}), 401
+
+    try:
+        token = auth_header.split(" ")[1]
+    except IndexError:
+        return jsonify({'message': 'Token is missing'}), 401
+
+    if token in BLACKLIST:
+        return jsonify({'message': 'Token has been revoked'}), 401
+
+    try:
+        payload = decode_token(token)
+        current_user = User.query.get(int(payload['sub']))
+        if not current_user:
+            return jsonify({'message': 'User not found'}), 404
+        
+        # Get enrolled units for the student
+        enrolled_units = Unit.query.options(*unit_load_options(UNIT_FIELDS))\
+            .join(Enrollment).filter(Enrollment.student_id == student_id).all()
+        units_data = [unit.to_dict() for unit in enrolled_units]
+        return jsonify(units_data)
+    except jwt.ExpiredSignatureError:
+        return jsonify({'message': 'Token has expired'}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({'message': 'Invalid token'}), 401
+
+
+@bp.route('/api/student/units/<int:unit_id>/assignments', methods=['GET', 'OPTIONS'])
+def get_student_assignments(unit_id):
+    import jwt
+
+    if request.method == 'OPTIONS':
+        response = jsonify({})
+        response.headers.add('Access-Control-Allow-Methods', 'GET')
+        response.headers.add('Access-Control-Allow-Headers', 'Content-Type,Authorization')
+        return response, 204
+
+    # Apply token_required decorator logic manually for non-OPTIONS requests
+    token = None
+    auth_header = request.headers.get('Authorization')
+
+    if not auth_header:
+        return jsonify({'message': 'Token is required'}), 401
+
+    try:
+        token = auth_header.split(" ")[1]
+    except IndexError:
+        return jsonify({'message': 'Token is missing'}), 401
+
+    if token in BLACKLIST:
+        return jsonify({'message': 'Token has been revoked'}), 401
+
+    try:
+        payload = decode_token(token)
+        current_user = User.query.get(int(payload['sub']))
+        if not current_user:
+            return jsonify({'message': 'User not found'}), 404
+    except jwt.ExpiredSignatureError:
+        return jsonify({'message': 'Token has expired'}), 401
+    except jwt.InvalidTokenError:
+        return jsonify({'message': 'Invalid token'}), 401
+
+    if current_user.role != 'student':
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    try:
+        # Check if the student is enrolled in the unit
+        enrollment = Enrollment.query.filter_by(student_id=current_user.id, unit_id=unit_id).first()
+        if not enrollment:
+            return jsonify({'error': 'You are not enrolled in this unit'}), 403
+
+        assignments = Assignment.query.filter_by(unit_id=unit_id).all()
+        assignments_data = [
+            {
+                'id': assignment.id,
+                'title': assignment.title,
+                'description': assignment.description,
+                'due_date': assignment.due_date.isoformat() if assignment.due_date else None,
+                'max_score': assignment.max_score,
+                'completed': enrollment.progress >= 100
+            }
+            for assignment in assignments
+        ]
+        return jsonify(assignments_data)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/enrollments', methods=['POST'])
+@token_required
+@idempotent
+def create_enrollment(current_user):
+    data = request.get_json()
+    
+    # Check if unit exists
+    unit = Unit.query.get(data['unit_id'])
+    if not unit:
+        return jsonify({'error': 'Unit not found'}), 404
+
+    # Check for existing enrollment
+    existing_enrollment = Enrollment.query.filter_by(
+        student_id=current_user.id,
+        unit_id=data['unit_id']
+    ).first()
+    
+    if existing_enrollment:
+        return jsonify({'error': 'Already enrolled in this unit'}), 409
+
+    enrollment = Enrollment(
+        student_id=current_user.id,
+        unit_id=data['unit_id'],
+        enrollment_date=datetime.utcnow()
+    )
+    db.session.add(enrollment)
+    db.session.commit()
+    
+    return jsonify({'message': 'Enrollment successful'}), 201
+
+
+@bp.route('/api/ratings', methods=['POST'])
+@token_required
+@idempotent
+def create_rating(current_user):
+    data = request.get_json()
+    
+    rating = Rating(
+        unit_id=data['unit_id'],
+        student_id=current_user.id,
+        score=data['score']
+    )
+    db.session.add(rating)
+    db.session.commit()
+    
+    return jsonify({'message': 'Rating submitted successfully'}), 201
+
+
+# Error handlers
+
+
+@bp.route('/api/units/progress')
+@token_required
+def get_units_with_progress(current_user):
+    try:
+        # Query enrollments with progress > 30%, including progress still buffered
+        buffered = progress_buffer.pending_for_student(current_user.id)
+        enrollments = student_enrollments(current_user.id)
+
+        # Get the corresponding units
+        units_data = []
+        for enrollment in enrollments:
+            progress = max(enrollment.progress or 0, buffered.get(enrollment.unit_id, 0))
+            if progress <= 30:
+                continue
+            unit = enrollment.unit
+            if unit:
+                unit_data = {
+                    'id': unit.id,
+                    'title': unit.title,
+                    'teacher': unit.teacher.username,
+                    'progress': progress
+                }
+                units_data.append(unit_data)
+
+        return jsonify(units_data)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/student/dashboard/<int:student_id>', methods=['GET', 'OPTIONS'])
+@token_required
+def get_student_dashboard(current_user, student_id):
+    # Allow preflight OPTIONS request
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    # Ensure that the logged-in user is accessing their own dashboard.
+    if current_user.id != student_id or current_user.role != 'student':
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    try:
+        cached = dashboard_cache.get(student_id)
+        if cached is not None:
+            return jsonify(cached), 200
+
+        generation = dashboard_cache.generation(student_id)
+        totals_statement, recent_statement = student_dashboard_statements(student_id)
+        totals = db.session.execute(totals_statement).one()
+        recent = db.session.execute(recent_statement).all()
+
+        # Count completed courses (where progress is 100), including progress still buffered
+        buffered = progress_buffer.pending_for_student(student_id)
+        stored_progress = dict(
+            db.session.execute(stored_progress_statement(student_id, buffered)).all()
+        ) if buffered else {}
+
+        dashboard = student_dashboard(totals, recent, buffered, stored_progress)
+        dashboard_cache.set(student_id, dashboard, generation)
+        return jsonify(dashboard), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/student/units/<int:student_id>/<int:unit_id>/progress', methods=['PUT'])
+@token_required
+def update_unit_progress(current_user, student_id, unit_id):
+    """Update student's progress in a unit."""
+    if current_user.id != student_id:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    data = request.get_json()
+    progress = data.get('progress')
+    
+    if progress is None or not isinstance(progress, int) or progress < 0 or progress > 100:
+        return jsonify({'error': 'Invalid progress value'}), 400
+
+    enrollment_exists = db.session.query(
+        Enrollment.query.filter_by(student_id=student_id, unit_id=unit_id).exists()
+    ).scalar()
+    if not enrollment_exists:
+        return jsonify({'error': 'Enrollment not found'}), 404
+
+    # Progress only moves forward; the buffer writes it out in batches
+    progress = progress_buffer.record(student_id, unit_id, progress)
+    dashboard_cache.invalidate(student_id)
+    
+    return jsonify({'message': 'Progress updated successfully', 'progress': progress}), 200
+
+
+@bp.route('/api/student-enrolled-units/<int:student_id>', methods=['GET'])
+@token_required
+def get_student_enrolled_units(current_user, student_id):
+    if current_user.id != student_id:
+        return jsonify({'message': 'Unauthorized access'}), 403
+
+    enrollments = student_enrollments(student_id)
+    load_deferred([enrollment.unit for enrollment in enrollments], Unit.description)
+    buffered = progress_buffer.pending_for_student(student_id)
+    units = []
+    for enrollment in enrollments:
+        unit = enrollment.unit.to_dict()
+        unit['progress'] = max(enrollment.progress or 0, buffered.get(enrollment.unit_id, 0))
+        units.append(unit)
+
+    return jsonify({'units': units})
+
+
+@bp.route('/api/student-enrolled-units/<int:student_id>/<int:unit_id>', methods=['DELETE'])
+@token_required
+def unenroll_student(current_user, student_id, unit_id):
+    if current_user.id != student_id:
+        return jsonify({'message': 'Unauthorized access'}), 403
+
+    enrollment = Enrollment.query.filter_by(student_id=student_id, unit_id=unit_id).first()
+    if not enrollment:
+        return jsonify({'message': 'Enrollment not found'}), 404
+
+    db.session.delete(enrollment)
+    db.session.commit()
+    return jsonify({'message': 'Successfully unenrolled from the unit'})
+
+
+@bp.route('/api/submissions', methods=['POST'])
+@token_required
+@idempotent
+def create_submission(current_user):
+    try:
+        # Ensure upload folder exists
+        UPLOAD_FOLDER = os.path.join(os.path.dirname(__file__), 'uploads', 'submissions')
+        os.makedirs(UPLOAD_FOLDER, exist_ok=True)
+
+        # Check if request contains form data
+        data = request.form.to_dict()
+
+        # Validate required fields
+        assignment_id = data.get('assignment_id')
+        if not assignment_id:
+            return jsonify({'error': 'Assignment ID is required'}), 400
+
+        # Verify assignment exists
+        assignment = Assignment.query.get(int(assignment_id))
+        if not assignment:
+            return jsonify({'error': 'Assignment not found'}), 404
+
+        # Check if student is enrolled in the unit
+        enrollment = Enrollment.query.filter_by(
+            student_id=current_user.id, 
+            unit_id=assignment.unit_id
+        ).first()
+        
+        if not enrollment:
+            return jsonify({'error': 'You are not enrolled in this unit'}), 403
+
+        # Prepare submission details
+        submission_text = data.get('submission_text', '')
+        submission_link = data.get('submission_link', '')
+        document_url = None
+
+        # Handle file upload if present
+        if 'document' in request.files:
+            file = request.files['document']
+            if file and file.filename:
+                # Generate unique filename
+                filename = secure_filename(f"{current_user.id}_{assignment_id}_{file.filename}")
+                file_path = os.path.join(UPLOAD_FOLDER, filename)
+                
+                # Save file
+                file.save(file_path)
+                document_url = f"/uploads/submissions/{filename}"
+
+        # Validate submission type
+        if not (submission_text or document_url or submission_link):
+            return jsonify({'error': 'Please provide a submission (text, file, or link)'}), 400
+
+        # Create new submission
+        new_submission = Submission(
+            assignment_id=int(assignment_id),
+            student_id=current_user.id,
+            submission_text=submission_text,
+            document_url=document_url,
+            submission_link=submission_link,  # Add this to your Submission model
+            submitted_at=datetime.utcnow(),
+            grade=None,
+            feedback=None
+        )
+
+        # Add to database
+        db.session.add(new_submission)
+        db.session.flush()
+        jobs.enqueue('similarity.index_submission', {'submission_id': new_submission.id})
+        db.session.commit()
+
+        events.publish([assignment.unit.teacher_id], 'submission.created', {
+            'submission_id': new_submission.id,
+            'assignment_id': assignment.id,
+            'unit_id': assignment.unit_id,
+            'student_id': current_user.id
+        })
+
+        return jsonify({
+            'message': 'Submission created successfully',
+            'submission_id': new_submission.id,
+            'assignment_id': assignment_id
+        }), 201
+
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Submission error: {str(e)}")
+        return jsonify({
+            'error': 'An unexpected error occurred',
+            'details': str(e)
+        }), 500
+
+
+@bp.route('/api/student/performance/<int:student_id>', methods=['GET'])
+@token_required
+def get_student_performance(current_user, student_id):
+    # Ensure the logged-in user is viewing their own performance and is a student
+    if current_user.id != student_id or current_user.role != 'student':
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    try:
+        # Fetch all enrollments for the student
+        enrollments = student_enrollments(student_id)
+        performances = {}
+        for performance in Performance.query.filter_by(user_id=student_id).order_by(Performance.id):
+            performances.setdefault(performance.unit_id, performance)
+        # Weekly means of the student's progress in each unit
+        weekly_progress = dict(timeseries.series(student_id, METRICS['progress'], WEEK).by_unit())
+
+        # Prepare a dictionary to store performance data
+        performance_data = {
+            'cat_results': [],
+            'overall_performance': [],
+            'performance_trend': []
+        }
+
+        # Loop through each enrollment to collect data per unit
+        for enrollment in enrollments:
+            unit = enrollment.unit
+
+            # Collect CAT (Continuous Assessment Test) results (exam results)
+            cat_result = {
+                'unit_id': unit.id,
+                'unit_title': unit.title,
+                'cat_score': enrollment.cat_score,
+                'max_cat_score': 100  # Assuming the maximum CAT score is 100
+            }
+            performance_data['cat_results'].append(cat_result)
+
+            # Collect overall performance for the unit
+            weekly = weekly_progress.get(unit.id)
+            performance = performances.get(unit.id)
+            if performance:
+                overall_result = {
+                    'unit_id': unit.id,
+                    'unit_title': unit.title,
+                    'score': performance.score,
+                    'trend_data': {'weekly_progress': weekly.values.tolist() if weekly else []}
+                }
+                performance_data['overall_performance'].append(overall_result)
+            if weekly:
+                performance_data['performance_trend'].extend({
+                    'unit_id': unit.id,
+                    'timestamp': datetime.utcfromtimestamp(ts).isoformat(),
+                    'progress': value
+                } for ts, value in zip(weekly.timestamps.tolist(), weekly.values.tolist()))
+
+        # All units' weeks in time order
+        performance_data['performance_trend'].sort(key=lambda point: point['timestamp'])
+
+        return jsonify(performance_data), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/student/performance/<int:student_id>/series', methods=['GET'])
+@token_required
+def get_student_metric_series(current_user, student_id):
+    """One metric of a student over time, per unit, as parallel timestamp and value arrays.
+
+    Query parameters: ``metric`` (default progress), ``resolution`` (raw, day
+    or week; default day), ``unit_id``, and an inclusive ``start``/``end``
+    range (YYYY-MM-DD). Timestamps are Unix seconds; for day and week they
+    are bucket starts and the values are bucket means.
+    """
+    if current_user.id != student_id or current_user.role != 'student':
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    metric = request.args.get('metric', 'progress')
+    resolution = request.args.get('resolution', 'day')
+    if metric not in METRICS:
+        return jsonify({'error': f"metric must be one of {', '.join(METRICS)}"}), 400
+    if resolution not in RESOLUTIONS:
+        return jsonify({'error': f"resolution must be one of {', '.join(RESOLUTIONS)}"}), 400
+    try:
+        unit_id = int(request.args['unit_id']) if request.args.get('unit_id') else None
+    except ValueError:
+        return jsonify({'error': 'unit_id must be an integer'}), 400
+    bounds = {}
+    for name in ('start', 'end'):
+        if request.args.get(name):
+            try:
+                day = datetime.strptime(request.args[name], '%Y-%m-%d')
+            except ValueError:
+                return jsonify({'error': f'Invalid {name}. Use YYYY-MM-DD'}), 400
+            bounds[name] = calendar.timegm(day.timetuple()) + (DAY if name == 'end' else 0)
+
+    try:
+        series = timeseries.series(student_id, METRICS[metric], RESOLUTIONS[resolution], unit_id=unit_id, **bounds)
+        units = []
+        for series_unit_id, unit_series in series.by_unit():
+            unit_data = {
+                'unit_id': series_unit_id,
+                'timestamps': unit_series.timestamps.tolist(),
+                'values': unit_series.values.tolist()
+            }
+            if RESOLUTIONS[resolution]:
+                unit_data.update(
+                    counts=unit_series.counts.tolist(),
+                    minimums=unit_series.minimums.tolist(),
+                    maximums=unit_series.maximums.tolist()
+                )
+            units.append(unit_data)
+        return jsonify({'metric': metric, 'resolution': resolution, 'units': units}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/student/submissions', methods=['GET'])
+@token_required
+def get_student_submissions(current_user):
+    # Only students can view their submissions
+    if current_user.role != 'student':
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    try:
+        fields = requested_fields(STUDENT_SUBMISSION_FIELDS, key='submission_id')
+
+        # Query for all submissions made by the current student, with only the requested columns
+        options = submission_load_options(fields)
+        if fields & {'assignment_id', 'assignment_title', 'unit_title'}:
+            assignment_loader = joinedload(Submission.assignment)
+            options.append(assignment_loader.load_only(Assignment.id, Assignment.title, Assignment.unit_id))
+            if 'unit_title' in fields:
+                options.append(assignment_loader.joinedload(Assignment.unit).load_only(Unit.id, Unit.title))
+        submissions = Submission.query.options(*options).filter_by(student_id=current_user.id).all()
+
+        results = []
+        for sub in submissions:
+            # Access assignment details via backref and then the corresponding unit via assignment's backref
+            results.append(shape(fields, {
+                'submission_id': lambda: sub.id,
+                'assignment_id': lambda: sub.assignment.id if sub.assignment else None,
+                'assignment_title': lambda: sub.assignment.title if sub.assignment else 'N/A',
+                'unit_title': lambda: sub.assignment.unit.title if sub.assignment and sub.assignment.unit else 'N/A',
+                'submission_text': lambda: sub.submission_text,
+                'document_url': lambda: sub.document_url,
+                'submission_link': lambda: sub.submission_link,
+                'submitted_at': lambda: sub.submitted_at.isoformat(),
+                'grade': lambda: sub.grade if sub.grade is not None else 'Not graded',
+                'feedback': lambda: sub.feedback or 'No feedback yet'
+            }))
+
+        # Submissions to long finished units live in the archive databases, see archive.py
+        if request.args.get('include_archived', '').lower() == 'true':
+            archived = archive.archived_submissions(current_user.id, with_text='submission_text' in fields)
+            for sub in archived:
+                results.append(shape(fields, {
+                    'submission_id': lambda: sub['id'],
+                    'assignment_id': lambda: sub['assignment_id'],
+                    'assignment_title': lambda: sub['assignment_title'] or 'N/A',
+                    'unit_title': lambda: sub['unit_title'] or 'N/A',
+                    'submission_text': lambda: sub['submission_text'],
+                    'document_url': lambda: sub['document_url'],
+                    'submission_link': lambda: sub['submission_link'],
+                    'submitted_at': lambda: sub['submitted_at'].isoformat(),
+                    'grade': lambda: sub['grade'] if sub['grade'] is not None else 'Not graded',
+                    'feedback': lambda: sub['feedback'] or 'No feedback yet'
+                }))
+        return jsonify(results), 200
+    except FieldSelectionError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/student/results/<int:student_id>', methods=['GET'])
+@token_required
+def get_student_results(current_user, student_id):
+    # Ensure that the logged-in user is accessing their own results and is a student.
+    if current_user.id != student_id or current_user.role != 'student':
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    try:
+        enrollments = student_enrollments(student_id)
+        load_deferred(enrollments, Enrollment.feedback)
+        rows = [(enrollment, enrollment.unit.title, False) for enrollment in enrollments]
+        # Enrollments in long finished units live in the archive databases, see archive.py
+        include_archived = request.args.get('include_archived', '').lower() == 'true'
+        if include_archived:
+            rows += [(row, row.unit_title, True) for row in archive.archived_enrollments(student_id)]
+        results = []
+        trend_data = []
+
+        for enrollment, unit_title, archived in rows:
+            # Weighted by the unit's grade weights and stored when scores are written
+            overall_score = enrollment.overall_score
+
+            record = {
+                'unit_id': enrollment.unit_id,
+                'unit_title': unit_title,
+                'grade': enrollment.grade,
+                'feedback': enrollment.feedback,
+                'progress': enrollment.progress,
+                'assignment_score': enrollment.assignment_score,
+                'cat_score': enrollment.cat_score,
+                'exam_score': enrollment.exam_score,
+                'overall_score': overall_score,
+                'enrollment_date': enrollment.enrollment_date.isoformat()
+            }
+            if include_archived:
+                record['archived'] = archived
+            results.append(record)
+            trend_data.append({
+                'timestamp': enrollment.enrollment_date.isoformat(),
+                'overall_score': overall_score
+            })
+
+        # Sort the trend summary by enrollment date (timestamp)
+        trend_data = sorted(trend_data, key=lambda x: x['timestamp'])
+
+        return jsonify({
+            'results': results,
+            'trend_summary': trend_data
+        }), 200
+
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,526 @@
+import re
+from datetime import datetime
+
+from flask import Blueprint, current_app, jsonify, request
+from sqlalchemy import func
+
+from auth import requires_teacher_role, token_required
+from analytics import unit_analytics
+from cache import analytics_cache
+from changes import change, changes
+from database import db
+from events import events
+from fieldsets import FieldSelectionError, requested_fields, shape
+from gradebook import gradebook
+from grading import COMPONENTS, recompute_grades, unit_weights
+from jobs import jobs
+from models import User, Unit, Enrollment, Assignment, Submission, UNIT_FIELDS
+from queries import unit_load_options, submission_load_options
+from similarity import DEFAULT_THRESHOLD, similar_clusters
+
+bp = Blueprint('teacher', __name__)
+
+UNIT_SUBMISSION_FIELDS = (
+    'id', 'student_id', 'student_name', 'assignment_id', 'assignment_title', 'submission_text',
+    'document_url', 'submission_link', 'submitted_at', 'grade', 'feedback',
+)
+
+
+@token_required
+@requires_teacher_role
+def get_teacher_dashboard(current_user, teacher_id):
+    if current_user.id != teacher_id:
+        return jsonify({'message': 'Unauthorized access'}), 403
+    
+    total_units = Unit.query.filter_by(teacher_id=teacher_id).count()
+    total_students = Enrollment.query\
+        .join(Unit, Enrollment.unit_id == Unit.id)\
+        .filter(Unit.teacher_id == teacher_id)\
+        .distinct(Enrollment.student_id)\
+        .count()
+
+    recent_activities = db.session.query(
+        func.date(Enrollment.enrollment_date).label('date'),
+        func.count().label('count')
+    ).join(Unit).filter(Unit.teacher_id == teacher_id)\
+     .group_by(func.date(Enrollment.enrollment_date))\
+     .order_by(func.date(Enrollment.enrollment_date).desc())\
+     .limit(5).all()
+
+    return jsonify({
+        'totalUnits': total_units,
+        'totalStudents': total_students,
+        'recentActivities': [
+            {'date': date, 'description': f'{count} new enrollments'}
+            for date, count in recent_activities
+        ]
+    })
+
+
+# Authentication routes
+
+
+@bp.route('/api/assignments', methods=['POST'])
+@token_required
+@requires_teacher_role
+def create_assignment(current_user):
+    data = request.get_json()
+    
+    # Validate required fields
+    required_fields = ['title', 'description', 'due_date', 'max_score', 'unit_id']
+    if not all(field in data for field in required_fields):
+        return jsonify({'error': 'Missing required fields'}), 400
+
+    # Verify the unit belongs to the teacher
+    unit = Unit.query.get(data['unit_id'])
+    if not unit or unit.teacher_id != current_user.id:
+        return jsonify({'error': 'Unit not found or unauthorized'}), 403
+    
+    # Create new assignment
+    try:
+        # Validate and parse the due date
+        try:
+            due_date_str = data['due_date']
+            # Handle the case where the date might come with 'T' separator
+            due_date_str = due_date_str.replace('T', ' ')
+            # Remove timezone info if present
+            if '+' in due_date_str:
+                due_date_str = due_date_str.split('+')[0]
+            if 'Z' in due_date_str:
+                due_date_str = due_date_str.replace('Z', '')
+            # Parse the date
+            due_date = datetime.strptime(due_date_str, '%Y-%m-%d %H:%M')
+        except ValueError as e:
+            return jsonify({'error': f'Invalid date format: {str(e)}'}), 400
+
+        # Validate max_score
+        try:
+            max_score = float(data['max_score'])
+            if max_score < 0:
+                return jsonify({'error': 'Max score cannot be negative'}), 400
+        except ValueError:
+            return jsonify({'error': 'Invalid max score format'}), 400
+
+        new_assignment = Assignment(
+            title=data['title'],
+            description=data['description'],
+            due_date=due_date,
+            max_score=max_score,
+            unit_id=data['unit_id']
+        )
+        db.session.add(new_assignment)
+        db.session.commit()
+
+        student_ids = [
+            student_id for student_id, in
+            db.session.query(Enrollment.student_id).filter_by(unit_id=unit.id).all()
+        ]
+        events.publish(student_ids, 'assignment.created', {
+            'assignment_id': new_assignment.id,
+            'unit_id': unit.id,
+            'title': new_assignment.title,
+            'due_date': due_date.isoformat()
+        })
+        return jsonify({'message': 'Assignment created successfully'}), 201
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f'Error creating assignment: {str(e)}')
+        return jsonify({'error': f'Failed to create assignment: {str(e)}'}), 500
+
+
+@bp.route('/api/teachers/<int:teacher_id>', methods=['GET', 'OPTIONS'])
+@token_required
+def get_teacher(current_user, teacher_id):
+    if request.method == 'OPTIONS':
+        return '', 204
+
+    if current_user.id != teacher_id or current_user.role != 'teacher':
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    teacher = User.query.filter_by(id=teacher_id, role='teacher').first()
+    if not teacher:
+        return jsonify({'error': 'Teacher not found'}), 404
+
+    return jsonify({'email': teacher.email})
+
+
+@bp.route('/api/teacher/enrolled-students/<int:teacher_id>', methods=['GET'])
+@token_required
+@requires_teacher_role
+def get_enrolled_students(current_user, teacher_id):
+    if current_user.id != teacher_id:
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    try:
+        # Query enrollments for all units taught by this teacher
+        enrollments = db.session.query(
+            Enrollment, Unit, User
+        ).join(
+            Unit, Enrollment.unit_id == Unit.id
+        ).join(
+            User, Enrollment.student_id == User.id
+        ).filter(
+            Unit.teacher_id == teacher_id
+        ).all()
+
+        # Format the response
+        students_data = [{
+            'student_name': student.username,
+            'unit_title': unit.title,
+            'username': student.email,
+            'enrollment_id': enrollment.id
+        } for enrollment, unit, student in enrollments]
+
+        return jsonify({'enrolled_students': students_data})
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/units/create', methods=['POST'])
+@token_required
+def create_unit(current_user):
+    """Create a new unit by a teacher."""
+    # Ensure only teachers can create units
+    if current_user.role != 'teacher':
+        return jsonify({'error': 'Only teachers can create units'}), 403
+
+    data = request.get_json()
+    if not data:
+        return jsonify({'error': 'No data provided'}), 422
+
+    validation_errors = {}
+    if not data.get('title'):
+        validation_errors['title'] = 'Title is required'
+    if not data.get('description'):
+        validation_errors['description'] = 'Description is required'
+    if not data.get('category'):
+        validation_errors['category'] = 'Category is required'
+    if not data.get('video_url'):
+        validation_errors['video_url'] = 'Video URL is required'
+    else:
+        youtube_regex = r'^(https?:\/\/)?(www\.)?(youtube\.com|youtu\.?be)\/.+'
+        if not re.match(youtube_regex, data['video_url']):
+            validation_errors['video_url'] = 'Invalid YouTube URL'
+        
+    if validation_errors:
+        return jsonify({'error': 'Validation failed', 'details': validation_errors}), 422
+
+    # Validate dates if provided
+    start_date = None
+    end_date = None
+    try:
+        if data.get('start_date'):
+            start_date = datetime.strptime(data['start_date'], '%Y-%m-%d')
+        if data.get('end_date'):
+            end_date = datetime.strptime(data['end_date'], '%Y-%m-%d')
+            if start_date and end_date < start_date:
+                return jsonify({'error': 'End date must be after start date'}), 422
+    except ValueError:
+        return jsonify({'error': 'Invalid date format. Use YYYY-MM-DD'}), 422
+
+    new_unit = Unit(
+        title=data['title'],
+        description=data['description'],
+        category=data.get('category'),
+        video_url=data.get('video_url'),
+        teacher_id=current_user.id,
+        start_date=start_date,
+        end_date=end_date
+    )
+    
+    db.session.add(new_unit)
+    db.session.flush()
+    # Scoring the unit against similar ones runs in the job worker, or in this process with JOBS_RUN_INLINE
+    jobs.enqueue('related.index_unit', {'unit_id': new_unit.id}, created_by=current_user.id)
+    db.session.commit()
+
+    return jsonify({
+        'message': 'Unit created successfully',
+        'unit': new_unit.to_dict()
+    }), 201
+
+
+@bp.route('/api/teacher/units/<int:unit_id>/students')
+@token_required
+@requires_teacher_role
+def get_unit_students(current_user, unit_id):
+    unit = Unit.query.filter_by(id=unit_id, teacher_id=current_user.id).first()
+    if not unit:
+        return jsonify({'error': 'Unit not found'}), 404
+    
+    students = db.session.query(
+        User.id.label('student_id'),
+        User.username.label('full_name'),
+        Unit.title.label('unit_title'),
+        Enrollment.assignment_score,
+        Enrollment.cat_score,
+        Enrollment.exam_score
+    ).join(Enrollment, User.id == Enrollment.student_id
+    ).join(Unit, Enrollment.unit_id == Unit.id
+    ).filter(Enrollment.unit_id == unit_id
+    ).all()
+    
+    return jsonify([row._asdict() for row in students])
+
+
+@bp.route('/api/teacher/students/<int:student_id>/grades', methods=['PUT'])
+@token_required
+@requires_teacher_role
+def update_student_grades(current_user, student_id):
+    data = request.get_json()
+    unit_id = data.get('unit_id')
+    
+    enrollment = Enrollment.query.filter_by(
+        student_id=student_id,
+        unit_id=unit_id
+    ).first()
+    
+    if not enrollment or enrollment.unit.teacher_id != current_user.id:
+        return jsonify({'error': 'Enrollment not found'}), 404
+    
+    enrollment.assignment_score = data.get('assignment_score', enrollment.assignment_score)
+    enrollment.cat_score = data.get('cat_score', enrollment.cat_score)
+    enrollment.exam_score = data.get('exam_score', enrollment.exam_score)
+    recompute_grades(enrollment.unit, student_id)
+    db.session.commit()
+
+    events.publish([student_id], 'grades.updated', {
+        'unit_id': enrollment.unit_id,
+        'assignment_score': enrollment.assignment_score,
+        'cat_score': enrollment.cat_score,
+        'exam_score': enrollment.exam_score,
+        'overall_score': enrollment.overall_score,
+        'grade': enrollment.grade
+    })
+    
+    return jsonify({'message': 'Grades updated successfully'})
+
+
+@bp.route('/api/teacher/units/<int:unit_id>/grade-weights', methods=['GET', 'PUT'])
+@token_required
+@requires_teacher_role
+def unit_grade_weights(current_user, unit_id):
+    unit = Unit.query.get(unit_id)
+    if not unit or unit.teacher_id != current_user.id:
+        return jsonify({'error': 'Unit not found or unauthorized'}), 404
+
+    if request.method == 'GET':
+        return jsonify(unit_weights(unit))
+
+    data = request.get_json() or {}
+    weights = unit_weights(unit)
+    try:
+        for component in COMPONENTS:
+            if component in data:
+                weights[component] = float(data[component])
+    except (TypeError, ValueError):
+        return jsonify({'error': 'Weights must be numbers'}), 400
+    if any(weight < 0 for weight in weights.values()) or not sum(weights.values()):
+        return jsonify({'error': 'Weights must be non-negative and not all zero'}), 400
+
+    try:
+        for component, weight in weights.items():
+            setattr(unit, f'{component}_weight', weight)
+        updated = recompute_grades(unit)
+        db.session.commit()
+        return jsonify({'weights': weights, 'recomputed_enrollments': updated})
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/teacher/units/<int:unit_id>/recompute-grades', methods=['POST'])
+@token_required
+@requires_teacher_role
+def queue_grade_recompute(current_user, unit_id):
+    unit = Unit.query.get(unit_id)
+    if not unit or unit.teacher_id != current_user.id:
+        return jsonify({'error': 'Unit not found or unauthorized'}), 404
+
+    job = jobs.enqueue('grades.recompute_unit', {'unit_id': unit_id}, created_by=current_user.id)
+    db.session.commit()
+    return jsonify({'job_id': job.id, 'status': job.status}), 202
+
+
+@bp.route('/api/teacher/units/<int:unit_id>/analytics', methods=['GET'])
+@token_required
+@requires_teacher_role
+def get_unit_analytics(current_user, unit_id):
+    unit = Unit.query.get(unit_id)
+    if not unit or unit.teacher_id != current_user.id:
+        return jsonify({'error': 'Unit not found or unauthorized'}), 404
+
+    try:
+        analytics = analytics_cache.get(unit_id)
+        if analytics is None:
+            generation = analytics_cache.generation(unit_id)
+            analytics = unit_analytics(unit_id, current_app.config['ANALYTICS_AT_RISK_BELOW'])
+            analytics_cache.set(unit_id, analytics, generation)
+        return jsonify(analytics)
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/teacher/units/<int:unit_id>/gradebook', methods=['GET'])
+@token_required
+@requires_teacher_role
+def get_unit_gradebook(current_user, unit_id):
+    unit = Unit.query.get(unit_id)
+    if not unit or unit.teacher_id != current_user.id:
+        return jsonify({'error': 'Unit not found or unauthorized'}), 404
+
+    try:
+        return jsonify(gradebook(
+            unit_id,
+            page=request.args.get('page', 1, type=int),
+            per_page=request.args.get('per_page', 100, type=int),
+            assignment_page=request.args.get('assignment_page', 1, type=int),
+            assignments_per_page=request.args.get('assignments_per_page', 50, type=int)
+        ))
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/teacher/assignments/<int:assignment_id>/similar-submissions', methods=['GET'])
+@token_required
+@requires_teacher_role
+def get_similar_submissions(current_user, assignment_id):
+    assignment = Assignment.query.get(assignment_id)
+    if not assignment or assignment.unit.teacher_id != current_user.id:
+        return jsonify({'error': 'Assignment not found or unauthorized'}), 404
+
+    threshold = request.args.get('threshold', DEFAULT_THRESHOLD, type=float)
+    if not 0 < threshold <= 1:
+        return jsonify({'error': 'threshold must be between 0 and 1'}), 400
+
+    try:
+        return jsonify({
+            'assignment_id': assignment_id,
+            'threshold': threshold,
+            'clusters': similar_clusters(assignment_id, threshold)
+        })
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/teacher/units', methods=['GET'])
+@token_required
+@requires_teacher_role
+def get_teacher_units(current_user):
+    try:
+        fields = requested_fields(UNIT_FIELDS)
+        units = Unit.query.options(*unit_load_options(fields)).filter_by(teacher_id=current_user.id).all()
+        return jsonify([unit.to_dict(fields) for unit in units])
+    except FieldSelectionError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@bp.route('/api/teacher/<int:teacher_id>/units', methods=['GET'])
+@token_required
+def get_specific_teacher_units(current_user, teacher_id):
+    if current_user.id != teacher_id or current_user.role != 'teacher':
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    try:
+        fields = requested_fields(UNIT_FIELDS)
+    except FieldSelectionError as e:
+        return jsonify({'error': str(e)}), 400
+
+    units = Unit.query.options(*unit_load_options(fields)).filter_by(teacher_id=teacher_id).all()
+    return jsonify([unit.to_dict(fields) for unit in units])
+
+
+@bp.route('/api/teacher/units/<int:unit_id>/submissions', methods=['GET'])
+@token_required
+def get_unit_submissions(current_user, unit_id):
+    # Verify the teacher owns this unit
+    unit = Unit.query.get_or_404(unit_id)
+    if current_user.id != unit.teacher_id or current_user.role != 'teacher':
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    try:
+        fields = requested_fields(UNIT_SUBMISSION_FIELDS)
+    except FieldSelectionError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Get all submissions for this unit's assignments, with only the requested columns
+    submissions = Submission.query\
+        .join(Assignment, Assignment.id == Submission.assignment_id)\
+        .filter(Assignment.unit_id == unit_id)\
+        .options(*submission_load_options(fields, Submission.student_id))\
+        .order_by(Submission.id)\
+        .all()
+
+    assignment_titles = dict(
+        db.session.query(Assignment.id, Assignment.title).filter_by(unit_id=unit_id).all()
+    ) if 'assignment_title' in fields else {}
+    student_names = dict(
+        db.session.query(User.id, User.username)
+        .filter(User.id.in_({submission.student_id for submission in submissions}))
+        .all()
+    ) if 'student_name' in fields and submissions else {}
+
+    # Format submissions with student and assignment details
+    formatted_submissions = [shape(fields, {
+        'id': lambda: submission.id,
+        'student_id': lambda: submission.student_id,
+        'student_name': lambda: student_names.get(submission.student_id),
+        'assignment_id': lambda: submission.assignment_id,
+        'assignment_title': lambda: assignment_titles.get(submission.assignment_id),
+        'submission_text': lambda: submission.submission_text,
+        'document_url': lambda: submission.document_url,
+        'submission_link': lambda: submission.submission_link,
+        'submitted_at': lambda: submission.submitted_at.isoformat(),
+        'grade': lambda: submission.grade,
+        'feedback': lambda: submission.feedback
+    }) for submission in submissions]
+
+    return jsonify(formatted_submissions)
+
+
+@bp.route('/api/submissions/<int:submission_id>/grade', methods=['POST'])
+@token_required
+def grade_submission(current_user, submission_id):
+    # Get the submission
+    submission = Submission.query.get_or_404(submission_id)
+    
+    # Get the assignment and unit to verify teacher's authority
+    assignment = Assignment.query.get(submission.assignment_id)
+    unit = Unit.query.get(assignment.unit_id)
+    
+    # Verify the current user is the teacher of this unit
+    if current_user.id != unit.teacher_id or current_user.role != 'teacher':
+        return jsonify({'error': 'Unauthorized access'}), 403
+
+    # Get grade and feedback from request
+    data = request.get_json()
+    grade = data.get('grade')
+    feedback = data.get('feedback')
+
+    if grade is None:
+        return jsonify({'error': 'Grade is required'}), 400
+
+    submission.grade = grade
+    submission.feedback = feedback
+    # Submission grades do not enter the overall score (assignment_score is
+    # entered separately), so nothing is recomputed; the event only drops the
+    # student's cached dashboard in every worker
+    changes.record(change('enrollment', unit_id=unit.id, user_id=submission.student_id))
+    db.session.commit()
+
+    events.publish([submission.student_id], 'submission.graded', {
+        'submission_id': submission.id,
+        'assignment_id': assignment.id,
+        'unit_id': unit.id,
+        'grade': grade,
+        'feedback': feedback
+    })
+
+    return jsonify({
+        'message': 'Submission graded successfully',
+        'submission_id': submission.id,
+        'grade': grade,
+        'feedback': feedback
+    })
@@ -1,14 +1,19 @@
 from faker import Faker
-from app import app
+from app import create_app
 from database import db
 from models import User, Unit, Enrollment, Rating, Performance, ProfileSettings, Assignment
+from timeseries import METRICS, timeseries
 from datetime import datetime, timedelta
+import calendar
 import random
 
 fake = Faker()
 
 def seed_data():
+    app = create_app()
     with app.app_context():
+        db.create_all()
+
         # Create sample users (teachers)
         teachers = []
         for _ in range(3):
@@ -104,14 +109,23 @@ def seed_data():
                     date_recorded=fake.date_time_between(
                         start_date=enrollment.enrollment_date,
                         end_date=datetime.utcnow()
-                    ),
-                    trend_data={'weekly_progress': [random.randint(60, 100) for _ in range(4)]}
+                    )
                 )
                 performances.append(performance)
 
         db.session.add_all(performances)
         db.session.commit()
 
+        # Four weeks of progress up to each performance record, see timeseries.py
+        timeseries.append(
+            (performance.user_id, performance.unit_id, METRICS['progress'],
+             calendar.timegm((performance.date_recorded - timedelta(weeks=3 - week)).utctimetuple()),
+             random.randint(60, 100))
+            for performance in performances
+            for week in range(4)
+        )
+        db.session.commit()
+
         # Create profile settings
         profile_settings = []
         themes = ['light', 'dark', 'auto']
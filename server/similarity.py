@@ -0,0 +1,224 @@
+"""Near-duplicate detection for submission texts.
+
+Texts are cut into overlapping word shingles and summarised by a MinHash
+signature of NUM_PERM values; the share of positions at which two signatures
+agree estimates the Jaccard similarity of their shingle sets. Each signature
+is split into BANDS bands of ROWS values and every band is hashed to a bucket,
+stored per assignment in the submission_bucket table. Submissions that share
+any bucket are candidates, so candidates come from one indexed self-join
+instead of comparing every pair, and only they are checked against their
+signatures.
+
+index_submission() runs when a submission is created;
+rebuild_similarity_index() (``flask rebuild-similarity``) indexes everything
+again. numpy is imported on first use.
+"""
+import hashlib
+import re
+import zlib
+
+from sqlalchemy import and_, select
+from sqlalchemy.orm import aliased
+
+from database import db
+from models import User, Submission, SubmissionContent, SubmissionSignature, SubmissionBucket
+from text_codec import decode_text
+
+SHINGLE_SIZE = 3
+# Texts shorter than this many shingles ("see attached") are not indexed: they
+# would all collide with each other without saying anything about copying
+MIN_SHINGLES = 5
+NUM_PERM = 128
+BANDS = 32
+ROWS = NUM_PERM // BANDS
+# 32 bands of 4 make pairs from about 0.42 similarity on likely candidates,
+# leaving a margin below the default threshold
+DEFAULT_THRESHOLD = 0.5
+
+# Largest prime below 2**32, so a * x + b never overflows uint64
+PRIME = 4294967291
+# Stored signatures depend on the coefficients: never change the seed
+SEED = 20240601
+REBUILD_BATCH = 1000
+
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+
+_coefficients = None
+
+
+def _permutations():
+    import numpy as np
+
+    global _coefficients
+    if _coefficients is None:
+        # RandomState's stream is frozen across numpy releases
+        rng = np.random.RandomState(SEED)
+        _coefficients = (
+            rng.randint(1, PRIME, size=NUM_PERM, dtype=np.uint64),
+            rng.randint(0, PRIME, size=NUM_PERM, dtype=np.uint64),
+        )
+    return _coefficients
+
+
+def shingles(text):
+    tokens = TOKEN_RE.findall((text or '').lower())
+    return {' '.join(tokens[i:i + SHINGLE_SIZE]) for i in range(len(tokens) - SHINGLE_SIZE + 1)}
+
+
+def signature(text):
+    """MinHash signature of the text as a uint32 array, or None if it is too short."""
+    import numpy as np
+
+    terms = shingles(text)
+    if len(terms) < MIN_SHINGLES:
+        return None
+    hashes = np.fromiter((zlib.crc32(term.encode('utf-8')) for term in terms), dtype=np.uint64, count=len(terms))
+    a, b = _permutations()
+    return ((np.outer(hashes, a) + b) % PRIME).min(axis=0).astype(np.uint32)
+
+
+def buckets(signature):
+    """The bucket of every band, as signed 64-bit integers."""
+    return [
+        int.from_bytes(hashlib.blake2b(band.tobytes(), digest_size=8).digest(), 'big', signed=True)
+        for band in signature.reshape(BANDS, ROWS)
+    ]
+
+
+def _rows_for(submission_id, assignment_id, text):
+    minhash = signature(text)
+    if minhash is None:
+        return None, []
+    return (
+        {'submission_id': submission_id, 'assignment_id': assignment_id, 'signature': minhash.tobytes()},
+        [{'assignment_id': assignment_id, 'band': band, 'bucket': bucket, 'submission_id': submission_id}
+         for band, bucket in enumerate(buckets(minhash))]
+    )
+
+
+def _insert(signature_rows, bucket_rows):
+    if signature_rows:
+        db.session.execute(SubmissionSignature.__table__.insert(), signature_rows)
+    if bucket_rows:
+        db.session.execute(SubmissionBucket.__table__.insert(), bucket_rows)
+
+
+def index_submission(submission):
+    """Add (or refresh) one submission in the index."""
+    db.session.query(SubmissionBucket).filter_by(
+        assignment_id=submission.assignment_id, submission_id=submission.id
+    ).delete()
+    db.session.query(SubmissionSignature).filter_by(submission_id=submission.id).delete()
+    signature_row, bucket_rows = _rows_for(submission.id, submission.assignment_id, submission.submission_text)
+    _insert([signature_row] if signature_row else [], bucket_rows)
+    db.session.commit()
+
+
+def rebuild_similarity_index():
+    """Recompute the signatures of every submission. Returns the number indexed."""
+    db.session.query(SubmissionBucket).delete()
+    db.session.query(SubmissionSignature).delete()
+
+    submissions = db.session.execute(
+        select(Submission.id, Submission.assignment_id, SubmissionContent.encoding, SubmissionContent.data)
+        .join(SubmissionContent, SubmissionContent.submission_id == Submission.id)
+    ).all()
+    indexed = 0
+    for start in range(0, len(submissions), REBUILD_BATCH):
+        signature_rows, bucket_rows = [], []
+        for submission_id, assignment_id, encoding, data in submissions[start:start + REBUILD_BATCH]:
+            signature_row, rows = _rows_for(submission_id, assignment_id, decode_text(encoding, data))
+            if signature_row:
+                signature_rows.append(signature_row)
+                bucket_rows.extend(rows)
+        _insert(signature_rows, bucket_rows)
+        indexed += len(signature_rows)
+    db.session.commit()
+    return indexed
+
+
+def candidate_pairs(assignment_id):
+    """(lower id, higher id) of every pair of submissions sharing at least one bucket."""
+    other = aliased(SubmissionBucket)
+    return db.session.execute(
+        select(SubmissionBucket.submission_id, other.submission_id)
+        .join(other, and_(
+            other.assignment_id == SubmissionBucket.assignment_id,
+            other.band == SubmissionBucket.band,
+            other.bucket == SubmissionBucket.bucket,
+            other.submission_id > SubmissionBucket.submission_id
+        ))
+        .where(SubmissionBucket.assignment_id == assignment_id)
+        .distinct()
+    ).all()
+
+
+def similar_clusters(assignment_id, threshold=DEFAULT_THRESHOLD):
+    """Groups of submissions by different students with estimated similarity >= threshold.
+
+    Clusters are the connected components of the similar pairs, most similar
+    cluster first.
+    """
+    import numpy as np
+
+    pairs = candidate_pairs(assignment_id)
+    if not pairs:
+        return []
+
+    submission_ids = sorted({submission_id for pair in pairs for submission_id in pair})
+    rows = db.session.execute(
+        select(SubmissionSignature.submission_id, SubmissionSignature.signature, Submission.student_id)
+        .join(Submission, Submission.id == SubmissionSignature.submission_id)
+        .where(SubmissionSignature.submission_id.in_(submission_ids))
+    ).all()
+    position = {row.submission_id: index for index, row in enumerate(rows)}
+    students = {row.submission_id: row.student_id for row in rows}
+    signatures = np.frombuffer(b''.join(row.signature for row in rows), dtype=np.uint32).reshape(len(rows), NUM_PERM)
+
+    # A student resubmitting their own work is not a match
+    pairs = [pair for pair in pairs if students[pair[0]] != students[pair[1]]]
+    if not pairs:
+        return []
+    left = np.array([position[a] for a, _ in pairs])
+    right = np.array([position[b] for _, b in pairs])
+    estimates = (signatures[left] == signatures[right]).mean(axis=1)
+    similar = [(a, b, float(score)) for (a, b), score in zip(pairs, estimates) if score >= threshold]
+
+    # Union-find over the similar pairs
+    parent = {}
+
+    def root(node):
+        parent.setdefault(node, node)
+        while parent[node] != node:
+            parent[node] = parent[parent[node]]
+            node = parent[node]
+        return node
+
+    for a, b, _ in similar:
+        parent[root(a)] = root(b)
+
+    groups = {}
+    for a, b, score in similar:
+        groups.setdefault(root(a), []).append((a, b, score))
+
+    names = dict(db.session.execute(
+        select(User.id, User.username).where(User.id.in_({students[node] for node in parent}))
+    ).all()) if parent else {}
+
+    clusters = []
+    for members in groups.values():
+        member_ids = sorted({node for a, b, _ in members for node in (a, b)})
+        clusters.append({
+            'max_similarity': round(max(score for _, _, score in members), 3),
+            'submissions': [{
+                'submission_id': submission_id,
+                'student_id': students[submission_id],
+                'student_name': names.get(students[submission_id])
+            } for submission_id in member_ids],
+            'pairs': [{
+                'submission_ids': [a, b],
+                'similarity': round(score, 3)
+            } for a, b, score in sorted(members, key=lambda pair: -pair[2])]
+        })
+    clusters.sort(key=lambda cluster: -cluster['max_similarity'])
+    return clusters
@@ -0,0 +1,164 @@
+"""Slow query log.
+
+Engine hooks time every statement; the only cost for a fast one is two
+perf_counter() calls. A statement slower than SLOW_QUERY_THRESHOLD_MS is
+written as one JSON line to SLOW_QUERY_LOG with:
+
+- its fingerprint: the SQL with literals replaced by ``?`` and IN lists
+  collapsed, so the same query with other values aggregates together;
+- the parameters it ran with (truncated) and the endpoint that issued it;
+- its ``EXPLAIN QUERY PLAN``, run once per fingerprint per process on the
+  same connection, with flags for full table scans and correlated subqueries.
+
+``flask slow-queries`` aggregates the log into a top-N report.
+"""
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import defaultdict
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+
+from flask import has_request_context, request
+from sqlalchemy import event
+
+STRING_RE = re.compile(r"'(?:[^']|'')*'")
+NUMBER_RE = re.compile(r'\b\d+(?:\.\d+)?\b')
+PARAM_LIST_RE = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+SPACE_RE = re.compile(r'\s+')
+# "SCAN unit" is a full table scan; "SCAN unit USING INDEX ..." walks an index
+FULL_SCAN_RE = re.compile(r'^SCAN (\S+)(?!.*USING (?:COVERING )?INDEX)')
+MAX_PARAMS_LENGTH = 500
+EXPLAINABLE = ('SELECT', 'UPDATE', 'DELETE', 'INSERT', 'WITH')
+
+
+def normalize(statement):
+    statement = STRING_RE.sub('?', statement)
+    statement = NUMBER_RE.sub('?', statement)
+    statement = PARAM_LIST_RE.sub('(...)', statement)
+    return SPACE_RE.sub(' ', statement).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode('utf-8')).hexdigest()[:12]
+
+
+def plan_flags(plan):
+    """Tables read with a full scan and whether a correlated subquery runs per row."""
+    scans = sorted({match.group(1) for line in plan for match in [FULL_SCAN_RE.match(line)] if match})
+    return {
+        'full_scans': scans,
+        'correlated_subquery': any('CORRELATED' in line for line in plan)
+    }
+
+
+class SlowQueryLog:
+    def __init__(self):
+        self.threshold = 0.1
+        self.logger = logging.getLogger('lms.slow_queries')
+        self.logger.propagate = False
+        # fingerprint -> plan lines, so each query shape is explained once per process
+        self._plans = {}
+        self._engines = set()
+
+    def init_app(self, app, engine):
+        threshold_ms = app.config.get('SLOW_QUERY_THRESHOLD_MS', 100)
+        if not threshold_ms:
+            return
+        self.threshold = threshold_ms / 1000.0
+        path = app.config.get('SLOW_QUERY_LOG')
+        if path and not any(getattr(handler, 'baseFilename', None) == path for handler in self.logger.handlers):
+            handler = RotatingFileHandler(
+                path, maxBytes=app.config.get('SLOW_QUERY_LOG_MAX_BYTES', 10 * 1024 * 1024), backupCount=1
+            )
+            handler.setFormatter(logging.Formatter('%(message)s'))
+            self.logger.addHandler(handler)
+            self.logger.setLevel(logging.INFO)
+        self.attach(engine)
+        app.extensions['slow_query_log'] = self
+
+    def attach(self, engine):
+        if engine in self._engines:
+            return
+        self._engines.add(engine)
+        event.listen(engine, 'before_cursor_execute', self._before)
+        event.listen(engine, 'after_cursor_execute', self._after)
+
+    def _before(self, conn, cursor, statement, parameters, context, executemany):
+        context._query_started = time.perf_counter()
+
+    def _after(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - getattr(context, '_query_started', time.perf_counter())
+        if elapsed < self.threshold:
+            return
+        try:
+            self.record(cursor, statement, parameters, elapsed, executemany)
+        except Exception:
+            # Never fail the query because it could not be logged
+            self.logger.debug('Could not record slow query', exc_info=True)
+
+    def explain(self, cursor, key, statement, parameters):
+        if key not in self._plans:
+            plan = None
+            if statement.lstrip().upper().startswith(EXPLAINABLE):
+                try:
+                    rows = cursor.connection.execute('EXPLAIN QUERY PLAN ' + statement, parameters).fetchall()
+                    plan = [row[-1] for row in rows]
+                except Exception:
+                    pass
+            self._plans[key] = plan
+        return self._plans[key]
+
+    def record(self, cursor, statement, parameters, elapsed, executemany=False):
+        normalized = normalize(statement)
+        key = fingerprint(normalized)
+        plan = None if executemany else self.explain(cursor, key, statement, parameters)
+        entry = {
+            'at': datetime.utcnow().isoformat(),
+            'fingerprint': key,
+            'duration_ms': round(elapsed * 1000, 3),
+            'statement': normalized,
+            'parameters': repr(parameters)[:MAX_PARAMS_LENGTH],
+            'endpoint': request.endpoint if has_request_context() else None,
+            'plan': plan,
+            **plan_flags(plan or [])
+        }
+        self.logger.info(json.dumps(entry))
+
+
+def report(lines, top=20, sort='total'):
+    """Aggregate slow query log lines by fingerprint, largest ``sort`` value first."""
+    groups = defaultdict(lambda: {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'endpoints': set()})
+    for line in lines:
+        try:
+            entry = json.loads(line)
+        except ValueError:
+            continue
+        group = groups[entry['fingerprint']]
+        group['count'] += 1
+        group['total_ms'] += entry['duration_ms']
+        if entry['duration_ms'] >= group['max_ms']:
+            group['max_ms'] = entry['duration_ms']
+            group['slowest_parameters'] = entry['parameters']
+        if entry['endpoint']:
+            group['endpoints'].add(entry['endpoint'])
+        for field in ('statement', 'plan', 'full_scans', 'correlated_subquery'):
+            if entry.get(field) is not None or field not in group:
+                group[field] = entry.get(field)
+
+    rows = []
+    for key, group in groups.items():
+        rows.append(dict(
+            group,
+            fingerprint=key,
+            total_ms=round(group['total_ms'], 3),
+            mean_ms=round(group['total_ms'] / group['count'], 3),
+            endpoints=sorted(group['endpoints'])
+        ))
+    rows.sort(key=lambda row: row[{'total': 'total_ms', 'max': 'max_ms', 'count': 'count'}[sort]], reverse=True)
+    return rows[:top]
+
+
+slow_query_log = SlowQueryLog()
@@ -0,0 +1,458 @@
+"""Typeahead suggestions for the catalog search box.
+
+/api/units/suggest?prefix= matches the prefix against the start of every word
+of unit titles, category names and teacher usernames, and returns the most
+popular matches of each kind: units by enrollments, categories and teachers
+by the enrollments of their units.
+
+Each kind is a SuggestionSet: a PrefixArray over the names it was built with,
+and a small one over the names added or changed since. A PrefixArray keeps
+the names as one NUL-separated UTF-8 blob plus the byte offsets of every word
+start, sorted by the text that follows them, so the matches of a prefix are
+one contiguous range found by binary search. ASCII letters match
+case-insensitively. Popularity is kept apart from the names, in arrays
+indexed by id. When more than SUGGEST_MAX_RECENT names changed, a background
+thread folds them into a new PrefixArray. Ranking the matches of a one or two
+letter prefix takes a few milliseconds at a million names, so those answers
+are reused for a few seconds.
+
+Each process loads the index from the database on its first lookup and keeps
+it current from changes.py: enrollments are counted as they arrive, and new
+or changed units and users are read back on the next lookup. numpy is
+imported on first use.
+"""
+import threading
+import time
+
+from sqlalchemy import func, select
+
+from changes import DELETE, INSERT
+from database import db
+from models import Enrollment, Unit, User
+
+# Bytes of the text after a word start that the sort order covers; longer
+# prefixes are narrowed to these and then checked against the whole text
+SORT_WIDTH = 16
+# Answers for prefixes matching more words than this, which take a few
+# milliseconds at a million names, are reused for BROAD_SECONDS
+BROAD_MATCHES = 20000
+BROAD_SECONDS = 5
+_WORD_BYTES = None
+
+
+def _word_bytes():
+    """Lookup table of the bytes that can start a word: ASCII letters and digits, and non-ASCII."""
+    global _WORD_BYTES
+    if _WORD_BYTES is None:
+        import numpy as np
+
+        table = np.zeros(256, dtype=bool)
+        for low, high in ((ord('0'), ord('9')), (ord('a'), ord('z')), (0x80, 0xff)):
+            table[low:high + 1] = True
+        _WORD_BYTES = table
+    return _WORD_BYTES
+
+
+def fold(prefix):
+    """A search prefix as the bytes PrefixArray.match compares."""
+    return prefix.replace('\0', '').strip().encode('utf-8').lower()
+
+
+class PrefixArray:
+    """Names with ids, searchable by the prefix of any of their words."""
+
+    def __init__(self, ids, names):
+        import numpy as np
+
+        encoded = [name.replace('\0', '').encode('utf-8') for name in names]
+        self.ids = np.asarray(ids, dtype='<i8')
+        lengths = np.fromiter((len(name) + 1 for name in encoded), dtype='<i8', count=len(encoded))
+        # Name i is text[offsets[i]:offsets[i + 1] - 1], followed by a NUL
+        self.offsets = np.concatenate(([0], np.cumsum(lengths))).astype('<i8')
+        self.text = b''.join(name + b'\0' for name in encoded)
+
+        folded = np.frombuffer(self.text.lower(), dtype=np.uint8)
+        word = _word_bytes()[folded]
+        follows_word = np.zeros_like(word)
+        follows_word[1:] = word[:-1]
+        starts = np.flatnonzero(word & ~follows_word)
+        items = np.searchsorted(self.offsets, starts, side='right') - 1
+        ends = self.offsets[items + 1] - 1
+        padded = np.concatenate((folded, np.zeros(SORT_WIDTH, dtype=np.uint8)))
+        # The first SORT_WIDTH bytes of each word onwards, NUL padded past the end of
+        # its name, as two big-endian integers so they sort like the bytes
+        high = np.zeros(len(starts), dtype=np.uint64)
+        low = np.zeros(len(starts), dtype=np.uint64)
+        for column in range(SORT_WIDTH):
+            positions = starts + column
+            values = np.where(positions < ends, padded[positions], 0).astype(np.uint64)
+            if column < 8:
+                high |= values << np.uint64(8 * (7 - column))
+            else:
+                low |= values << np.uint64(8 * (15 - column))
+        order = np.lexsort((low, high))
+        index_type = '<u4' if len(self.text) < 2 ** 32 else '<i8'
+        self.starts = starts[order].astype(index_type)
+        self.items = items[order].astype(index_type)
+
+    def __len__(self):
+        return len(self.ids)
+
+    def name(self, item):
+        return self.text[self.offsets[item]:self.offsets[item + 1] - 1].decode('utf-8')
+
+    def names(self):
+        return [name.decode('utf-8') for name in self.text.split(b'\0')[:-1]]
+
+    def find(self, entity_id):
+        """The item of ``entity_id``, or None; ids are sorted."""
+        import numpy as np
+
+        item = int(np.searchsorted(self.ids, entity_id))
+        return item if item < len(self.ids) and self.ids[item] == entity_id else None
+
+    def _bound(self, key, after):
+        # Slices run past the name into the NUL and the next name, but a
+        # comparison with a key without NULs is decided at that NUL at the latest
+        text, starts, size = self.text, self.starts, len(key)
+        low, high = 0, len(starts)
+        while low < high:
+            middle = (low + high) // 2
+            start = int(starts[middle])
+            value = text[start:start + size].lower()
+            if value < key or (after and value == key):
+                low = middle + 1
+            else:
+                high = middle
+        return low
+
+    def match(self, prefix):
+        """Items with a word starting with the folded ``prefix``; a name matching twice is listed twice."""
+        key = prefix[:SORT_WIDTH]
+        low, high = self._bound(key, False), self._bound(key, True)
+        items = self.items[low:high]
+        if len(prefix) > SORT_WIDTH:
+            text, size = self.text, len(prefix)
+            starts = self.starts[low:high].tolist()
+            items = items[[text[start:start + size].lower() == prefix for start in starts]]
+        return items
+
+
+class SuggestionSet:
+    """One kind of suggestion: names by id and a popularity per id."""
+
+    def __init__(self, ids=(), names=()):
+        import numpy as np
+
+        self.base = PrefixArray(ids, names)
+        # id -> name (None once removed) for the changes since base was built
+        self.recent = {}
+        self._recent_array = None
+        self._hidden = None
+        # (prefix, limit) -> (expiry, answer) for broad prefixes; names changing clears it
+        self._broad = {}
+        self.popularity = np.zeros(max(ids, default=0) + 1, dtype='<i8')
+
+    def reserve(self, entity_id):
+        import numpy as np
+
+        if entity_id >= len(self.popularity):
+            size = max(entity_id + 1, 2 * len(self.popularity))
+            self.popularity = np.concatenate((self.popularity, np.zeros(size - len(self.popularity), dtype='<i8')))
+
+    def add(self, entity_id, amount):
+        self.reserve(entity_id)
+        self.popularity[entity_id] += amount
+
+    def score(self, entity_id):
+        return int(self.popularity[entity_id]) if entity_id < len(self.popularity) else 0
+
+    def name(self, entity_id):
+        if entity_id in self.recent:
+            return self.recent[entity_id]
+        item = self.base.find(entity_id)
+        return self.base.name(item) if item is not None else None
+
+    def put(self, entity_id, name):
+        """Add or rename; ``name`` None removes."""
+        if self.name(entity_id) == name:
+            return
+        self.reserve(entity_id)
+        self.recent[entity_id] = name
+        self._recent_array = self._hidden = None
+        self._broad.clear()
+
+    def contents(self):
+        """(ids, names) of every current entry, by id."""
+        import numpy as np
+
+        recent = dict(self.recent)
+        keep = np.flatnonzero(~np.isin(self.base.ids, list(recent)))
+        names = self.base.names()
+        entries = [(int(self.base.ids[item]), names[item]) for item in keep.tolist()]
+        entries += [(entity_id, name) for entity_id, name in recent.items() if name is not None]
+        entries.sort()
+        return [entity_id for entity_id, _ in entries], [name for _, name in entries]
+
+    def rebased(self, base, recent):
+        """Swap in ``base``, built from contents() while self.recent was ``recent``."""
+        self.base = base
+        self.recent = {
+            entity_id: name for entity_id, name in self.recent.items()
+            if entity_id not in recent or recent[entity_id] != name
+        }
+        self._recent_array = self._hidden = None
+        self._broad.clear()
+
+    def top(self, prefix, limit):
+        """Up to ``limit`` (popularity, name, id) matches of the folded ``prefix``, most popular first."""
+        import numpy as np
+
+        broad = self._broad.get((prefix, limit))
+        if broad is not None and broad[0] > time.monotonic():
+            return broad[1]
+        if self._recent_array is None:
+            entries = sorted((entity_id, name) for entity_id, name in self.recent.items() if name is not None)
+            self._recent_array = PrefixArray([entity_id for entity_id, _ in entries], [name for _, name in entries])
+            self._hidden = np.array(sorted(self.recent), dtype='<i8')
+
+        found, matched = {}, 0
+        for array, hidden in ((self.base, self._hidden), (self._recent_array, None)):
+            items = array.match(prefix)
+            matched += len(items)
+            ids = array.ids[items]
+            if hidden is not None and len(hidden) and len(ids):
+                shown = ~np.isin(ids, hidden)
+                items, ids = items[shown], ids[shown]
+            scores = self.popularity[ids]
+            # The most popular entries, widened until they hold enough names
+            # that are not repeated matches of one name
+            distinct, take = {}, min(len(ids), 2 * limit)
+            while take:
+                picked = np.argpartition(-scores, take - 1)[:take] if take < len(ids) else np.arange(len(ids))
+                distinct = {int(ids[index]): index for index in picked.tolist()}
+                if len(distinct) >= limit or take == len(ids):
+                    break
+                take = min(len(ids), 4 * take)
+            for entity_id, index in distinct.items():
+                found[entity_id] = (int(scores[index]), array.name(items[index]), entity_id)
+        answer = sorted(found.values(), key=lambda match: (-match[0], match[1].lower(), match[2]))[:limit]
+        if matched > BROAD_MATCHES:
+            self._broad[prefix, limit] = (time.monotonic() + BROAD_SECONDS, answer)
+        return answer
+
+
+def _read_back(ids, statement, batch=500):
+    """id -> row of ``statement(ids)``, run on batches of ids."""
+    rows = {}
+    for start in range(0, len(ids), batch):
+        rows.update((row.id, row) for row in db.session.execute(statement(ids[start:start + batch])).all())
+    return rows
+
+
+class SuggestIndex:
+    def __init__(self):
+        self.max_recent = 1000
+        self.loads = 0
+        self.compactions = 0
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._pending_units = set()
+        self._pending_users = set()
+        self._compacting = set()
+
+    def init_app(self, app):
+        self.max_recent = app.config.get('SUGGEST_MAX_RECENT', 1000)
+        self._loaded = False
+        app.extensions['suggestions'] = self
+
+    def on_changes(self, changes):
+        """changes.py handler: note the units and users to read back on the next lookup.
+
+        Reading them back rather than counting here keeps this idempotent, as
+        changes.py may hand this process the same change twice.
+        """
+        with self._lock:
+            for change in changes:
+                if change.entity is None:
+                    self._loaded = False
+                elif change.entity == 'unit':
+                    self._pending_units.add(change.entity_id)
+                elif change.entity == 'user':
+                    self._pending_users.add(change.entity_id)
+                elif change.entity == 'enrollment' and change.op in (INSERT, DELETE):
+                    if change.unit_id is None:
+                        self._loaded = False
+                    else:
+                        self._pending_units.add(change.unit_id)
+
+    def _credited(self, unit_id):
+        """(teacher id, category code) whose popularity includes the unit's, -1 for none."""
+        if unit_id < len(self._unit_teacher):
+            return int(self._unit_teacher[unit_id]), int(self._unit_category[unit_id])
+        return -1, -1
+
+    def _load(self):
+        import numpy as np
+
+        units = db.session.execute(select(Unit.id, Unit.title, Unit.category, Unit.teacher_id).order_by(Unit.id)).all()
+        enrolled = db.session.execute(
+            select(Enrollment.unit_id, func.count(Enrollment.id)).group_by(Enrollment.unit_id)
+        ).all()
+        teachers = db.session.execute(select(User.id, User.username).where(User.role == 'teacher').order_by(User.id)).all()
+
+        self.units = SuggestionSet([row.id for row in units], [row.title for row in units])
+        self.teachers = SuggestionSet([row.id for row in teachers], [row.username for row in teachers])
+        self._category_names = sorted({row.category for row in units if row.category})
+        self._category_codes = {category: code for code, category in enumerate(self._category_names)}
+        self.categories = SuggestionSet(range(len(self._category_names)), self._category_names)
+
+        unit_ids = np.array([row.id for row in units], dtype='<i8')
+        teacher_ids = np.array([row.teacher_id for row in units], dtype='<i8')
+        codes = np.array([self._category_codes.get(row.category, -1) for row in units], dtype='<i8')
+        self._unit_teacher = np.full(len(self.units.popularity), -1, dtype='<i8')
+        self._unit_category = np.full(len(self.units.popularity), -1, dtype='<i8')
+        self._unit_teacher[unit_ids] = teacher_ids
+        self._unit_category[unit_ids] = codes
+        self._category_units = np.bincount(codes[codes >= 0], minlength=len(self._category_names))
+
+        for unit_id, count in enrolled:
+            self.units.add(unit_id, count)
+        counts = self.units.popularity[unit_ids]
+        self.teachers.reserve(int(teacher_ids.max(initial=0)))
+        np.add.at(self.teachers.popularity, teacher_ids, counts)
+        np.add.at(self.categories.popularity, codes[codes >= 0], counts[codes >= 0])
+        self._pending_units.clear()
+        self._pending_users.clear()
+        self._loaded = True
+        self.loads += 1
+
+    def _catch_up(self):
+        if not self._loaded:
+            self._load()
+            return
+        if self._pending_units:
+            unit_ids, self._pending_units = sorted(self._pending_units), set()
+            total_enrolled = select(func.count(Enrollment.id))\
+                .where(Enrollment.unit_id == Unit.id)\
+                .correlate(Unit)\
+                .scalar_subquery()
+            rows = _read_back(unit_ids, lambda ids: select(
+                Unit.id, Unit.title, Unit.category, Unit.teacher_id, total_enrolled.label('total_enrolled')
+            ).where(Unit.id.in_(ids)))
+            for unit_id in unit_ids:
+                self._update_unit(unit_id, rows.get(unit_id))
+        if self._pending_users:
+            user_ids, self._pending_users = sorted(self._pending_users), set()
+            rows = _read_back(user_ids, lambda ids: select(User.id, User.username, User.role).where(User.id.in_(ids)))
+            for user_id in user_ids:
+                row = rows.get(user_id)
+                self.teachers.put(user_id, row.username if row is not None and row.role == 'teacher' else None)
+        for kind in ('units', 'teachers', 'categories'):
+            if len(getattr(self, kind).recent) > self.max_recent and kind not in self._compacting:
+                self._compacting.add(kind)
+                threading.Thread(target=self._compact, args=(kind,), name=f'suggest-{kind}', daemon=True).start()
+
+    def _update_unit(self, unit_id, row):
+        """Apply a unit's current title, category, teacher and enrollments; ``row`` is None once it is deleted."""
+        import numpy as np
+
+        self.units.put(unit_id, row.title if row is not None else None)
+        count = row.total_enrolled if row is not None else 0
+        teacher_id = row.teacher_id if row is not None else -1
+        category = self._category_code(row.category) if row is not None and row.category else -1
+        old_count = self.units.score(unit_id)
+        old_teacher, old_category = self._credited(unit_id)
+        if unit_id >= len(self._unit_teacher):
+            grow = max(unit_id + 1, 2 * len(self._unit_teacher)) - len(self._unit_teacher)
+            self._unit_teacher = np.concatenate((self._unit_teacher, np.full(grow, -1, dtype='<i8')))
+            self._unit_category = np.concatenate((self._unit_category, np.full(grow, -1, dtype='<i8')))
+
+        # Move the unit's enrollments from what its teacher and category were to what they are
+        self.units.add(unit_id, count - old_count)
+        if old_teacher >= 0:
+            self.teachers.add(old_teacher, -old_count)
+        if teacher_id >= 0:
+            self.teachers.add(teacher_id, count)
+        if old_category >= 0:
+            self.categories.add(old_category, -old_count)
+        if category >= 0:
+            self.categories.add(category, count)
+        if category != old_category:
+            if old_category >= 0:
+                self._category_units[old_category] -= 1
+                if not self._category_units[old_category]:
+                    self.categories.put(old_category, None)
+            if category >= 0:
+                self._category_units[category] += 1
+                self.categories.put(category, self._category_names[category])
+        self._unit_teacher[unit_id] = teacher_id
+        self._unit_category[unit_id] = category
+
+    def _category_code(self, category):
+        import numpy as np
+
+        code = self._category_codes.get(category)
+        if code is None:
+            code = self._category_codes[category] = len(self._category_names)
+            self._category_names.append(category)
+            self._category_units = np.concatenate((self._category_units, [0]))
+        return code
+
+    def _compact(self, kind):
+        try:
+            with self._lock:
+                suggestions = getattr(self, kind)
+                recent = dict(suggestions.recent)
+                ids, names = suggestions.contents()
+            base = PrefixArray(ids, names)
+            with self._lock:
+                # A reload in the meantime replaced the set
+                if getattr(self, kind) is suggestions:
+                    suggestions.rebased(base, recent)
+                    self.compactions += 1
+        finally:
+            with self._lock:
+                self._compacting.discard(kind)
+
+    def suggest(self, prefix, limit):
+        """The ``limit`` most popular units, categories and teachers matching ``prefix``.
+
+        Must be called inside an application context.
+        """
+        key = fold(prefix)
+        with self._lock:
+            self._catch_up()
+            units = self.units.top(key, limit)
+            categories = self.categories.top(key, limit)
+            teachers = self.teachers.top(key, limit)
+        return {
+            'units': [{'id': unit_id, 'title': title, 'total_enrolled': score} for score, title, unit_id in units],
+            'categories': [{'name': name, 'total_enrolled': score} for score, name, _ in categories],
+            'teachers': [
+                {'id': teacher_id, 'username': username, 'total_students': score}
+                for score, username, teacher_id in teachers
+            ],
+        }
+
+    def metrics(self):
+        with self._lock:
+            if not self._loaded:
+                return {'loaded': False, 'loads': self.loads, 'compactions': self.compactions}
+            return {
+                'loaded': True,
+                'loads': self.loads,
+                'compactions': self.compactions,
+                **{
+                    kind: {
+                        'names': len(getattr(self, kind).base),
+                        'recent': len(getattr(self, kind).recent),
+                        'text_bytes': len(getattr(self, kind).base.text),
+                        'words': len(getattr(self, kind).base.starts),
+                    }
+                    for kind in ('units', 'categories', 'teachers')
+                },
+            }
+
+
+suggestions = SuggestIndex()
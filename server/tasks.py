@@ -0,0 +1,53 @@
+"""Handlers for background jobs, registered on the queue by create_app."""
+from archive import archive
+from database import db
+from changes import changes
+from grading import recompute_all_grades, recompute_grades
+from idempotency import purge_expired_keys
+from models import Unit, Submission
+from related_units import index_unit, rebuild_related_index
+from similarity import index_submission, rebuild_similarity_index
+from timeseries import timeseries
+
+PRUNE_EVERY_SECONDS = 24 * 60 * 60
+IDEMPOTENCY_PURGE_EVERY_SECONDS = 60 * 60
+CHANGES_PRUNE_EVERY_SECONDS = 15 * 60
+TIMESERIES_COMPACT_EVERY_SECONDS = 24 * 60 * 60
+ARCHIVE_EVERY_SECONDS = 24 * 60 * 60
+
+
+def index_submission_task(submission_id):
+    submission = db.session.get(Submission, submission_id)
+    if submission is None:
+        return {'indexed': False}
+    index_submission(submission)
+    return {'indexed': True}
+
+
+def index_unit_task(unit_id):
+    index_unit(unit_id)
+
+
+def recompute_unit_grades_task(unit_id):
+    unit = db.session.get(Unit, unit_id)
+    if unit is None:
+        return {'recomputed_enrollments': 0}
+    updated = recompute_grades(unit)
+    db.session.commit()
+    return {'recomputed_enrollments': updated}
+
+
+def register_tasks(queue):
+    queue.task('similarity.index_submission')(index_submission_task)
+    queue.task('similarity.rebuild', max_attempts=1)(lambda: {'indexed': rebuild_similarity_index()})
+    queue.task('related.index_unit')(index_unit_task)
+    queue.task('related.rebuild', max_attempts=1)(lambda: {'indexed': rebuild_related_index()})
+    queue.task('grades.recompute_unit')(recompute_unit_grades_task)
+    queue.task('grades.recompute_all', max_attempts=1)(lambda: {'recomputed_enrollments': recompute_all_grades()})
+    queue.task('jobs.prune', every=PRUNE_EVERY_SECONDS)(lambda: {'deleted': queue.prune()})
+    queue.task('idempotency.purge', every=IDEMPOTENCY_PURGE_EVERY_SECONDS)(lambda: {'deleted': purge_expired_keys()})
+    queue.task('changes.prune', every=CHANGES_PRUNE_EVERY_SECONDS)(lambda: {'deleted': changes.prune()})
+    queue.task('timeseries.compact', every=TIMESERIES_COMPACT_EVERY_SECONDS)(lambda: timeseries.compact())
+    queue.task('archive.units', max_attempts=1, every=ARCHIVE_EVERY_SECONDS)(
+        lambda: {'archived': archive.archive_units()}
+    )
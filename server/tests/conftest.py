@@ -0,0 +1,65 @@
+"""Fixtures: one app on a throwaway SQLite database for the whole run.
+
+Tests share the database, so each one creates the users and units it needs
+rather than relying on seeded rows.
+"""
+import itertools
+import os
+import sys
+
+import pytest
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from app import create_app  # noqa: E402
+from auth import generate_token  # noqa: E402
+from database import db  # noqa: E402
+from models import User  # noqa: E402
+
+_users = itertools.count(1)
+
+
+@pytest.fixture(scope='session')
+def app(tmp_path_factory):
+    workdir = tmp_path_factory.mktemp('lms')
+    app = create_app({
+        'TESTING': True,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{workdir / 'test.db'}",
+        'CATALOG_SNAPSHOT_ENABLED': False,
+        'CATALOG_SNAPSHOT_PATH': str(workdir / 'catalog.snapshot'),
+        'CHANGES_STAMP_FILE': str(workdir / 'changes.stamp'),
+        'ADMISSION_CONTROL_ENABLED': False,
+        'ARCHIVE_DIR': str(workdir / 'archive'),
+        'ARCHIVE_PAUSE_MS': 0,
+    })
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+@pytest.fixture
+def session(app):
+    with app.app_context():
+        yield db.session
+        db.session.remove()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def make_user(session):
+    def make(role='student'):
+        number = next(_users)
+        user = User(username=f'{role}{number}', email=f'{role}{number}@example.com', password_hash='x', role=role)
+        session.add(user)
+        session.commit()
+        return user
+    return make
+
+
+def auth_headers(user, **headers):
+    return dict(headers, Authorization=f'Bearer {generate_token(user.id)}')
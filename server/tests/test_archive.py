@@ -0,0 +1,48 @@
+from datetime import datetime, timedelta
+
+from archive import archive
+from conftest import auth_headers
+from models import Assignment, Enrollment, Rating, Submission, Unit
+
+
+def test_archived_rows_come_back_with_include_archived(client, session, make_user):
+    teacher, student = make_user('teacher'), make_user()
+    ended = datetime.utcnow() - timedelta(days=2 * 365)
+    unit = Unit(title='Finished unit', description='x', teacher_id=teacher.id,
+                start_date=ended - timedelta(days=90), end_date=ended)
+    session.add(unit)
+    session.flush()
+    assignment = Assignment(title='Old essay', unit_id=unit.id)
+    session.add(assignment)
+    session.flush()
+    session.add_all([
+        Enrollment(student_id=student.id, unit_id=unit.id, enrollment_date=ended - timedelta(days=90), grade=71.0),
+        Rating(student_id=student.id, unit_id=unit.id, score=4),
+        Submission(assignment_id=assignment.id, student_id=student.id, submission_text='An archived answer ' * 20,
+                   submitted_at=ended - timedelta(days=10), grade=80.0),
+    ])
+    session.commit()
+    unit_id = unit.id
+
+    moved = archive.archive_units(months=6)
+    assert moved['enrollment'] >= 1 and moved['rating'] >= 1 and moved['submission'] >= 1
+    assert Enrollment.query.filter_by(unit_id=unit_id).count() == 0
+    assert Rating.query.filter_by(unit_id=unit_id).count() == 0
+    # Repeating a run moves nothing
+    assert sum(archive.archive_units(months=6).values()) == 0
+
+    headers = auth_headers(student)
+    live = client.get(f'/api/student/results/{student.id}', headers=headers).get_json()
+    assert unit_id not in [result['unit_id'] for result in live['results']]
+    combined = client.get(f'/api/student/results/{student.id}?include_archived=true', headers=headers).get_json()
+    [record] = [result for result in combined['results'] if result['unit_id'] == unit_id]
+    assert record['archived'] is True
+    assert record['unit_title'] == 'Finished unit'
+
+    live = client.get('/api/student/submissions', headers=headers).get_json()
+    assert live == []
+    [submission] = client.get('/api/student/submissions?include_archived=true', headers=headers).get_json()
+    assert submission['unit_title'] == 'Finished unit'
+    assert submission['assignment_title'] == 'Old essay'
+    assert submission['submission_text'] == 'An archived answer ' * 20
+    assert submission['grade'] == 80.0
@@ -0,0 +1,38 @@
+from conftest import auth_headers
+from models import Enrollment, Unit
+from idempotency import HEADER, REPLAYED_HEADER
+
+
+def test_retry_replays_the_first_response(client, session, make_user):
+    teacher, student = make_user('teacher'), make_user()
+    unit = Unit(title='Idempotent unit', description='x', teacher_id=teacher.id)
+    session.add(unit)
+    session.commit()
+    headers = auth_headers(student, **{HEADER: 'enroll-1'})
+
+    first = client.post('/api/enrollments', json={'unit_id': unit.id}, headers=headers)
+    assert first.status_code == 201
+    assert REPLAYED_HEADER not in first.headers
+
+    retry = client.post('/api/enrollments', json={'unit_id': unit.id}, headers=headers)
+    assert retry.status_code == 201
+    assert retry.headers[REPLAYED_HEADER] == 'true'
+    assert retry.get_json() == first.get_json()
+    assert Enrollment.query.filter_by(student_id=student.id, unit_id=unit.id).count() == 1
+
+    # Without the key the handler runs again and sees the enrollment
+    again = client.post('/api/enrollments', json={'unit_id': unit.id}, headers=auth_headers(student))
+    assert again.status_code == 409
+
+
+def test_key_reused_for_a_different_request_is_rejected(client, session, make_user):
+    teacher, student = make_user('teacher'), make_user()
+    units = [Unit(title=f'Unit {n}', description='x', teacher_id=teacher.id) for n in range(2)]
+    session.add_all(units)
+    session.commit()
+    headers = auth_headers(student, **{HEADER: 'enroll-2'})
+
+    assert client.post('/api/enrollments', json={'unit_id': units[0].id}, headers=headers).status_code == 201
+    reused = client.post('/api/enrollments', json={'unit_id': units[1].id}, headers=headers)
+    assert reused.status_code == 422
+    assert REPLAYED_HEADER not in reused.headers
@@ -0,0 +1,72 @@
+from datetime import datetime
+
+import pytest
+
+from jobs import FAILED, QUEUED, SUCCEEDED, jobs
+from models import Job
+
+
+@pytest.fixture
+def flaky_task(session):
+    calls = []
+
+    def flaky(fail_times):
+        calls.append(len(calls) + 1)
+        if len(calls) <= fail_times:
+            raise RuntimeError(f'attempt {len(calls)} failed')
+        return {'calls': len(calls)}
+
+    jobs.task('tests.flaky', max_attempts=3)(flaky)
+    yield calls
+    del jobs.tasks['tests.flaky']
+
+
+def run_next(session):
+    job_id = jobs.claim('tests')
+    assert job_id is not None
+    return jobs.run(job_id, 'tests'), session.get(Job, job_id)
+
+
+def make_due(session, job):
+    job.run_at = datetime.utcnow()
+    session.commit()
+
+
+def test_backoff_doubles_up_to_the_maximum(app):
+    base, maximum = jobs.backoff_base, jobs.backoff_max
+    for attempts in range(1, 20):
+        delay = jobs.backoff(attempts)
+        expected = min(base * 2 ** (attempts - 1), maximum)
+        assert expected * 0.5 <= delay <= expected
+
+
+def test_failed_job_is_retried_after_a_backoff(session, flaky_task):
+    jobs.enqueue('tests.flaky', {'fail_times': 1})
+    session.commit()
+
+    status, job = run_next(session)
+    assert status == QUEUED
+    assert job.attempts == 1 and job.locked_by is None
+    assert job.last_error == 'RuntimeError: attempt 1 failed'
+    delay = (job.run_at - datetime.utcnow()).total_seconds()
+    assert 0 < delay <= jobs.backoff_base
+    # Not due until the backoff has passed
+    assert jobs.claim('tests') is None
+
+    make_due(session, job)
+    status, job = run_next(session)
+    assert status == SUCCEEDED
+    assert job.attempts == 2 and job.result == {'calls': 2}
+
+
+def test_job_fails_after_max_attempts(session, flaky_task):
+    jobs.enqueue('tests.flaky', {'fail_times': 5})
+    session.commit()
+
+    for attempt in range(1, 4):
+        status, job = run_next(session)
+        make_due(session, job)
+    assert status == FAILED
+    assert job.attempts == 3 and job.finished_at is not None
+    assert job.last_error == 'RuntimeError: attempt 3 failed'
+    assert flaky_task == [1, 2, 3]
@@ -0,0 +1,64 @@
+import pytest
+
+from suggest import SORT_WIDTH, PrefixArray, fold
+
+
+def matches(array, prefix):
+    return sorted(int(array.ids[item]) for item in array.match(fold(prefix)))
+
+
+@pytest.fixture
+def names():
+    return PrefixArray([1, 2, 3, 4, 5, 6], [
+        'Introduction to Thermodynamics',
+        'Introduction to Thermodynamic Systems',
+        'Intro',
+        'Café Culture',
+        'Über Networks',
+        '数据科学 Basics',
+    ])
+
+
+def test_prefix_longer_than_sort_width(names):
+    prefix = 'introduction to thermodynamics'
+    assert len(fold(prefix)) > SORT_WIDTH
+    assert matches(names, prefix) == [1]
+    assert matches(names, 'introduction to thermodynamic') == [1, 2]
+    # Equal in the first SORT_WIDTH bytes, different after them
+    assert matches(names, 'introduction to chemistry') == []
+    # Longer than the whole name
+    assert matches(names, 'intro' + 'x' * SORT_WIDTH) == []
+
+
+def test_prefix_of_exactly_sort_width(names):
+    prefix = 'thermodynamic sy'
+    assert len(fold(prefix)) == SORT_WIDTH
+    assert matches(names, prefix) == [2]
+    assert matches(names, 'intro') == [1, 2, 3]
+
+
+def test_matches_any_word_case_insensitively(names):
+    assert matches(names, 'THERMO') == [1, 2]
+    assert matches(names, 'systems') == [2]
+    assert matches(names, 'culture') == [4]
+    assert matches(names, 'z') == []
+
+
+def test_non_ascii_text(names):
+    assert matches(names, 'café') == [4]
+    assert matches(names, 'caf') == [4]
+    assert matches(names, 'Über') == [5]
+    assert matches(names, '数据') == [6]
+    assert matches(names, 'basics') == [6]
+    assert names.name(3) == 'Café Culture'
+    # Non-ASCII prefixes past SORT_WIDTH bytes are compared in full too
+    long_prefix = '数据科学 basics'
+    assert len(fold(long_prefix)) > SORT_WIDTH
+    assert matches(names, long_prefix) == [6]
+    assert matches(names, '数据科学 basicx') == []
+
+
+def test_empty_array():
+    array = PrefixArray([], [])
+    assert len(array) == 0
+    assert matches(array, 'anything') == []
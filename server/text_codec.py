@@ -0,0 +1,30 @@
+"""Compact storage for long free text.
+
+Submission texts live in the submission_content side table rather than on
+the submission row, so listing and grading submissions never reads them.
+Texts of COMPRESS_MIN_BYTES or more are zlib-compressed when that actually
+saves space; shorter ones are stored as plain UTF-8, where the zlib header
+would cost more than it saves.
+"""
+import zlib
+
+COMPRESS_MIN_BYTES = 256
+COMPRESS_LEVEL = 6
+
+
+def encode_text(text):
+    """(encoding, size, data) for ``text``, ``size`` being its length in UTF-8 bytes."""
+    raw = text.encode('utf-8')
+    if len(raw) >= COMPRESS_MIN_BYTES:
+        packed = zlib.compress(raw, COMPRESS_LEVEL)
+        if len(packed) < len(raw):
+            return 'zlib', len(raw), packed
+    return 'plain', len(raw), raw
+
+
+def decode_text(encoding, data):
+    if encoding == 'zlib':
+        data = zlib.decompress(data)
+    elif encoding != 'plain':
+        raise ValueError(f'Unknown text encoding {encoding!r}')
+    return data.decode('utf-8')
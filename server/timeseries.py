@@ -0,0 +1,171 @@
+"""Per-student, per-unit metric time series.
+
+Points are appended to metric_point as (student, unit, metric, ts, value),
+with Unix timestamps in seconds and small integer metric codes from
+METRICS. Each append refreshes the rollups of the buckets it touched in
+metric_rollup (count, total, minimum and maximum). Days are computed from
+the raw points and weeks from the days. Weeks start on Monday, UTC.
+
+Range queries read one primary key range and return a Series of numpy
+arrays rather than ORM objects or JSON. compact() applies the retention
+policy: raw points older than TIMESERIES_RAW_RETENTION_DAYS and daily
+rollups older than TIMESERIES_DAILY_RETENTION_DAYS are deleted, and weekly
+rollups are kept. It runs as the periodic 'timeseries.compact' job.
+numpy is imported on first use.
+"""
+import time
+from collections import namedtuple
+from itertools import chain
+
+from sqlalchemy import Integer, and_, bindparam, delete, func, insert, select
+
+from database import db
+from models import MetricPoint, MetricRollup
+
+# Codes stored in the metric column
+METRICS = {'progress': 1}
+DAY = 24 * 60 * 60
+WEEK = 7 * DAY
+RESOLUTIONS = {'raw': 0, 'day': DAY, 'week': WEEK}
+# 1970-01-05, the first Monday after the epoch
+WEEK_ORIGIN = 4 * DAY
+
+
+class Series(namedtuple('Series', 'unit_ids timestamps values counts minimums maximums')):
+    """Parallel arrays ordered by unit, then time.
+
+    For raw points ``counts`` is all ones and ``minimums``/``maximums`` are
+    ``values``; for rollups ``values`` holds the bucket means.
+    """
+    __slots__ = ()
+
+    def by_unit(self):
+        """(unit_id, Series) pairs, one per unit, sharing this Series' memory."""
+        import numpy as np
+
+        if not len(self.unit_ids):
+            return []
+        bounds = [0, *(np.flatnonzero(np.diff(self.unit_ids)) + 1).tolist(), len(self.unit_ids)]
+        return [
+            (int(self.unit_ids[start]), Series(*(array[start:end] for array in self)))
+            for start, end in zip(bounds, bounds[1:])
+        ]
+
+
+def bucket_start(ts, resolution):
+    if resolution == WEEK:
+        return (ts - WEEK_ORIGIN) // WEEK * WEEK + WEEK_ORIGIN
+    return ts // resolution * resolution
+
+
+def _rollup_statement(resolution):
+    """INSERT OR REPLACE of one rollup bucket, aggregated from the next finer resolution."""
+    point, rollup = MetricPoint.__table__, MetricRollup.__table__
+    key = [bindparam(name, type_=Integer) for name in ('b_student_id', 'b_unit_id', 'b_metric')]
+    bucket = bindparam('b_bucket', type_=Integer)
+    if resolution == DAY:
+        source, start = point, point.c.ts
+        aggregates = [func.count(), func.sum(point.c.value), func.min(point.c.value), func.max(point.c.value)]
+        where = []
+    else:
+        source, start = rollup, rollup.c.bucket
+        aggregates = [func.sum(rollup.c.count), func.sum(rollup.c.total),
+                      func.min(rollup.c.minimum), func.max(rollup.c.maximum)]
+        where = [rollup.c.resolution == DAY]
+    aggregated = select(*key, bindparam('b_resolution', type_=Integer), bucket, *aggregates)\
+        .where(
+            source.c.student_id == key[0], source.c.unit_id == key[1], source.c.metric == key[2],
+            start >= bucket, start < bucket + resolution, *where
+        )\
+        .having(func.count() > 0)
+    return insert(rollup).prefix_with('OR REPLACE').from_select(
+        ['student_id', 'unit_id', 'metric', 'resolution', 'bucket', 'count', 'total', 'minimum', 'maximum'],
+        aggregated
+    )
+
+
+class TimeSeriesStore:
+    def __init__(self, raw_retention_days=90, daily_retention_days=365):
+        self.raw_retention_days = raw_retention_days
+        self.daily_retention_days = daily_retention_days
+
+    def init_app(self, app):
+        self.raw_retention_days = app.config.get('TIMESERIES_RAW_RETENTION_DAYS', 90)
+        self.daily_retention_days = app.config.get('TIMESERIES_DAILY_RETENTION_DAYS', 365)
+        app.extensions['timeseries'] = self
+
+    def append(self, points, connection=None):
+        """Append (student_id, unit_id, metric, ts, value) points and refresh their rollups.
+
+        Joins the session's transaction, or ``connection``'s when one is
+        given. A point at the same second as an earlier one of the same
+        series replaces it. Returns the number of points written.
+        """
+        rows = [
+            {'student_id': student_id, 'unit_id': unit_id, 'metric': metric, 'ts': int(ts), 'value': float(value)}
+            for student_id, unit_id, metric, ts, value in points
+        ]
+        if not rows:
+            return 0
+        if connection is None:
+            connection = db.session.connection()
+        connection.execute(insert(MetricPoint.__table__).prefix_with('OR REPLACE'), rows)
+
+        days = {(row['student_id'], row['unit_id'], row['metric'], bucket_start(row['ts'], DAY)) for row in rows}
+        weeks = {(student_id, unit_id, metric, bucket_start(day, WEEK)) for student_id, unit_id, metric, day in days}
+        for resolution, buckets in ((DAY, days), (WEEK, weeks)):
+            connection.execute(_rollup_statement(resolution), [{
+                'b_student_id': student_id, 'b_unit_id': unit_id, 'b_metric': metric,
+                'b_resolution': resolution, 'b_bucket': bucket,
+            } for student_id, unit_id, metric, bucket in buckets])
+        return len(rows)
+
+    def series(self, student_id, metric, resolution=0, unit_id=None, start=None, end=None):
+        """A student's ``metric`` at ``resolution`` (0 for raw points) in [start, end), as a Series."""
+        import numpy as np
+
+        if resolution:
+            table = MetricRollup.__table__
+            ts = table.c.bucket
+            columns = [table.c.unit_id, ts, table.c.total / table.c.count, table.c.count,
+                       table.c.minimum, table.c.maximum]
+            where = [table.c.resolution == resolution]
+        else:
+            table = MetricPoint.__table__
+            ts = table.c.ts
+            columns = [table.c.unit_id, ts, table.c.value]
+            where = []
+        where += [table.c.student_id == student_id, table.c.metric == metric]
+        if unit_id is not None:
+            where.append(table.c.unit_id == unit_id)
+        if start is not None:
+            where.append(ts >= int(start))
+        if end is not None:
+            where.append(ts < int(end))
+        # Primary key order, so the rows come straight off the b-tree without a sort
+        order = [table.c.unit_id, table.c.metric] + ([table.c.resolution] if resolution else []) + [ts]
+        result = db.session.execute(select(*columns).where(and_(*where)).order_by(*order))
+        data = np.fromiter(chain.from_iterable(result), dtype='<f8').reshape(-1, len(columns))
+        values = data[:, 2].copy()
+        if resolution:
+            counts, minimums, maximums = data[:, 3].astype('<i4'), data[:, 4].copy(), data[:, 5].copy()
+        else:
+            counts, minimums, maximums = np.ones(len(values), dtype='<i4'), values, values
+        return Series(data[:, 0].astype('<i4'), data[:, 1].astype('<i8'), values, counts, minimums, maximums)
+
+    def compact(self, now=None):
+        """Delete raw points and daily rollups past their retention period."""
+        now = int(now if now is not None else time.time())
+        # Whole days of raw points, and whole weeks of days, so no kept rollup
+        # is ever recomputed from a partly deleted bucket
+        raw_cutoff = bucket_start(now - self.raw_retention_days * DAY, DAY)
+        daily_cutoff = bucket_start(now - self.daily_retention_days * DAY, WEEK)
+        points = db.session.execute(delete(MetricPoint).where(MetricPoint.ts < raw_cutoff)).rowcount
+        days = db.session.execute(
+            delete(MetricRollup).where(MetricRollup.resolution == DAY, MetricRollup.bucket < daily_cutoff)
+        ).rowcount
+        db.session.commit()
+        return {'deleted_points': points, 'deleted_daily_rollups': days}
+
+
+timeseries = TimeSeriesStore()
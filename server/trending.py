@@ -0,0 +1,223 @@
+"""In-memory trending scores for the popular units listing.
+
+Every enrollment or rating adds weight to a unit's exponentially decayed score.
+Scores use forward decay: an event at time t contributes
+``weight * exp(rate * (t - reference))`` so existing scores never have to be
+touched as time passes, and the whole table is rescaled to a new reference
+time once in a while to keep the numbers in floating point range.
+
+The ranking is kept in a max-heap with lazy deletion that the endpoint reads
+directly. Fixed windows (7d/30d) are answered from per-day counters.
+
+Scores are kept per day. The index follows the changes.py feed, so it sees
+every worker's writes, including unenrollments and archival. A change to a
+unit's enrollments or ratings marks the unit, and the next read reloads that
+unit's per-day totals from the database, replacing what it had counted.
+"""
+import heapq
+import math
+import threading
+import time
+from collections import Counter, defaultdict
+from datetime import datetime
+
+from sqlalchemy import func
+
+from changes import DELETE, INSERT
+from database import db
+from models import Enrollment, Rating
+
+DAY_SECONDS = 86400
+WINDOWS = {'7d': 7, '30d': 30}
+
+ENROLLMENT_WEIGHT = 1.0
+# A five star rating counts as much as an enrollment, a one star rating a fifth
+RATING_WEIGHT = 1.0 / 5
+
+
+def _timestamp(value):
+    if isinstance(value, datetime):
+        return (value - datetime(1970, 1, 1)).total_seconds()
+    if isinstance(value, str):
+        return (datetime.strptime(value, '%Y-%m-%d') - datetime(1970, 1, 1)).total_seconds()
+    return value
+
+
+class TrendingIndex:
+    def __init__(self, half_life_hours=72, renormalize_seconds=DAY_SECONDS):
+        self.rate = math.log(2) / (half_life_hours * 3600)
+        self.renormalize_seconds = renormalize_seconds
+        self._lock = threading.Lock()
+        self._app = None
+        self._warm = False
+        self._reset(time.time())
+
+    def _reset(self, now):
+        self._reference = now
+        self._scores = {}
+        self._heap = []
+        # unit id -> {day number: weight}, what the unit contributes to _buckets
+        self._unit_days = {}
+        self._buckets = defaultdict(Counter)
+        self._window_cache = {}
+        self._pending = set()
+
+    def init_app(self, app):
+        half_life = app.config.get('TRENDING_HALF_LIFE_HOURS')
+        if half_life:
+            self.rate = math.log(2) / (half_life * 3600)
+        self._app = app
+        app.extensions['trending'] = self
+
+    @staticmethod
+    def _load(unit_ids=None):
+        """{unit id: {day number: weight}} of enrollments and ratings, for ``unit_ids`` or every unit."""
+        enrollment_days = db.session.query(
+            Enrollment.unit_id,
+            func.date(Enrollment.enrollment_date),
+            func.count(Enrollment.id)
+        ).group_by(Enrollment.unit_id, func.date(Enrollment.enrollment_date))
+        rating_days = db.session.query(
+            Rating.unit_id,
+            func.date(Rating.created_at),
+            func.sum(Rating.score)
+        ).group_by(Rating.unit_id, func.date(Rating.created_at))
+        if unit_ids is not None:
+            enrollment_days = enrollment_days.filter(Enrollment.unit_id.in_(unit_ids))
+            rating_days = rating_days.filter(Rating.unit_id.in_(unit_ids))
+
+        units = defaultdict(Counter)
+        for rows, weight in ((enrollment_days, ENROLLMENT_WEIGHT), (rating_days, RATING_WEIGHT)):
+            for unit_id, day, total in rows:
+                if day:
+                    units[unit_id][int(_timestamp(day) // DAY_SECONDS)] += total * weight
+        return units
+
+    def warm(self):
+        """Load past enrollments and ratings, aggregated per unit and day.
+
+        Must be called inside an application context. Runs once per process,
+        on the first read, and again when the change feed cannot say what
+        changed.
+        """
+        with self._lock:
+            if self._warm:
+                return
+            self._reset(time.time())
+            for unit_id, days in self._load().items():
+                self._set_unit(unit_id, days)
+            self._warm = True
+
+    def on_changes(self, changes):
+        """changes.py handler: note the units whose enrollments or ratings changed."""
+        with self._lock:
+            for change in changes:
+                if change.entity is None:
+                    self._warm = False
+                elif change.entity == 'unit' and change.op == DELETE:
+                    self._pending.add(change.entity_id)
+                elif change.entity == 'enrollment' and change.op in (INSERT, DELETE) or change.entity == 'rating':
+                    if change.unit_id is None:
+                        self._warm = False
+                    else:
+                        self._pending.add(change.unit_id)
+
+    def _refresh(self):
+        """Reload the units the change feed marked."""
+        with self._lock:
+            unit_ids, self._pending = self._pending, set()
+        if not unit_ids:
+            return
+        # Read outside the lock; a change arriving meanwhile marks its unit again
+        loaded = self._load(unit_ids)
+        with self._lock:
+            for unit_id in unit_ids:
+                self._set_unit(unit_id, loaded.get(unit_id, {}))
+
+    def _set_unit(self, unit_id, days):
+        """Replace what ``unit_id`` contributes with ``days``, {day number: weight}."""
+        for day, weight in self._unit_days.pop(unit_id, {}).items():
+            bucket = self._buckets.get(day)
+            if bucket is not None and unit_id in bucket:
+                bucket[unit_id] -= weight
+                if bucket[unit_id] <= 1e-9:
+                    del bucket[unit_id]
+        score = 0.0
+        for day, weight in days.items():
+            score += weight * math.exp(self.rate * (day * DAY_SECONDS - self._reference))
+            self._buckets[day][unit_id] += weight
+        if days:
+            self._unit_days[unit_id] = dict(days)
+            self._scores[unit_id] = score
+            heapq.heappush(self._heap, (-score, unit_id))
+        else:
+            self._scores.pop(unit_id, None)
+        self._window_cache.clear()
+        if len(self._heap) > 4 * len(self._scores) + 64:
+            self._rebuild_heap()
+
+    def _rebuild_heap(self):
+        self._heap = [(-score, unit_id) for unit_id, score in self._scores.items()]
+        heapq.heapify(self._heap)
+
+    def _renormalize(self, now):
+        """Rescale all scores to ``now`` as the reference and drop stale state."""
+        factor = math.exp(-self.rate * (now - self._reference))
+        self._scores = {
+            unit_id: score * factor
+            for unit_id, score in self._scores.items()
+            if score * factor > 1e-300
+        }
+        self._reference = now
+        self._rebuild_heap()
+
+        oldest_day = int(now // DAY_SECONDS) - max(WINDOWS.values())
+        for day in [day for day in self._buckets if day < oldest_day]:
+            del self._buckets[day]
+        self._window_cache.clear()
+
+    def top(self, n, window=None):
+        """Return up to ``n`` ``(unit_id, score)`` pairs, highest first.
+
+        ``window`` is None for the decayed all-time score or one of WINDOWS.
+        Window scores are plain weighted counts.
+        """
+        if not self._warm:
+            self.warm()
+        self._refresh()
+
+        with self._lock:
+            now = time.time()
+            if now - self._reference > self.renormalize_seconds:
+                self._renormalize(now)
+
+            if window is not None:
+                return self._top_window(n, WINDOWS[window], now)
+
+            decay = math.exp(-self.rate * (now - self._reference))
+            result = []
+            popped = []
+            while self._heap and len(result) < n:
+                entry = heapq.heappop(self._heap)
+                score, unit_id = -entry[0], entry[1]
+                if self._scores.get(unit_id) != score:
+                    continue  # superseded by a later push
+                popped.append(entry)
+                result.append((unit_id, score * decay))
+            for entry in popped:
+                heapq.heappush(self._heap, entry)
+            return result
+
+    def _top_window(self, n, days, now):
+        key = (days, n)
+        if key not in self._window_cache:
+            first_day = int(now // DAY_SECONDS) - days + 1
+            totals = Counter()
+            for day, counts in self._buckets.items():
+                if day >= first_day:
+                    totals.update(counts)
+            self._window_cache[key] = heapq.nlargest(n, totals.items(), key=lambda item: item[1])
+        return self._window_cache[key]
+
+
+trending = TrendingIndex()